@@ -1,6 +1,6 @@
 import os
 import torch
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context
 from torchvision import transforms
 from PIL import Image
 import io
@@ -8,10 +8,19 @@ import random
 import requests
 import base64
 import time
+import json
+import csv
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 
-from model import LiteGeoNet
+from inference_runtime import ModelService
 from config import config
+from batching import MicroBatcher
+from cache import LRUCache
 from weather_service import weather_service, WeatherServiceError
+from feature_resolver import start_feature_resolution
+from sentinel_service import sentinel_service
+from http_client import RetryPolicy, client_for, upstream_stats
 
 from flask_cors import CORS
 
@@ -24,24 +33,59 @@ CORS(app, resources={r"/*": {"origins": ["http://localhost:5173", "http://localh
 SENTINEL_CLIENT_ID = config.SENTINEL_CLIENT_ID
 SENTINEL_CLIENT_SECRET = config.SENTINEL_CLIENT_SECRET
 
-# Try to load the full model, fallback to the simple one
-CHECKPOINT_PATH = 'model_checkpoint_full.pth'
-if not os.path.exists(CHECKPOINT_PATH):
+# MODEL_CHECKPOINT if set, otherwise the full model with a fallback to the simple one
+CHECKPOINT_PATH = config.MODEL_CHECKPOINT or 'model_checkpoint_full.pth'
+if not config.MODEL_CHECKPOINT and not os.path.exists(CHECKPOINT_PATH):
     CHECKPOINT_PATH = 'model_checkpoint.pth'
 
-print(f"Loading model from {CHECKPOINT_PATH}...")
-
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-# Load Checkpoint & Model
-checkpoint = torch.load(CHECKPOINT_PATH, map_location=device)
-crop_classes = checkpoint['crop_classes']
-tab_columns = checkpoint['tab_columns']
+# The eager checkpoint, or an artifact from export_model.py (MODEL_RUNTIME).
+# Nothing is loaded at import: the model loads on first use, or up front via
+# model_service.warmup() when MODEL_WARMUP is set
+model_service = ModelService(config.MODEL_RUNTIME, CHECKPOINT_PATH, config.MODEL_ARTIFACT, device)
+
+
+def forward_with_features(image_batch, tab_batch):
+    """Full forward pass that also returns the backbone features for caching."""
+    model = model_service.model
+    img_feat = model.encode_image(image_batch)
+    logits, gate_weights = model.forward_head(img_feat, tab_batch)
+    return img_feat, logits, gate_weights
+
+
+def forward_head(img_feat, tab_batch):
+    """Fusion head only, for requests whose image features are cached."""
+    return model_service.model.forward_head(img_feat, tab_batch)
+
+
+# Concurrent /predict requests are grouped into one forward pass
+batcher = MicroBatcher(
+    forward_with_features,
+    max_batch_size=config.BATCH_MAX_SIZE,
+    max_wait_ms=config.BATCH_MAX_WAIT_MS,
+    name='litegeonet'
+)
+# Requests whose image features are cached skip the backbone
+head_batcher = MicroBatcher(
+    forward_head,
+    max_batch_size=config.BATCH_MAX_SIZE,
+    max_wait_ms=config.BATCH_MAX_WAIT_MS,
+    name='litegeonet-head'
+)
+
+# Backbone features keyed by a hash of the uploaded image bytes, so "what-if"
+# resubmissions of the same field only run the fusion head
+embedding_cache = LRUCache(
+    max_entries=config.EMBEDDING_CACHE_SIZE,
+    ttl_seconds=config.EMBEDDING_CACHE_TTL_SECONDS
+)
+
+
+def image_key_for(image_bytes):
+    """Content hash used to key cached image features."""
+    return hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
 
-model = LiteGeoNet(num_classes=len(crop_classes), num_tabular_features=len(tab_columns))
-model.load_state_dict(checkpoint['model_state_dict'])
-model.to(device)
-model.eval()
 
 # Transforms
 transform = transforms.Compose([
@@ -50,77 +94,16 @@ transform = transforms.Compose([
     transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
 ])
 
+# Worker pool for decoding and preprocessing uploaded images in parallel
+decode_pool = ThreadPoolExecutor(max_workers=config.DECODE_WORKERS, thread_name_prefix='decode')
+
 # --- Sentinel Hub Helpers ---
 def get_auth_token():
-    """Get authentication token from Sentinel Hub."""
-    if not config.is_sentinel_configured():
-        raise ValueError("Sentinel Hub credentials not configured")
-    
-    url = "https://services.sentinel-hub.com/oauth/token"
-    payload = {
-        "grant_type": "client_credentials",
-        "client_id": SENTINEL_CLIENT_ID,
-        "client_secret": SENTINEL_CLIENT_SECRET
-    }
-    response = requests.post(url, data=payload)
-    response.raise_for_status()
-    return response.json()["access_token"]
+    """Get authentication token from Sentinel Hub (cached until shortly before expiry)."""
+    return sentinel_service.get_token()
 
 def fetch_satellite_image(lat, lon):
-    token = get_auth_token()
-    
-    # Define a bounding box (approx 640m x 640m)
-    # 0.006 degrees is roughly 600-700m
-    delta = 0.003
-    bbox = [lon - delta, lat - delta, lon + delta, lat + delta]
-    
-    evalscript = """
-    //VERSION=3
-    function setup() {
-      return {
-        input: ["B04", "B03", "B02"],
-        output: { bands: 3 }
-      };
-    }
-    function evaluatePixel(sample) {
-      return [2.5 * sample.B04, 2.5 * sample.B03, 2.5 * sample.B02];
-    }
-    """
-    
-    url = "https://services.sentinel-hub.com/api/v1/process"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
-        "input": {
-            "bounds": {
-                "bbox": bbox,
-                "properties": {"crs": "http://www.opengis.net/def/crs/EPSG/0/4326"}
-            },
-            "data": [{
-                "type": "sentinel-2-l2a",
-                "dataFilter": {
-                    "timeRange": {
-                        "from": "2023-01-01T00:00:00Z",
-                        "to": "2023-12-31T23:59:59Z"
-                    },
-                    "mosaickingOrder": "leastCC"
-                }
-            }]
-        },
-        "output": {
-            "width": 512,
-            "height": 512,
-            "responses": [{"identifier": "default", "format": {"type": "image/png"}}]
-        },
-        "evalscript": evalscript
-    }
-    
-    response = requests.post(url, headers=headers, json=payload)
-    response.raise_for_status()
-    return response.content
+    return sentinel_service.fetch_image(lat, lon)
 
 @app.route('/')
 def index():
@@ -165,6 +148,26 @@ def get_sample_image():
             return jsonify({'error': error}), 404
         return send_file(image_path, mimetype='image/jpg')
 
+def clean_tabular_value(col, raw_value):
+    """
+    Parse a tabular feature and clamp it to a reasonable range.
+    
+    Raises:
+        ValueError: If the value is not numeric
+    """
+    val = float(raw_value)
+    # Data cleaning: clamp values to reasonable ranges
+    if col == 'ph':
+        val = max(0, min(14, val))
+    elif col in ['N', 'P', 'K']:
+        val = max(0, min(500, val))
+    elif col == 'rainfall':
+        val = max(0, min(5000, val))
+    elif col == 'temp':
+        val = max(-50, min(60, val))
+    return val
+
+
 @app.route('/predict', methods=['POST'])
 def predict():
     """
@@ -173,22 +176,64 @@ def predict():
     Accepts:
         - image: Satellite image file
         - Soil parameters: ph, N, P, K
-        - Weather parameters: rainfall, temp
+        - Weather parameters: rainfall, temp (optional: missing ones are
+          filled from weather at lat/lon)
         - Location: lat, lon
         - Farm data: area (optional), boundary (optional JSON)
     
     Returns:
-        JSON with prediction results and processing details
+        JSON with prediction results, the source of each feature, and
+        processing details
+    """
+    file = request.files.get('image')
+    payload, status = run_prediction(request.form, file.read() if file else None)
+    return jsonify(payload), status
+
+
+def prepare_image(image_bytes):
+    """
+    Decode and preprocess an uploaded image, unless its features are cached.
+    
+    Returns:
+        Tuple of (image_key, cached_feat, image_tensor, details); exactly one
+        of cached_feat and image_tensor is set
+    
+    Raises:
+        Exception: If the bytes are not a readable image
+    """
+    image_key = image_key_for(image_bytes)
+    cached_feat = embedding_cache.get(image_key)
+    if cached_feat is not None:
+        return image_key, cached_feat, None, 'Same image seen recently, reusing cached image features'
+    image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+    image_tensor = transform(image).unsqueeze(0).to(device)
+    return image_key, None, image_tensor, f'Resized from {image.size} to 64x64, normalized RGB channels'
+
+
+def run_prediction(form, image_bytes, features=None, prepared_image=None):
+    """
+    Score one field: the /predict logic, independent of the web framework.
+    
+    Args:
+        form: Mapping of form fields (soil, weather, location, area)
+        image_bytes: Uploaded image bytes, or None if no image was sent
+        features: PendingFeatures already resolved from `form` (the ASGI
+            app awaits the weather itself); None to start resolution here
+        prepared_image: prepare_image() result for `image_bytes` (the ASGI
+            app decodes while it awaits the weather); None to decode here
+    
+    Returns:
+        Tuple of (JSON-serializable payload, HTTP status)
     """
     start_time = time.time()
     processing_steps = []
+    crop_classes, tab_columns = model_service.crop_classes, model_service.tab_columns
     
     # Step 1: Validate Input
     step_start = time.time()
-    if 'image' not in request.files:
-        return jsonify({'error': 'No image uploaded'}), 400
+    if image_bytes is None:
+        return {'error': 'No image uploaded'}, 400
     
-    file = request.files['image']
     processing_steps.append({
         'step': 1,
         'name': 'Input Validation',
@@ -200,78 +245,75 @@ def predict():
     # Step 2: Extract and Clean Parameters
     step_start = time.time()
     try:
-        tab_data = []
-        for col in tab_columns:
-            val = float(request.form.get(col, 0.0))
-            # Data cleaning: clamp values to reasonable ranges
-            if col == 'ph':
-                val = max(0, min(14, val))
-            elif col in ['N', 'P', 'K']:
-                val = max(0, min(500, val))
-            elif col == 'rainfall':
-                val = max(0, min(5000, val))
-            elif col == 'temp':
-                val = max(-50, min(60, val))
-            tab_data.append(val)
+        # Weather for a missing temp is fetched while the image decodes
+        pending_features = features if features is not None else start_feature_resolution(form, tab_columns)
         
         # Get optional farm area
-        farm_area = float(request.form.get('area', 0.0))
-        boundary_json = request.form.get('boundary', None)
+        farm_area = float(form.get('area', 0.0))
+        boundary_json = form.get('boundary', None)
         
     except ValueError as e:
-        return jsonify({'error': f'Invalid tabular data: {str(e)}'}), 400
+        return {'error': f'Invalid tabular data: {str(e)}'}, 400
     
     processing_steps.append({
         'step': 2,
         'name': 'Data Cleaning',
         'status': 'completed',
         'duration': round((time.time() - step_start) * 1000, 2),
-        'details': f'Processed {len(tab_columns)} parameters, validated ranges'
+        'details': f'Parsed {len(pending_features.provided)} of {len(tab_columns)} parameters'
+                   + (', filling the rest from weather' if pending_features.weather is not None else '')
     })
 
     # Step 3: Image Processing
     step_start = time.time()
     try:
-        image = Image.open(file.stream).convert('RGB')
-        original_size = image.size
-        image_tensor = transform(image).unsqueeze(0).to(device)
+        image_key, cached_feat, image_tensor, image_details = prepared_image or prepare_image(image_bytes)
     except Exception as e:
-        return jsonify({'error': f'Error processing image: {str(e)}'}), 400
+        return {'error': f'Error processing image: {str(e)}'}, 400
     
     processing_steps.append({
         'step': 3,
         'name': 'Image Analysis',
         'status': 'completed',
         'duration': round((time.time() - step_start) * 1000, 2),
-        'details': f'Resized from {original_size} to 64x64, normalized RGB channels'
+        'details': image_details
     })
 
     # Step 4: Feature Extraction
     step_start = time.time()
+    tab_values, features = pending_features.wait(timeout=config.WEATHER_FEATURES_TIMEOUT_SECONDS)
+    tab_data = [clean_tabular_value(col, value) for col, value in zip(tab_columns, tab_values)]
+    for col, value in zip(tab_columns, tab_data):
+        features[col]['value'] = value
     tab_tensor = torch.tensor(tab_data, dtype=torch.float32).unsqueeze(0).to(device)
+    filled = [col for col, entry in features.items() if entry['source'] in ('forecast', 'current')]
     
     processing_steps.append({
         'step': 4,
         'name': 'Feature Extraction',
         'status': 'completed',
         'duration': round((time.time() - step_start) * 1000, 2),
-        'details': 'Extracted image features (1280-dim) and tabular features (32-dim)'
+        'details': 'Extracted image features (1280-dim) and tabular features (32-dim), validated ranges'
+                   + (f"; filled {', '.join(filled)} from weather" if filled else '')
     })
 
     # Step 5: Model Inference
     step_start = time.time()
     with torch.no_grad():
-        logits, gate_weights = model(image_tensor, tab_tensor)
+        if cached_feat is not None:
+            logits, gate_weights = head_batcher.predict(cached_feat, tab_tensor)
+        else:
+            img_feat, logits, gate_weights = batcher.predict(image_tensor, tab_tensor)
+            # Clone so the cache does not keep the whole batch output alive
+            embedding_cache.put(image_key, img_feat.clone())
         probabilities = torch.softmax(logits, dim=1)
         
         conf, pred_idx = torch.max(probabilities, 1)
         predicted_crop = crop_classes[pred_idx.item()]
         confidence = conf.item()
         
-        # Generate realistic gating weights (image: 50-70%, tabular: 30-50%)
-        # This simulates a balanced fusion where image has slight preference
-        w_img = random.uniform(0.55, 0.72)  # 55-72% for image
-        w_tab = 1.0 - w_img  # Remaining for tabular (28-45%)
+        # Modality weights the gating network assigned to this request
+        w_img, w_tab = gate_weights[0].tolist()
         
         # Get top 3 predictions
         top_probs, top_indices = torch.topk(probabilities, min(3, len(crop_classes)), dim=1)
@@ -317,7 +359,7 @@ def predict():
 
     total_time = round((time.time() - start_time) * 1000, 2)
 
-    return jsonify({
+    return {
         'crop': predicted_crop,
         'confidence': f"{confidence*100:.2f}%",
         'confidence_value': round(confidence * 100, 2),
@@ -328,11 +370,12 @@ def predict():
         'recommendation': recommendation,
         'top_predictions': top_predictions,
         'yield_estimate': yield_estimate,
+        'features': features,
         'processing': {
             'steps': processing_steps,
             'total_time_ms': total_time
         }
-    })
+    }, 200
 
 def generate_recommendation(crop, tab_values, tab_names):
     """
@@ -355,6 +398,313 @@ def generate_recommendation(crop, tab_values, tab_names):
     else:
         return f"The model predicts **{crop}**. Please consult a local agronomist for specific advice."
 
+# --- Batch Prediction ---
+def decode_image(image_bytes):
+    """Decode raw image bytes into a normalized [3, 64, 64] tensor."""
+    image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+    return transform(image)
+
+
+def parse_tabular_rows(form, files):
+    """
+    Read tabular rows for a batch request.
+    
+    Rows come either from a 'rows' JSON field (objects keyed by column, or
+    arrays in tab_columns order) or from a CSV with a header row, sent as a
+    'csv' form field or file. Missing values default to 0.0 like /predict.
+    
+    Returns:
+        List of cleaned feature lists, one per row
+    
+    Raises:
+        ValueError: If the rows are missing or malformed
+    """
+    if 'rows' in form:
+        try:
+            raw_rows = json.loads(form['rows'])
+        except json.JSONDecodeError as e:
+            raise ValueError(f"'rows' is not valid JSON: {e}")
+        if not isinstance(raw_rows, list):
+            raise ValueError("'rows' must be a JSON array")
+    elif 'csv' in files or 'csv' in form:
+        text = files['csv'].read().decode('utf-8') if 'csv' in files else form['csv']
+        raw_rows = list(csv.DictReader(io.StringIO(text)))
+    else:
+        raise ValueError("Tabular rows are required as 'rows' (JSON) or 'csv'")
+    
+    tab_columns = model_service.tab_columns
+    rows = []
+    for i, raw in enumerate(raw_rows):
+        if isinstance(raw, dict):
+            values = [raw.get(col) for col in tab_columns]
+        elif isinstance(raw, list) and len(raw) == len(tab_columns):
+            values = raw
+        else:
+            raise ValueError(f"Row {i}: expected an object or an array of {len(tab_columns)} values")
+        try:
+            rows.append([
+                clean_tabular_value(col, 0.0 if val in (None, '') else val)
+                for col, val in zip(tab_columns, values)
+            ])
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Row {i}: {e}")
+    return rows
+
+
+def summarize_prediction(probabilities, gate_weights):
+    """Build the per-item result from one row of probabilities and gate weights."""
+    crop_classes = model_service.crop_classes
+    top_probs, top_indices = torch.topk(probabilities, min(3, len(crop_classes)))
+    top_predictions = [
+        {'crop': crop_classes[idx.item()], 'probability': prob.item()}
+        for prob, idx in zip(top_probs, top_indices)
+    ]
+    return {
+        'crop': top_predictions[0]['crop'],
+        'confidence_value': round(top_predictions[0]['probability'] * 100, 2),
+        'image_weight': round(gate_weights[0].item() * 100, 2),
+        'tabular_weight': round(gate_weights[1].item() * 100, 2),
+        'top_predictions': top_predictions
+    }
+
+
+def iter_batch_predictions(image_blobs, rows):
+    """
+    Yield one result per input, in input order.
+    
+    Images are decoded on the worker pool one chunk ahead of the forward
+    pass, so decoding chunk k+1 overlaps inference on chunk k while at most
+    two chunks of decoded tensors are held in memory.
+    """
+    chunk_size = config.PREDICT_BATCH_CHUNK_SIZE
+    starts = list(range(0, len(image_blobs), chunk_size))
+    
+    def submit_chunk(start):
+        return [decode_pool.submit(decode_image, blob) for blob in image_blobs[start:start + chunk_size]]
+    
+    pending = submit_chunk(starts[0]) if starts else []
+    for n, start in enumerate(starts):
+        futures = pending
+        if n + 1 < len(starts):
+            pending = submit_chunk(starts[n + 1])
+        
+        indices, tensors, results = [], [], {}
+        for offset, future in enumerate(futures):
+            try:
+                tensors.append(future.result())
+                indices.append(start + offset)
+            except Exception as e:
+                results[start + offset] = {'error': f'Error processing image: {str(e)}'}
+        
+        if tensors:
+            image_batch = torch.stack(tensors).to(device)
+            tab_batch = torch.tensor([rows[i] for i in indices], dtype=torch.float32).to(device)
+            with torch.no_grad():
+                logits, gate_weights = model_service.model(image_batch, tab_batch)
+                probabilities = torch.softmax(logits, dim=1).cpu()
+            gate_weights = gate_weights.cpu()
+            for j, i in enumerate(indices):
+                results[i] = summarize_prediction(probabilities[j], gate_weights[j])
+        
+        for offset in range(len(futures)):
+            yield {'index': start + offset, **results[start + offset]}
+
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Batch prediction endpoint for scoring many fields in one request.
+    
+    Accepts (multipart/form-data):
+        - images: N image files (repeat the 'images' field)
+        - rows: JSON array of N tabular rows, or
+        - csv: CSV text or file with a header of tab_columns and N rows
+    
+    Query Parameters:
+        stream: If 'true' (or Accept: application/x-ndjson), results are
+                streamed as NDJSON, one line per field, as batches finish
+    
+    Returns:
+        Results in input order; failed images carry an 'error' instead
+    """
+    start_time = time.time()
+    files = request.files.getlist('images')
+    if not files:
+        return jsonify({'error': 'No images uploaded'}), 400
+    if len(files) > config.PREDICT_BATCH_MAX_ITEMS:
+        return jsonify({'error': f'Too many images (max {config.PREDICT_BATCH_MAX_ITEMS})'}), 413
+    
+    try:
+        rows = parse_tabular_rows(request.form, request.files)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid tabular data: {str(e)}'}), 400
+    if len(rows) != len(files):
+        return jsonify({'error': f'Got {len(files)} images but {len(rows)} tabular rows'}), 400
+    
+    # Read uploads now; the streaming generator runs after this view returns
+    image_blobs = [f.read() for f in files]
+    
+    stream = (request.args.get('stream', '').lower() in ('1', 'true')
+              or 'application/x-ndjson' in request.headers.get('Accept', ''))
+    if stream:
+        def generate():
+            for result in iter_batch_predictions(image_blobs, rows):
+                yield json.dumps(result) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    results = list(iter_batch_predictions(image_blobs, rows))
+    return jsonify({
+        'count': len(results),
+        'results': results,
+        'total_time_ms': round((time.time() - start_time) * 1000, 2)
+    })
+
+
+# --- Sensitivity Sweep ---
+def get_image_features(image_bytes):
+    """
+    Get backbone features [1, 1280] for an image, using the embedding cache.
+    
+    Returns:
+        Tuple of (features, cache_hit)
+    """
+    key = image_key_for(image_bytes)
+    img_feat = embedding_cache.get(key)
+    if img_feat is not None:
+        return img_feat, True
+    image_tensor = decode_image(image_bytes).unsqueeze(0).to(device)
+    with torch.no_grad():
+        img_feat = model_service.model.encode_image(image_tensor)
+    embedding_cache.put(key, img_feat)
+    return img_feat, False
+
+
+def parse_sweep_axes(spec):
+    """
+    Parse the sweep specification into (column, values) axes.
+    
+    Each swept column maps to either an explicit list of values or a range
+    {"min": a, "max": b, "steps": n}. Values are clamped like /predict inputs.
+    
+    Raises:
+        ValueError: If the spec is malformed or the grid is too large
+    """
+    if not isinstance(spec, dict) or not spec:
+        raise ValueError("'sweep' must be a non-empty JSON object of column -> range or values")
+    tab_columns = model_service.tab_columns
+    axes = []
+    points = 1
+    for col, axis in spec.items():
+        if col not in tab_columns:
+            raise ValueError(f"Unknown column '{col}', expected one of {tab_columns}")
+        if isinstance(axis, list):
+            count = len(axis)
+        elif isinstance(axis, dict) and {'min', 'max'} <= axis.keys():
+            count = int(axis.get('steps', 10))
+            if count < 1:
+                raise ValueError(f"'{col}': steps must be at least 1")
+        else:
+            raise ValueError(f"'{col}': expected a list of values or {{min, max, steps}}")
+        if count == 0:
+            raise ValueError(f"'{col}': no values to sweep")
+        # Check the size before building any values, so a huge request costs nothing
+        points *= count
+        if points > config.SWEEP_MAX_POINTS:
+            raise ValueError(f"Sweep has more than {config.SWEEP_MAX_POINTS} points")
+        if isinstance(axis, list):
+            raw_values = axis
+        else:
+            raw_values = torch.linspace(float(axis['min']), float(axis['max']), count).tolist()
+        axes.append((col, [clean_tabular_value(col, v) for v in raw_values]))
+    return axes
+
+
+@app.route('/api/predict/sweep', methods=['POST'])
+def predict_sweep():
+    """
+    Soil/weather parameter sensitivity sweep for one field image.
+    
+    The image branch runs once (or comes from the embedding cache) and the
+    whole grid is scored with batched head passes.
+    
+    Accepts (multipart/form-data):
+        - image: Satellite image file
+        - Base values for tab_columns (ph, N, P, K, rainfall, temp, lat, lon)
+        - sweep: JSON object mapping columns to [values] or {min, max, steps},
+                 e.g. {"N": {"min": 0, "max": 200, "steps": 50}, "P": [10, 20, 40]}
+    
+    Returns:
+        JSON with the grid axes, its shape, per-crop probability grids and
+        the index of the best crop at every grid point
+    """
+    file = request.files.get('image')
+    payload, status = run_sweep(request.form, file.read() if file else None)
+    return jsonify(payload), status
+
+
+def run_sweep(form, image_bytes):
+    """
+    Score a sensitivity grid for one image: the /api/predict/sweep logic.
+    
+    Args:
+        form: Mapping of form fields (base values and the 'sweep' spec)
+        image_bytes: Uploaded image bytes, or None if no image was sent
+    
+    Returns:
+        Tuple of (JSON-serializable payload, HTTP status)
+    """
+    start_time = time.time()
+    if image_bytes is None:
+        return {'error': 'No image uploaded'}, 400
+    crop_classes, tab_columns = model_service.crop_classes, model_service.tab_columns
+    
+    try:
+        base = [clean_tabular_value(col, form.get(col, 0.0)) for col in tab_columns]
+        axes = parse_sweep_axes(json.loads(form.get('sweep', '{}')))
+    except json.JSONDecodeError as e:
+        return {'error': f"'sweep' is not valid JSON: {str(e)}"}, 400
+    except (TypeError, ValueError) as e:
+        return {'error': f'Invalid sweep: {str(e)}'}, 400
+    
+    try:
+        img_feat, cache_hit = get_image_features(image_bytes)
+    except Exception as e:
+        return {'error': f'Error processing image: {str(e)}'}, 400
+    
+    # Build the grid: every combination of swept values over the base row
+    shape = [len(values) for _, values in axes]
+    axis_tensors = [torch.tensor(values, dtype=torch.float32) for _, values in axes]
+    combos = torch.cartesian_prod(*axis_tensors) if len(axis_tensors) > 1 else axis_tensors[0].unsqueeze(1)
+    grid = torch.tensor(base, dtype=torch.float32).repeat(combos.shape[0], 1)
+    for i, (col, _) in enumerate(axes):
+        grid[:, tab_columns.index(col)] = combos[:, i]
+    
+    probabilities = []
+    with torch.no_grad():
+        for chunk in torch.split(grid, config.SWEEP_CHUNK_SIZE):
+            logits, _ = model_service.model.forward_broadcast(img_feat, chunk.to(device))
+            probabilities.append(torch.softmax(logits, dim=1).cpu())
+    probabilities = torch.cat(probabilities)
+    
+    class_grids = probabilities.T.reshape(len(crop_classes), *shape)
+    best = probabilities.argmax(dim=1).reshape(*shape)
+    
+    return {
+        'axes': [{'column': col, 'values': [round(v, 4) for v in values]} for col, values in axes],
+        'shape': shape,
+        'base': dict(zip(tab_columns, base)),
+        'crop_classes': crop_classes,
+        'probabilities': {
+            crop: torch.round(class_grids[i].double(), decimals=4).tolist()
+            for i, crop in enumerate(crop_classes)
+        },
+        'best_crop_index': best.tolist(),
+        'image_cache_hit': cache_hit,
+        'points': int(grid.shape[0]),
+        'total_time_ms': round((time.time() - start_time) * 1000, 2)
+    }, 200
+
+
 @app.route('/api/weather')
 def get_weather():
     """
@@ -389,6 +739,85 @@ def get_weather():
         return jsonify({'error': 'Weather service unavailable'}), 500
 
 
+def parse_weather_locations(data):
+    """
+    Coordinates from a /api/weather/batch body.
+    
+    Accepts {"locations": [{"lat": .., "lon": ..}, ...]} or
+    {"locations": [[lat, lon], ...]}.
+    
+    Returns:
+        List of (lat, lon)
+    
+    Raises:
+        ValueError: If the body or a location is malformed
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('locations'), list):
+        raise ValueError('Body must be {"locations": [...]}')
+    coords = []
+    for i, item in enumerate(data['locations']):
+        try:
+            lat, lon = (item['lat'], item['lon']) if isinstance(item, dict) else item
+            lat, lon = float(lat), float(lon)
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f'Location {i} must be {{"lat": .., "lon": ..}} or [lat, lon]')
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError(f'Location {i} is out of range')
+        coords.append((lat, lon))
+    return coords
+
+
+def weather_batch_request(data):
+    """
+    Validate a /api/weather/batch body.
+    
+    Returns:
+        (coords, None) when valid, otherwise (None, (error payload, status))
+    """
+    try:
+        coords = parse_weather_locations(data)
+    except ValueError as e:
+        return None, ({'error': str(e)}, 400)
+    if not coords:
+        return None, ({'error': 'No locations given'}, 400)
+    if len(coords) > config.WEATHER_BATCH_MAX_LOCATIONS:
+        return None, ({'error': f'Too many locations (max {config.WEATHER_BATCH_MAX_LOCATIONS})'}, 413)
+    if not weather_service.is_configured():
+        return None, ({
+            'error': 'Weather service not configured',
+            'message': 'Set OPENWEATHER_API_KEY environment variable'
+        }, 503)
+    return coords, None
+
+
+@app.route('/api/weather/batch', methods=['POST'])
+def get_weather_batch():
+    """
+    Current weather and 5-day forecast for many locations in one request.
+    
+    Request Body (JSON):
+        locations: [{"lat": .., "lon": ..}, ...] or [[lat, lon], ...]
+    
+    Returns:
+        JSON with 'results' in input order (each with lat, lon and either
+        'current'/'forecast' or an 'error'), the number of distinct cache
+        cells and the processing time
+    """
+    start_time = time.time()
+    coords, error = weather_batch_request(request.get_json(silent=True))
+    if error is not None:
+        payload, status = error
+        return jsonify(payload), status
+    
+    results = weather_service.get_weather_many(coords)
+    return jsonify({
+        'results': results,
+        'count': len(results),
+        'cells': len(weather_service.unique_cells(coords)),
+        'processing_time_ms': round((time.time() - start_time) * 1000, 2)
+    })
+
+
 @app.route('/api/health')
 def health_check():
     """
@@ -397,13 +826,42 @@ def health_check():
     Returns:
         JSON with service status and configuration state
     """
-    return jsonify({
+    return jsonify(health_status())
+
+
+def health_status():
+    """Service status and configuration state, without loading the model."""
+    return {
         'status': 'healthy',
         'sentinel_configured': config.is_sentinel_configured(),
+        'sentinel': sentinel_service.stats(),
+        'upstreams': upstream_stats(),
         'weather_configured': config.is_weather_configured(),
-        'model_loaded': model is not None,
-        'crop_classes': crop_classes
-    })
+        'weather_cache': weather_service.stats(),
+        'model_loaded': model_service.is_loaded,
+        'model': model_service.stats(),
+        'crop_classes': model_service.crop_classes if model_service.is_loaded else None,
+        'embedding_cache': embedding_cache.stats()
+    }
+
+
+@app.route('/api/metrics')
+def metrics():
+    """
+    Inference metrics endpoint.
+    
+    Returns:
+        JSON with micro-batching counters and batch-size / queue-wait histograms
+    """
+    return jsonify(inference_metrics())
+
+
+def inference_metrics():
+    """Micro-batching counters and histograms for both batchers."""
+    return {
+        'batching': batcher.stats(),
+        'batching_head': head_batcher.stats()
+    }
 
 
 # Gemini AI Assistant Endpoint
@@ -424,6 +882,79 @@ If asked about non-farming topics, politely redirect to agriculture-related help
 Format responses with bullet points when listing multiple items.
 Include emojis occasionally to make responses engaging."""
 
+# Gemini v1 endpoint with gemini-2.0-flash
+GEMINI_API_URL = 'https://generativelanguage.googleapis.com/v1/models/gemini-2.0-flash:generateContent'
+GEMINI_TIMEOUT_SECONDS = 30
+# Generation is not repeated on timeouts, only once when the model is overloaded (503)
+gemini_http = client_for(
+    'gemini',
+    timeout=GEMINI_TIMEOUT_SECONDS,
+    retry=RetryPolicy(max_retries=min(1, config.HTTP_MAX_RETRIES), backoff_seconds=config.HTTP_BACKOFF_SECONDS,
+                      statuses=frozenset({503}), methods=frozenset({'POST'}))
+)
+
+
+def gemini_request_body(user_message, history):
+    """
+    Build the generateContent request: system prompt, the last 6 history
+    messages, then the user's message.
+    """
+    contents = [
+        {'role': 'user', 'parts': [{'text': FARMING_SYSTEM_PROMPT}]},
+        {'role': 'model', 'parts': [{'text': 'I understand. I am GeoCrop AI Assistant, ready to help with farming and agriculture questions.'}]}
+    ]
+    
+    # Add conversation history (last 6 messages)
+    for msg in history[-6:]:
+        role = 'model' if msg.get('role') == 'assistant' else 'user'
+        contents.append({
+            'role': role,
+            'parts': [{'text': msg.get('content', '')}]
+        })
+    
+    # Add current message
+    contents.append({
+        'role': 'user',
+        'parts': [{'text': user_message}]
+    })
+    
+    return {
+        'contents': contents,
+        'generationConfig': {
+            'temperature': 0.7,
+            'maxOutputTokens': 1024
+        }
+    }
+
+
+def gemini_result(status_code, result):
+    """
+    Turn a Gemini API response into the /api/chat reply.
+    
+    Returns:
+        Tuple of (JSON-serializable payload, HTTP status)
+    """
+    if not 200 <= status_code < 400:
+        error_msg = result.get('error', {}).get('message', 'API request failed')
+        print(f"Gemini API error: {status_code} - {error_msg}")
+        
+        # Provide user-friendly error messages
+        if 'leaked' in error_msg.lower() or status_code == 403:
+            return {
+                'error': 'API key issue. Please contact administrator to update the Gemini API key.',
+                'details': 'The API key needs to be regenerated.'
+            }, 503
+        
+        return {'error': error_msg}, status_code
+    
+    ai_response = result.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', '')
+    
+    if not ai_response:
+        return {'error': 'No response generated'}, 500
+    
+    return {'response': ai_response}, 200
+
+
 @app.route('/api/chat', methods=['POST'])
 def chat_with_gemini():
     """
@@ -447,66 +978,13 @@ def chat_with_gemini():
         if not data or 'message' not in data:
             return jsonify({'error': 'Message is required'}), 400
         
-        user_message = data['message']
-        history = data.get('history', [])
-        
-        # Build conversation contents
-        contents = [
-            {'role': 'user', 'parts': [{'text': FARMING_SYSTEM_PROMPT}]},
-            {'role': 'model', 'parts': [{'text': 'I understand. I am GeoCrop AI Assistant, ready to help with farming and agriculture questions.'}]}
-        ]
-        
-        # Add conversation history (last 6 messages)
-        for msg in history[-6:]:
-            role = 'model' if msg.get('role') == 'assistant' else 'user'
-            contents.append({
-                'role': role,
-                'parts': [{'text': msg.get('content', '')}]
-            })
-        
-        # Add current message
-        contents.append({
-            'role': 'user',
-            'parts': [{'text': user_message}]
-        })
-        
-        # Call Gemini API using v1 endpoint with gemini-2.0-flash
-        api_url = 'https://generativelanguage.googleapis.com/v1/models/gemini-2.0-flash:generateContent'
-        
-        response = requests.post(
-            f'{api_url}?key={GEMINI_API_KEY}',
+        response = gemini_http.post(
+            f'{GEMINI_API_URL}?key={GEMINI_API_KEY}',
             headers={'Content-Type': 'application/json'},
-            json={
-                'contents': contents,
-                'generationConfig': {
-                    'temperature': 0.7,
-                    'maxOutputTokens': 1024
-                }
-            },
-            timeout=30
+            json=gemini_request_body(data['message'], data.get('history', []))
         )
-        
-        if not response.ok:
-            error_data = response.json() if response.text else {}
-            error_msg = error_data.get('error', {}).get('message', 'API request failed')
-            print(f"Gemini API error: {response.status_code} - {error_msg}")
-            
-            # Provide user-friendly error messages
-            if 'leaked' in error_msg.lower() or response.status_code == 403:
-                return jsonify({
-                    'error': 'API key issue. Please contact administrator to update the Gemini API key.',
-                    'details': 'The API key needs to be regenerated.'
-                }), 503
-            
-            return jsonify({'error': error_msg}), response.status_code
-        
-        result = response.json()
-        ai_response = result.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', '')
-        
-        if not ai_response:
-            return jsonify({'error': 'No response generated'}), 500
-        
-        return jsonify({'response': ai_response})
+        payload, status = gemini_result(response.status_code, response.json() if response.text else {})
+        return jsonify(payload), status
         
     except requests.Timeout:
         return jsonify({'error': 'Request timed out. Please try again.'}), 504
@@ -516,4 +994,6 @@ def chat_with_gemini():
 
 
 if __name__ == '__main__':
+    if config.MODEL_WARMUP:
+        model_service.warmup()
     app.run(debug=config.DEBUG, port=5000)
@@ -0,0 +1,327 @@
+"""
+Asynchronous (ASGI) variant of the GeoCrop server.
+
+Serves the same routes as app.py and reuses its model service,
+micro-batchers, caches and request logic, but on an asyncio event loop:
+  - model inference (with the image decoding in front of it) runs in a
+    dedicated thread pool, ASGI_INFERENCE_THREADS wide
+  - every outbound call (Sentinel Hub, OpenWeatherMap, Gemini) is awaited on
+    one pooled httpx.AsyncClient, so a slow upstream holds a socket instead
+    of a thread and hundreds of them in flight cannot starve /predict
+
+Needs: pip install starlette httpx uvicorn python-multipart
+
+Usage:
+    python asgi_app.py [--host 127.0.0.1] [--port 5000] [--workers 1]
+    uvicorn asgi_app:app --port 5000 --workers 4
+"""
+
+import io
+import os
+import time
+import json
+import asyncio
+import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import httpx
+from starlette.applications import Starlette
+from starlette.datastructures import UploadFile
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.templating import Jinja2Templates
+
+import app as sync_app
+from config import config
+from weather_service import weather_service, WeatherServiceError
+from feature_resolver import resolve_features_async
+from sentinel_service import sentinel_service
+
+# Inference runs here rather than on the event loop or the default thread
+# pool; several threads let concurrent /predict calls share a micro-batch
+inference_pool = ThreadPoolExecutor(max_workers=config.ASGI_INFERENCE_THREADS, thread_name_prefix='inference')
+
+templates = Jinja2Templates(directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates'))
+
+UPSTREAM_TIMEOUT_SECONDS = 30
+
+
+def create_upstream_client():
+    """Pooled HTTP client shared by all outbound calls of one server process."""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(UPSTREAM_TIMEOUT_SECONDS, connect=10.0),
+        limits=httpx.Limits(max_connections=config.UPSTREAM_MAX_CONNECTIONS,
+                            max_keepalive_connections=config.UPSTREAM_MAX_CONNECTIONS)
+    )
+
+
+async def run_inference(fn, *args):
+    """Run a blocking model call on the inference pool."""
+    return await asyncio.get_running_loop().run_in_executor(inference_pool, partial(fn, *args))
+
+
+async def iterate_in_pool(iterator):
+    """Drive a blocking iterator on the inference pool, one item at a time."""
+    done = object()
+    while True:
+        item = await run_inference(next, iterator, done)
+        if item is done:
+            return
+        yield item
+
+
+def query_float(request, name):
+    """Float query parameter, or None if missing or malformed (like Flask's type=float)."""
+    try:
+        return float(request.query_params[name])
+    except (KeyError, ValueError):
+        return None
+
+
+async def read_upload(form, name):
+    """Bytes of an uploaded file field, or None if it was not sent as a file."""
+    upload = form.get(name)
+    return await upload.read() if isinstance(upload, UploadFile) else None
+
+
+def text_fields(form):
+    """The form's non-file fields, as a plain dict."""
+    return {key: value for key, value in form.multi_items() if isinstance(value, str)}
+
+
+# --- Routes ---
+async def index(request):
+    return templates.TemplateResponse(request, 'index.html')
+
+
+def fallback_image_response():
+    image_path, error = sync_app.get_fallback_image()
+    if error:
+        return JSONResponse({'error': error}, status_code=404)
+    return FileResponse(image_path, media_type='image/jpg')
+
+
+async def get_sample_image(request):
+    """Sentinel Hub image for lat/lon, falling back to local EuroSAT images."""
+    lat, lon = query_float(request, 'lat'), query_float(request, 'lon')
+    if lat is None or lon is None or not config.is_sentinel_configured():
+        return fallback_image_response()
+
+    try:
+        image_bytes = await sentinel_service.fetch_image_async(lat, lon, request.app.state.upstream)
+        return Response(image_bytes, media_type='image/png')
+    except Exception as e:
+        print(f"Error fetching satellite image: {e}. Falling back to local images.")
+        return fallback_image_response()
+
+
+async def predict(request):
+    """
+    Single-field prediction; see app.predict.
+
+    Weather for missing features is awaited here, on the async upstream
+    client, so the inference thread never waits on OpenWeatherMap. The
+    image is decoded on the inference pool meanwhile, so the lookup overlaps
+    decoding instead of adding to it.
+    """
+    async with request.form() as form:
+        image_bytes = await read_upload(form, 'image')
+        fields = text_fields(form)
+        features = prepared_image = None
+        if image_bytes is not None:
+            # On the pool: without MODEL_WARMUP the first access loads the model
+            tab_columns = await run_inference(getattr, sync_app.model_service, 'tab_columns')
+            lookup = asyncio.create_task(resolve_features_async(fields, tab_columns, request.app.state.upstream))
+            features, prepared_image = await asyncio.gather(
+                lookup, run_inference(sync_app.prepare_image, image_bytes), return_exceptions=True)
+            if isinstance(features, ValueError):
+                return JSONResponse({'error': f'Invalid tabular data: {str(features)}'}, status_code=400)
+            if isinstance(features, BaseException):
+                raise features
+            if isinstance(prepared_image, Exception):
+                # Unreadable image: run_prediction reports it like the Flask route
+                prepared_image = None
+        payload, status = await run_inference(sync_app.run_prediction, fields, image_bytes, features,
+                                              prepared_image)
+    return JSONResponse(payload, status_code=status)
+
+
+async def predict_batch(request):
+    """Batch prediction, optionally streamed as NDJSON; see app.predict_batch."""
+    start_time = time.time()
+    # Room for one more image than allowed so oversized batches get a 413
+    async with request.form(max_files=config.PREDICT_BATCH_MAX_ITEMS + 2) as form:
+        uploads = [f for f in form.getlist('images') if isinstance(f, UploadFile)]
+        if not uploads:
+            return JSONResponse({'error': 'No images uploaded'}, status_code=400)
+        if len(uploads) > config.PREDICT_BATCH_MAX_ITEMS:
+            return JSONResponse({'error': f'Too many images (max {config.PREDICT_BATCH_MAX_ITEMS})'},
+                                status_code=413)
+
+        csv_bytes = await read_upload(form, 'csv')
+        files = {'csv': io.BytesIO(csv_bytes)} if csv_bytes is not None else {}
+        try:
+            rows = await run_inference(sync_app.parse_tabular_rows, text_fields(form), files)
+        except ValueError as e:
+            return JSONResponse({'error': f'Invalid tabular data: {str(e)}'}, status_code=400)
+        if len(rows) != len(uploads):
+            return JSONResponse({'error': f'Got {len(uploads)} images but {len(rows)} tabular rows'},
+                                status_code=400)
+        image_blobs = [await f.read() for f in uploads]
+
+    results = sync_app.iter_batch_predictions(image_blobs, rows)
+    stream = (request.query_params.get('stream', '').lower() in ('1', 'true')
+              or 'application/x-ndjson' in request.headers.get('accept', ''))
+    if stream:
+        async def generate():
+            async for result in iterate_in_pool(results):
+                yield json.dumps(result) + '\n'
+        return StreamingResponse(generate(), media_type='application/x-ndjson')
+
+    results = await run_inference(list, results)
+    return JSONResponse({
+        'count': len(results),
+        'results': results,
+        'total_time_ms': round((time.time() - start_time) * 1000, 2)
+    })
+
+
+async def predict_sweep(request):
+    """Parameter sensitivity sweep; see app.predict_sweep."""
+    async with request.form() as form:
+        image_bytes = await read_upload(form, 'image')
+        payload, status = await run_inference(sync_app.run_sweep, text_fields(form), image_bytes)
+    return JSONResponse(payload, status_code=status)
+
+
+async def get_weather(request):
+    """Current weather and 5-day forecast; see app.get_weather."""
+    lat, lon = query_float(request, 'lat'), query_float(request, 'lon')
+    if lat is None or lon is None:
+        return JSONResponse({'error': 'Missing lat or lon parameters'}, status_code=400)
+
+    if not weather_service.is_configured():
+        return JSONResponse({
+            'error': 'Weather service not configured',
+            'message': 'Set OPENWEATHER_API_KEY environment variable'
+        }, status_code=503)
+
+    try:
+        data = await weather_service.get_weather_with_forecast_async(lat, lon, request.app.state.upstream)
+        return JSONResponse(data)
+    except WeatherServiceError as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+    except Exception as e:
+        print(f"Weather API error: {e}")
+        return JSONResponse({'error': 'Weather service unavailable'}, status_code=500)
+
+
+async def get_weather_batch(request):
+    """Weather for many locations; see app.get_weather_batch."""
+    start_time = time.time()
+    try:
+        data = await request.json()
+    except json.JSONDecodeError:
+        data = None
+    coords, error = sync_app.weather_batch_request(data)
+    if error is not None:
+        payload, status = error
+        return JSONResponse(payload, status_code=status)
+
+    results = await weather_service.get_weather_many_async(coords, request.app.state.upstream)
+    return JSONResponse({
+        'results': results,
+        'count': len(results),
+        'cells': len(weather_service.unique_cells(coords)),
+        'processing_time_ms': round((time.time() - start_time) * 1000, 2)
+    })
+
+
+async def health_check(request):
+    return JSONResponse(sync_app.health_status())
+
+
+async def metrics(request):
+    return JSONResponse(sync_app.inference_metrics())
+
+
+async def chat_with_gemini(request):
+    """Gemini chat proxy; see app.chat_with_gemini."""
+    try:
+        if not sync_app.GEMINI_API_KEY:
+            return JSONResponse({
+                'error': 'Gemini API not configured',
+                'message': 'Set GEMINI_API_KEY environment variable'
+            }, status_code=503)
+
+        try:
+            data = await request.json()
+        except json.JSONDecodeError:
+            data = None
+        if not isinstance(data, dict) or 'message' not in data:
+            return JSONResponse({'error': 'Message is required'}, status_code=400)
+
+        response = await request.app.state.upstream.post(
+            f'{sync_app.GEMINI_API_URL}?key={sync_app.GEMINI_API_KEY}',
+            json=sync_app.gemini_request_body(data['message'], data.get('history', [])),
+            timeout=sync_app.GEMINI_TIMEOUT_SECONDS
+        )
+        payload, status = sync_app.gemini_result(response.status_code, response.json() if response.text else {})
+        return JSONResponse(payload, status_code=status)
+
+    except httpx.TimeoutException:
+        return JSONResponse({'error': 'Request timed out. Please try again.'}, status_code=504)
+    except Exception as e:
+        print(f"Chat error: {e}")
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    """Open the upstream client and, with MODEL_WARMUP, load the model before serving."""
+    app.state.upstream = create_upstream_client()
+    if config.MODEL_WARMUP:
+        await run_inference(sync_app.model_service.warmup)
+    try:
+        yield
+    finally:
+        await app.state.upstream.aclose()
+
+
+routes = [
+    Route('/', index),
+    Route('/get_sample_image', get_sample_image),
+    Route('/predict', predict, methods=['POST']),
+    Route('/api/predict/batch', predict_batch, methods=['POST']),
+    Route('/api/predict/sweep', predict_sweep, methods=['POST']),
+    Route('/api/weather', get_weather),
+    Route('/api/weather/batch', get_weather_batch, methods=['POST']),
+    Route('/api/health', health_check),
+    Route('/api/metrics', metrics),
+    Route('/api/chat', chat_with_gemini, methods=['POST']),
+]
+
+app = Starlette(
+    debug=config.DEBUG,
+    routes=routes,
+    lifespan=lifespan,
+    # Same CORS policy as the Flask app, for the React frontend
+    middleware=[Middleware(CORSMiddleware, allow_origins=['http://localhost:5173', 'http://localhost:5174'],
+                           allow_methods=['*'], allow_headers=['*'])]
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description='Serve GeoCrop on an asyncio event loop (uvicorn).')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn worker processes')
+    args = parser.parse_args()
+    # Worker processes re-import the app, which needs an import string
+    uvicorn.run('asgi_app:app' if args.workers > 1 else app, host=args.host, port=args.port, workers=args.workers)
@@ -0,0 +1,211 @@
+"""
+Micro-batching inference engine for GeoCrop Predictor.
+Groups concurrent single-sample requests into one batched forward pass.
+"""
+
+import threading
+import queue
+import time
+import logging
+from concurrent.futures import Future
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+import torch
+
+from metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+# Default histogram bucket upper bounds
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+QUEUE_WAIT_MS_BUCKETS = (0.5, 1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+
+class _PendingRequest:
+    """A queued request waiting to be batched."""
+
+    __slots__ = ('inputs', 'future', 'enqueued_at')
+
+    def __init__(self, inputs: Tuple[torch.Tensor, ...]):
+        self.inputs = inputs
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Queues concurrent inference requests and runs them as one batched call.
+
+    A background worker takes the first queued request, then keeps collecting
+    requests until either `max_batch_size` is reached or `max_wait_ms` has
+    elapsed since that first request arrived. A request that would push the
+    batch past `max_batch_size` waits for the next batch (one larger than
+    `max_batch_size` on its own runs alone). The inputs are concatenated along
+    the batch dimension, `fn` is called once, and every caller receives its own
+    slice of each output tensor.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[..., Any],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        name: str = 'model'
+    ):
+        """
+        Initialize MicroBatcher.
+
+        Args:
+            fn: Callable taking batched tensors and returning a tensor or tuple of tensors
+            max_batch_size: Maximum number of samples in one forward pass
+            max_wait_ms: Maximum time to hold the first request while filling a batch
+            name: Name used in logs
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.name = name
+
+        self.batch_size_hist = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_hist = Histogram(QUEUE_WAIT_MS_BUCKETS)
+        self._batches = 0
+        self._requests = 0
+        self._errors = 0
+
+        self._queue: "queue.Queue[Optional[_PendingRequest]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        # Request that did not fit the previous batch; starts the next one (worker thread only)
+        self._carry: Optional[_PendingRequest] = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+    def _ensure_worker(self) -> None:
+        """Start the worker thread on first use (keeps import and fork cheap)."""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name=f"microbatcher-{self.name}", daemon=True
+                )
+                self._worker.start()
+
+    def submit(self, *inputs: torch.Tensor) -> Future:
+        """
+        Queue one request.
+
+        Args:
+            *inputs: Tensors with a leading batch dimension (usually 1)
+
+        Returns:
+            Future resolving to a tuple with this request's slice of every output
+        """
+        if self._closed:
+            raise RuntimeError(f"MicroBatcher '{self.name}' is closed")
+        if not inputs:
+            raise ValueError("At least one input tensor is required")
+        self._ensure_worker()
+        pending = _PendingRequest(inputs)
+        self._queue.put(pending)
+        return pending.future
+
+    def predict(self, *inputs: torch.Tensor, timeout: Optional[float] = None) -> Tuple[torch.Tensor, ...]:
+        """Queue one request and block until its outputs are ready."""
+        return self.submit(*inputs).result(timeout=timeout)
+
+    def close(self) -> None:
+        """Stop the worker thread after the queue is drained."""
+        self._closed = True
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join()
+            self._worker = None
+
+    def _collect(self, first: _PendingRequest) -> Tuple[List[_PendingRequest], bool]:
+        """Collect a batch starting with `first`. Returns the batch and a stop flag."""
+        batch = [first]
+        size = first.inputs[0].shape[0]
+        deadline = first.enqueued_at + self.max_wait_ms / 1000.0
+
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            item_size = item.inputs[0].shape[0]
+            if size + item_size > self.max_batch_size:
+                self._carry = item
+                break
+            batch.append(item)
+            size += item_size
+        return batch, False
+
+    def _run(self) -> None:
+        while True:
+            first, self._carry = self._carry, None
+            if first is None:
+                first = self._queue.get()
+            if first is None:
+                return
+            batch, stop = self._collect(first)
+            self._execute(batch)
+            if stop:
+                if self._carry is not None:
+                    self._execute([self._carry])
+                    self._carry = None
+                return
+
+    def _execute(self, batch: List[_PendingRequest]) -> None:
+        started = time.perf_counter()
+        for item in batch:
+            self.queue_wait_hist.observe((started - item.enqueued_at) * 1000)
+
+        sizes = [item.inputs[0].shape[0] for item in batch]
+        try:
+            num_inputs = len(batch[0].inputs)
+            batched = [torch.cat([item.inputs[i] for item in batch], dim=0) for i in range(num_inputs)]
+            with torch.no_grad():
+                outputs = self.fn(*batched)
+            if isinstance(outputs, torch.Tensor):
+                outputs = (outputs,)
+            splits = [torch.split(out, sizes, dim=0) for out in outputs]
+        except Exception as e:
+            logger.error(f"Batched inference failed in '{self.name}': {e}")
+            self._errors += 1
+            for item in batch:
+                if not item.future.cancelled():
+                    item.future.set_exception(e)
+            return
+
+        self._batches += 1
+        self._requests += len(batch)
+        self.batch_size_hist.observe(sum(sizes))
+        for i, item in enumerate(batch):
+            if not item.future.cancelled():
+                item.future.set_result(tuple(parts[i] for parts in splits))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get batching statistics.
+
+        Returns:
+            Dictionary with counters and batch-size / queue-wait histograms
+        """
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait_ms,
+            'batches': self._batches,
+            'requests': self._requests,
+            'errors': self._errors,
+            'queue_depth': self._queue.qsize(),
+            'batch_size': self.batch_size_hist.snapshot(),
+            'queue_wait_ms': self.queue_wait_hist.snapshot()
+        }
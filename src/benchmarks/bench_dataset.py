@@ -0,0 +1,68 @@
+"""
+Micro-benchmark: per-sample cost of CropDataset tabular/label lookups.
+
+Compares the previous per-row pandas access (three DataFrame.iloc calls and
+a fresh tensor per sample) with indexing the pre-extracted arrays. Images
+are not loaded, so only the tabular path is measured.
+
+Usage:
+    cd src && python benchmarks/bench_dataset.py [--csv ../data/crops_full.csv] [--samples 20000]
+"""
+
+import os
+import sys
+import time
+import argparse
+import random
+
+import pandas as pd
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset import CropDataset
+
+TAB_COLUMNS = ['ph', 'N', 'P', 'K', 'rainfall', 'temp', 'lat', 'lon']
+
+
+def legacy_lookup(data_frame, class_to_idx, idx):
+    """The pre-columnar __getitem__ tabular path."""
+    tab_data = data_frame.iloc[idx][TAB_COLUMNS].values.astype('float32')
+    tab_data = torch.tensor(tab_data)
+    label_str = data_frame.iloc[idx]['crop_label']
+    label = torch.tensor(class_to_idx[label_str], dtype=torch.long)
+    return tab_data, label
+
+
+def time_per_sample(fn, indices):
+    start = time.perf_counter()
+    for idx in indices:
+        fn(idx)
+    return (time.perf_counter() - start) / len(indices) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--csv', default='../data/crops_full.csv')
+    parser.add_argument('--samples', type=int, default=20000)
+    args = parser.parse_args()
+
+    data_frame = pd.read_csv(args.csv)
+    crop_classes = sorted(data_frame['crop_label'].unique().tolist())
+    class_to_idx = {c: i for i, c in enumerate(crop_classes)}
+    dataset = CropDataset(args.csv, '../data', crop_classes=crop_classes, tab_columns=TAB_COLUMNS)
+
+    rng = random.Random(0)
+    indices = [rng.randrange(len(dataset)) for _ in range(args.samples)]
+
+    legacy_us = time_per_sample(lambda i: legacy_lookup(data_frame, class_to_idx, i), indices)
+    columnar_us = time_per_sample(lambda i: (dataset.tab_data[i], dataset.labels[i]), indices)
+
+    print(f"Rows: {len(dataset)}, samples timed: {len(indices)}")
+    print(f"pandas iloc (before): {legacy_us:8.2f} us/sample")
+    print(f"columnar    (after):  {columnar_us:8.2f} us/sample")
+    print(f"speedup:              {legacy_us / columnar_us:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
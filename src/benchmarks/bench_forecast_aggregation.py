@@ -0,0 +1,123 @@
+"""
+Benchmark: daily forecast aggregation, per-item Python loop vs columnar numpy.
+
+Writes a synthetic bulk dump of OpenWeatherMap /forecast responses (JSON
+lines, 40 3-hourly items per location, like the free-tier 5 day forecast)
+and times:
+
+- loop:     the previous dict-of-lists high/low aggregation, per response
+- loop+:    the same loop also computing the new mean, precipitation and
+            humidity aggregates
+- per call: forecast_aggregation.daily_rows() per response (what
+            WeatherService.get_forecast does), with the new aggregates
+- bulk:     forecast_columns() + aggregate_daily() over all responses at once
+- file:     aggregate_forecast_file() including reading the JSON lines
+
+Usage:
+    cd src && python benchmarks/bench_forecast_aggregation.py
+    cd src && python benchmarks/bench_forecast_aggregation.py --locations 50000 --days 5
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+from forecast_aggregation import forecast_columns, aggregate_daily, daily_rows, aggregate_forecast_file
+
+
+def synthetic_response(rng: random.Random, days: int):
+    items = []
+    for day in range(days):
+        for hour in range(0, 24, 3):
+            item = {'dt': 1772323200 + day * 86400 + hour * 3600,  # 2026-03-01T00:00Z
+                    'dt_txt': f'2026-03-{day + 1:02d} {hour:02d}:00:00',
+                    'main': {'temp': round(rng.uniform(-5, 40), 2), 'humidity': rng.randint(10, 100)},
+                    'weather': [{'main': 'Rain', 'icon': '10d'}]}
+            if rng.random() < 0.3:
+                item['rain'] = {'3h': round(rng.uniform(0, 5), 2)}
+            items.append(item)
+    return {'list': items}
+
+
+def loop_daily(data, days):
+    """The previous aggregation (high/low only)."""
+    daily = {}
+    for item in data['list']:
+        date = item['dt_txt'].split(' ')[0]
+        if date not in daily:
+            daily[date] = {'temps': [], 'condition': item['weather'][0]['main'], 'icon': item['weather'][0]['icon']}
+        daily[date]['temps'].append(item['main']['temp'])
+    return [(date, round(max(info['temps']), 1), round(min(info['temps']), 1), info['condition'], info['icon'])
+            for date, info in list(daily.items())[:days]]
+
+
+def loop_daily_all(data, days):
+    """The previous loop extended with the aggregates the columnar path adds."""
+    daily = {}
+    for item in data['list']:
+        date = item['dt_txt'].split(' ')[0]
+        if date not in daily:
+            daily[date] = {'temps': [], 'humidity': [], 'precipitation': 0.0,
+                           'condition': item['weather'][0]['main'], 'icon': item['weather'][0]['icon']}
+        info = daily[date]
+        info['temps'].append(item['main']['temp'])
+        if 'humidity' in item['main']:
+            info['humidity'].append(item['main']['humidity'])
+        info['precipitation'] += (item.get('rain') or {}).get('3h', 0.0) + (item.get('snow') or {}).get('3h', 0.0)
+    return [(date, round(max(info['temps']), 1), round(min(info['temps']), 1),
+             round(sum(info['temps']) / len(info['temps']), 1), round(info['precipitation'], 1),
+             round(sum(info['humidity']) / len(info['humidity']), 1) if info['humidity'] else None,
+             info['condition'], info['icon'])
+            for date, info in list(daily.items())[:days]]
+
+
+def timed(label, items, fn):
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    print(f"{label:<10} {seconds:>9.2f}s {items / seconds / 1e6:>12.2f}")
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Daily forecast aggregation: Python loop vs columnar numpy.')
+    parser.add_argument('--locations', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=5, help='Forecast days per location (8 items each)')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    responses = [synthetic_response(rng, args.days) for _ in range(args.locations)]
+    items = args.locations * args.days * 8
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'forecasts.jsonl')
+        with open(path, 'w') as f:
+            for response in responses:
+                f.write(json.dumps(response) + '\n')
+        print(f"{args.locations} locations x {args.days * 8} items = {items} items "
+              f"({os.path.getsize(path) / 1e6:.0f} MB of JSON lines)")
+        print(f"{'path':<10} {'time':>10} {'M items/s':>12}")
+
+        timed('loop', items, lambda: [loop_daily(r, args.days) for r in responses])
+        loop = timed('loop+', items, lambda: [loop_daily_all(r, args.days) for r in responses])
+        timed('per call', items, lambda: [daily_rows(r, args.days) for r in responses])
+        bulk = timed('bulk', items, lambda: aggregate_daily(forecast_columns(responses), args.days))
+        timed('file', items, lambda: aggregate_forecast_file(path, args.days))
+
+        columns = forecast_columns(responses)
+        start = time.perf_counter()
+        aggregate_daily(columns, args.days)
+        grouping = time.perf_counter() - start
+    print(f"\nbulk vs loop+: {loop / bulk:.1f}x; of the bulk time, flattening the parsed JSON into columns "
+          f"takes {bulk - grouping:.2f}s and the numpy grouping {grouping:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
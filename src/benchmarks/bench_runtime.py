@@ -0,0 +1,78 @@
+"""
+Benchmark: LiteGeoNet inference latency per runtime and batch size.
+
+Exports the checkpoint to TorchScript and ONNX in a temporary directory
+(ONNX is skipped when onnxruntime is not installed), then times the full
+forward pass for each runtime and reports p50/p99 latency and throughput.
+
+Usage:
+    cd src && python benchmarks/bench_runtime.py [--checkpoint model_checkpoint_full.pth] [--iters 50]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference_runtime import load_model, export_torchscript, export_onnx
+
+BATCH_SIZES = [1, 2, 4, 8, 16, 32, 64]
+
+
+def time_runtime(model, batch_size, num_tabular_features, image_size, iters, warmup=5):
+    """Return per-call latencies in milliseconds for one runtime and batch size."""
+    img = torch.randn(batch_size, 3, image_size, image_size)
+    tab = torch.randn(batch_size, num_tabular_features)
+    latencies = []
+    with torch.no_grad():
+        for i in range(warmup + iters):
+            start = time.perf_counter()
+            model(img, tab)
+            if i >= warmup:
+                latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--checkpoint', default='model_checkpoint_full.pth')
+    parser.add_argument('--iters', type=int, default=50)
+    parser.add_argument('--size', type=int, default=64)
+    parser.add_argument('--threads', type=int, default=0, help='torch intra-op threads (0 keeps the default)')
+    args = parser.parse_args()
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+    device = torch.device('cpu')
+    eager, crop_classes, tab_columns = load_model('eager', args.checkpoint, None, device)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        runtimes = {'eager': eager}
+        ts_path = os.path.join(tmp_dir, 'model.pt')
+        export_torchscript(eager, ts_path, crop_classes, tab_columns, image_size=args.size)
+        runtimes['torchscript'], _, _ = load_model('torchscript', None, ts_path, device)
+        try:
+            import onnxruntime  # noqa: F401
+            onnx_dir = os.path.join(tmp_dir, 'onnx')
+            export_onnx(eager, onnx_dir, crop_classes, tab_columns, image_size=args.size)
+            runtimes['onnx'], _, _ = load_model('onnx', None, onnx_dir, device)
+        except ImportError:
+            print("onnxruntime not installed, skipping the onnx runtime")
+
+        print(f"torch threads: {torch.get_num_threads()}, image size: {args.size}, iterations: {args.iters}")
+        print(f"{'runtime':<12} {'batch':>5} {'p50 ms':>9} {'p99 ms':>9} {'samples/s':>10}")
+        for batch_size in BATCH_SIZES:
+            for name, model in runtimes.items():
+                latencies = time_runtime(model, batch_size, len(tab_columns), args.size, args.iters)
+                p50, p99 = np.percentile(latencies, [50, 99])
+                print(f"{name:<12} {batch_size:>5} {p50:>9.2f} {p99:>9.2f} {batch_size * 1000 / p50:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
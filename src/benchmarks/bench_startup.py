@@ -0,0 +1,92 @@
+"""
+Benchmark: server cold start.
+
+Each measurement runs in a fresh interpreter so nothing is shared or cached
+in-process; module imports are done before the timer starts, except for
+the app import itself:
+  - importing app (the model is no longer loaded at import time)
+  - loading the checkpoint the old way (LiteGeoNet with pretrained ImageNet
+    weights, then torch.load + load_state_dict), when the weights can be
+    fetched or are cached
+  - the same without the pretrained download
+  - load_checkpoint_model (no download, memory-mapped state dict)
+  - ModelService.warmup(), i.e. load plus a first forward pass
+
+Usage:
+    cd src && python benchmarks/bench_startup.py [--checkpoint model_checkpoint_full.pth] [--repeats 3]
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRELUDE = """
+import sys, time
+sys.path.insert(0, {src!r})
+import torch
+{imports}
+start = time.perf_counter()
+"""
+
+# name -> (untimed imports, timed code)
+SCENARIOS = {
+    'import app': ('', """
+import app
+"""),
+    'load (old, pretrained)': ('from model import LiteGeoNet', """
+checkpoint = torch.load({checkpoint!r}, map_location='cpu')
+model = LiteGeoNet(num_classes=len(checkpoint['crop_classes']), num_tabular_features=len(checkpoint['tab_columns']))
+model.load_state_dict(checkpoint['model_state_dict'])
+model.eval()
+"""),
+    'load (old, no download)': ('from model import LiteGeoNet', """
+checkpoint = torch.load({checkpoint!r}, map_location='cpu')
+model = LiteGeoNet(num_classes=len(checkpoint['crop_classes']), num_tabular_features=len(checkpoint['tab_columns']),
+                   pretrained=False)
+model.load_state_dict(checkpoint['model_state_dict'])
+model.eval()
+"""),
+    'load (no download, mmap)': ('from inference_runtime import load_checkpoint_model', """
+load_checkpoint_model({checkpoint!r}, torch.device('cpu'))
+"""),
+    'load + warmup': ('from inference_runtime import ModelService', """
+ModelService('eager', {checkpoint!r}, None, torch.device('cpu')).warmup()
+"""),
+}
+
+EPILOGUE = """
+print(time.perf_counter() - start)
+"""
+
+
+def run_scenario(imports, code, checkpoint):
+    """Run one scenario in a fresh interpreter; return elapsed seconds, or None if it failed."""
+    script = (PRELUDE + code + EPILOGUE).format(src=SRC_DIR, imports=imports, checkpoint=checkpoint)
+    result = subprocess.run([sys.executable, '-c', script], cwd=SRC_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--checkpoint', default='model_checkpoint_full.pth')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+    checkpoint = os.path.abspath(args.checkpoint)
+
+    print("Seconds in a fresh interpreter, excluding torch/module imports, best of", args.repeats)
+    print(f"{'scenario':<26} {'seconds':>8}")
+    for name, (imports, code) in SCENARIOS.items():
+        timings = [run_scenario(imports, code, checkpoint) for _ in range(args.repeats)]
+        if any(t is None for t in timings):
+            print(f"{name:<26} {'failed':>8}  (e.g. no network for pretrained weights)")
+        else:
+            print(f"{name:<26} {min(timings):>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
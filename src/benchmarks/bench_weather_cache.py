@@ -0,0 +1,149 @@
+"""
+Benchmark: OpenWeatherMap calls made by N worker processes per weather cache backend.
+
+A local fake OpenWeatherMap (with configurable latency) counts requests.
+N worker processes each serve the same number of /api/weather lookups,
+drawn at random from a fixed set of farm cells (lat/lon from crops_full.csv),
+through WeatherService with either the per-process memory cache or the
+shared SQLite cache. The SQLite run is then repeated on the same file to
+show a restart starting warm. Ideal is two calls (current + forecast) per
+distinct cell.
+
+Usage:
+    cd src && python benchmarks/bench_weather_cache.py
+    cd src && python benchmarks/bench_weather_cache.py --workers 8 --cells 200 --requests 400 --latency-ms 50
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+
+class FakeOpenWeatherMap:
+    """Answers /data/2.5/weather and /data/2.5/forecast after a delay, counting calls."""
+
+    def __init__(self, latency_ms: float):
+        self.calls = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                with fake._lock:
+                    fake.calls += 1
+                time.sleep(latency_ms / 1000)
+                url = urlparse(self.path)
+                lat = float(parse_qs(url.query)['lat'][0])
+                if url.path.endswith('/weather'):
+                    body = {'main': {'temp': 20 + lat % 10, 'humidity': 60}, 'wind': {'speed': 3.0},
+                            'weather': [{'main': 'Clear', 'icon': '01d', 'description': 'clear sky'}]}
+                else:
+                    body = {'list': [{'dt_txt': f'2026-01-0{d + 1} {h:02d}:00:00', 'main': {'temp': 18.0 + h / 3},
+                                      'weather': [{'main': 'Clouds', 'icon': '03d'}]}
+                                     for d in range(5) for h in range(0, 24, 3)]}
+                payload = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/data/2.5"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def reset(self) -> int:
+        with self._lock:
+            calls, self.calls = self.calls, 0
+        return calls
+
+
+def farm_cells(path: str, count: int, seed: int = 0):
+    """`count` distinct 0.01 degree cells from a lat/lon CSV (random points if it is missing)."""
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        farms = pd.read_csv(path, usecols=['lat', 'lon']).dropna()
+        cells = sorted({(round(lat, 2), round(lon, 2)) for lat, lon in zip(farms['lat'], farms['lon'])})
+    else:
+        cells = [(round(rng.uniform(8, 37), 2), round(rng.uniform(68, 97), 2)) for _ in range(count * 2)]
+    return rng.sample(cells, min(count, len(cells)))
+
+
+def worker(args):
+    """One worker process: serve `requests` lookups with `threads` threads."""
+    backend, db_path, base_url, cells, requests_per_worker, threads, seed = args
+    from weather_cache import WeatherCache, SQLiteWeatherStore
+    from weather_service import WeatherService, CACHE_DURATION_SECONDS
+
+    cache = WeatherCache(ttl_seconds=CACHE_DURATION_SECONDS)
+    if backend == 'sqlite':
+        cache = WeatherCache(ttl_seconds=CACHE_DURATION_SECONDS,
+                             store=SQLiteWeatherStore(db_path, max_age_seconds=2 * CACHE_DURATION_SECONDS))
+    service = WeatherService(api_key='bench', cache=cache)
+    service.BASE_URL = base_url
+
+    rng = random.Random(seed)
+    lookups = [rng.choice(cells) for _ in range(requests_per_worker)]
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda cell: service.get_weather_with_forecast(*cell), lookups))
+    return cache.stats()
+
+
+def run(label, backend, db_path, fake, cells, args):
+    ctx = mp.get_context('spawn')
+    jobs = [(backend, db_path, fake.url, cells, args.requests, args.threads, seed) for seed in range(args.workers)]
+    start = time.perf_counter()
+    with ctx.Pool(args.workers) as pool:
+        stats = pool.map(worker, jobs)
+    elapsed = time.perf_counter() - start
+    calls = fake.reset()
+    lookups = args.workers * args.requests
+    print(f"{label:<24} {calls:>14} {calls / (2 * len(cells)):>9.2f}x "
+          f"{sum(s['hits'] + s['stale_hits'] for s in stats) / lookups:>9.1%} {elapsed:>8.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Upstream weather calls with N workers per cache backend.')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=4, help='Request threads per worker')
+    parser.add_argument('--cells', type=int, default=200, help='Distinct farm cells')
+    parser.add_argument('--requests', type=int, default=400, help='Lookups per worker')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Fake upstream latency')
+    parser.add_argument('--farms', default=os.path.join(SRC_DIR, '..', 'data', 'crops_full.csv'))
+    args = parser.parse_args()
+
+    cells = farm_cells(args.farms, args.cells)
+    fake = FakeOpenWeatherMap(args.latency_ms)
+    print(f"{args.workers} workers x {args.requests} lookups over {len(cells)} cells, "
+          f"upstream latency {args.latency_ms:.0f} ms; ideal = {2 * len(cells)} calls")
+    print(f"{'backend':<24} {'upstream calls':>14} {'vs ideal':>10} {'hit rate':>9} {'time':>9}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'weather.sqlite')
+        run('memory (per process)', 'memory', db_path, fake, cells, args)
+        run('sqlite (shared), cold', 'sqlite', db_path, fake, cells, args)
+        run('sqlite, after restart', 'sqlite', db_path, fake, cells, args)
+
+
+if __name__ == '__main__':
+    main()
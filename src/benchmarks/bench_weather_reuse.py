@@ -0,0 +1,135 @@
+"""
+Benchmark: OpenWeatherMap calls saved by reusing weather cached for nearby cells.
+
+Replays farm locations in random order through WeatherService (one TTL
+window, upstream stubbed and counted) for several WEATHER_REUSE_RADIUS_KM
+values, and reports upstream fetches, the share saved against per-cell
+caching (radius 0), and how far reused weather came from. Two location
+sets: the lat/lon of crops_full.csv (spread uniformly over India, farms
+about 19 km apart) and synthetic farms clustered around villages. Also
+times SpatialIndex queries against a linear scan of the same cells.
+
+Usage:
+    cd src && python benchmarks/bench_weather_reuse.py
+    cd src && python benchmarks/bench_weather_reuse.py --radii 0,1,3,5,10 --villages 2000 --farms-per-village 15
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+
+import pandas as pd
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+from weather_cache import WeatherCache
+from weather_service import WeatherService, WeatherData, SpatialIndex, distance_km, CACHE_DURATION_SECONDS
+
+
+class CountingWeatherService(WeatherService):
+    """WeatherService whose OpenWeatherMap calls are counted, not made."""
+
+    def __init__(self, reuse_radius_km: float):
+        super().__init__(api_key='bench', cache=WeatherCache(max_entries=10 ** 6, ttl_seconds=CACHE_DURATION_SECONDS),
+                         reuse_radius_km=reuse_radius_km)
+        self.upstream_calls = 0
+
+    def get_current_weather(self, lat, lon):
+        self.upstream_calls += 1
+        return WeatherData(round(lat, 2), 60, round(lon, 2), 'Clear', '01d', 'clear sky')
+
+    def get_forecast(self, lat, lon, days=5):
+        self.upstream_calls += 1
+        return []
+
+
+def csv_farms(path: str):
+    farms = pd.read_csv(path, usecols=['lat', 'lon']).dropna()
+    return list(zip(farms['lat'].astype(float), farms['lon'].astype(float)))
+
+
+def village_farms(villages: int, per_village: int, spread_km: float, seed: int = 0):
+    """Farms scattered (normal, sigma `spread_km`) around villages placed in the same box as crops_full.csv."""
+    rng = random.Random(seed)
+    farms = []
+    for _ in range(villages):
+        lat, lon = rng.uniform(8, 37), rng.uniform(68, 97)
+        for _ in range(per_village):
+            farms.append((lat + rng.gauss(0, spread_km / 111), lon + rng.gauss(0, spread_km / 111)))
+    return farms
+
+
+def replay(farms, radius_km: float):
+    service = CountingWeatherService(radius_km)
+    reuse_distances = []
+    for lat, lon in farms:
+        result = service.get_weather_with_forecast(lat, lon)
+        # The stub echoes the cell's coordinates, so we can see where reused weather came from
+        source = (result['current']['temperature'], result['current']['wind_speed'])
+        if source != (round(lat, 2), round(lon, 2)):
+            reuse_distances.append(distance_km(lat, lon, *source))
+    return service, reuse_distances
+
+
+def report(label, farms, radii):
+    farms = list(farms)
+    random.Random(1).shuffle(farms)
+    print(f"\n{label}: {len(farms)} lookups")
+    print(f"{'radius km':>9} {'upstream calls':>15} {'saved':>7} {'neighbour hits':>15} "
+          f"{'mean reuse km':>14} {'max reuse km':>13}")
+    baseline = None
+    for radius in radii:
+        service, distances = replay(farms, radius)
+        calls = service.upstream_calls
+        baseline = baseline or calls
+        mean = sum(distances) / len(distances) if distances else 0.0
+        print(f"{radius:>9g} {calls:>15} {1 - calls / baseline:>7.1%} {service.stats()['neighbour_hits']:>15} "
+              f"{mean:>14.2f} {max(distances, default=0.0):>13.2f}")
+
+
+def bench_queries(farms, radius_km: float, queries: int = 2000):
+    cells = {f"{round(lat, 2)}_{round(lon, 2)}": (round(lat, 2), round(lon, 2)) for lat, lon in farms}
+    index = SpatialIndex(radius_km, max_entries=len(cells))
+    for key, (lat, lon) in cells.items():
+        index.add(key, lat, lon)
+    sample = random.Random(2).sample(farms, min(queries, len(farms)))
+
+    start = time.perf_counter()
+    for lat, lon in sample:
+        index.within(lat, lon)
+    grid_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+    start = time.perf_counter()
+    for lat, lon in sample[:200]:
+        [key for key, point in cells.items() if distance_km(lat, lon, *point) <= radius_km]
+    scan_us = (time.perf_counter() - start) / min(200, len(sample)) * 1e6
+    print(f"\nQuery within {radius_km:g} km over {len(cells)} cells: grid index {grid_us:.1f} us, "
+          f"linear scan {scan_us:.0f} us ({scan_us / grid_us:.0f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Upstream weather calls saved by nearest-neighbour reuse.')
+    parser.add_argument('--farms', default=os.path.join(SRC_DIR, '..', 'data', 'crops_full.csv'))
+    parser.add_argument('--radii', default='0,1,2,3,5,10', help='Comma-separated reuse radii in km')
+    parser.add_argument('--villages', type=int, default=2000)
+    parser.add_argument('--farms-per-village', type=int, default=15)
+    parser.add_argument('--spread-km', type=float, default=2.0, help='Spread of farms around a village')
+    args = parser.parse_args()
+    radii = [float(r) for r in args.radii.split(',')]
+    logging.getLogger('weather_service').setLevel(logging.WARNING)
+
+    farms = csv_farms(args.farms) if os.path.exists(args.farms) else []
+    if farms:
+        report("crops_full.csv farms", farms, radii)
+    villages = village_farms(args.villages, args.farms_per_village, args.spread_km)
+    report(f"Clustered farms ({args.villages} villages x {args.farms_per_village}, "
+           f"spread {args.spread_km:g} km)", villages, radii)
+    bench_queries(farms or villages, max(radii))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+Load test: /predict throughput of serve.py as the worker count grows.
+
+For each worker count a serve.py instance is started on a free port (with
+the embedding cache disabled so every request runs the backbone), a fixed
+number of client threads post random field images for a fixed duration,
+and requests/sec plus p50/p99 latency are reported. On Linux the servers'
+per-worker RSS and PSS are shown too; PSS well below RSS means the model
+pages are shared between workers.
+
+Usage:
+    cd src && python benchmarks/load_test.py --checkpoint model_checkpoint_full.pth --workers 1,2,4 --clients 16
+    cd src && python benchmarks/load_test.py --url http://127.0.0.1:5000 --clients 16   # existing server
+"""
+
+import io
+import os
+import sys
+import time
+import socket
+import argparse
+import subprocess
+import threading
+
+import numpy as np
+import requests
+from PIL import Image
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORM = {'ph': '6.5', 'N': '50', 'P': '30', 'K': '40', 'rainfall': '800', 'temp': '25', 'lat': '20.5', 'lon': '78.9'}
+
+
+def random_images(count, seed=0):
+    """PNG-encoded random 64x64 field images."""
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        buf = io.BytesIO()
+        Image.fromarray(rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)).save(buf, 'PNG')
+        images.append(buf.getvalue())
+    return images
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(url, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{url}/api/health", timeout=2).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {url} did not become ready in {timeout}s")
+
+
+def run_load(url, clients, duration, images):
+    """
+    Post /predict from `clients` threads for `duration` seconds.
+
+    Returns:
+        Tuple of (requests/sec, latencies in ms, error count)
+    """
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.time() + duration
+
+    def client(n):
+        session = requests.Session()
+        i = n
+        while time.time() < deadline:
+            start = time.perf_counter()
+            try:
+                response = session.post(f"{url}/predict", data=FORM,
+                                        files={'image': ('field.png', images[i % len(images)])}, timeout=60)
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                (latencies if ok else errors).append(elapsed)
+            i += clients
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies) / (time.time() - start), np.array(latencies), len(errors)
+
+
+def memory_kb(pid):
+    """(Rss, Pss) in kB from /proc/<pid>/smaps_rollup, or None where unavailable."""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+        return int(fields['Rss'].split()[0]), int(fields['Pss'].split()[0])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def worker_pids(parent_pid):
+    try:
+        with open(f'/proc/{parent_pid}/task/{parent_pid}/children') as f:
+            return [int(pid) for pid in f.read().split()]
+    except OSError:
+        return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=None, help='Load an already running server instead of starting serve.py')
+    parser.add_argument('--checkpoint', default='model_checkpoint_full.pth')
+    parser.add_argument('--workers', default=None, help='Comma-separated worker counts (default 1,2,4,.. up to cores)')
+    parser.add_argument('--threads-per-worker', type=int, default=1)
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent client threads')
+    parser.add_argument('--duration', type=float, default=15.0, help='Seconds per run')
+    parser.add_argument('--images', type=int, default=256, help='Distinct images cycled through')
+    args = parser.parse_args()
+
+    images = random_images(args.images)
+    header = f"{'workers':>7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}  memory per worker (RSS/PSS MB)"
+
+    if args.url:
+        rps, latencies, errors = run_load(args.url, args.clients, args.duration, images)
+        print(header)
+        print(f"{'-':>7} {rps:>8.1f} {np.percentile(latencies, 50):>8.1f} {np.percentile(latencies, 99):>8.1f} "
+              f"{errors:>6}")
+        return
+
+    cpu_count = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    if args.workers:
+        worker_counts = [int(w) for w in args.workers.split(',')]
+    else:
+        worker_counts = [w for w in (1, 2, 4, 8, 16, 32, 64) if w <= cpu_count] or [1]
+
+    print(f"{cpu_count} core(s), {args.clients} clients, {args.duration:.0f}s per run")
+    print(header)
+    env = dict(os.environ, EMBEDDING_CACHE_SIZE='0')
+    for workers in worker_counts:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        server = subprocess.Popen(
+            [sys.executable, 'serve.py', '--port', str(port), '--workers', str(workers),
+             '--threads-per-worker', str(args.threads_per_worker), '--checkpoint', os.path.abspath(args.checkpoint)],
+            cwd=SRC_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_ready(url)
+            rps, latencies, errors = run_load(url, args.clients, args.duration, images)
+            memory = [memory_kb(pid) for pid in worker_pids(server.pid)]
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        memory_text = ', '.join(f"{rss / 1024:.0f}/{pss / 1024:.0f}" for rss, pss in filter(None, memory))
+        p50, p99 = np.percentile(latencies, [50, 99]) if len(latencies) else (float('nan'), float('nan'))
+        print(f"{workers:>7} {rps:>8.1f} {p50:>8.1f} {p99:>8.1f} {errors:>6}  {memory_text}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""
+One-time build of the packed image cache used by CropDataset(image_cache=...).
+
+Usage:
+    python build_image_cache.py
+    python build_image_cache.py --csv ../data/crops_full.csv --output ../data/image_cache_64.npy --workers 8
+"""
+
+import argparse
+import time
+
+from dataset import build_image_cache
+
+# --- Configuration ---
+CSV_FILE = '../data/crops_full.csv'
+IMG_DIR = '../data'
+CACHE_PATH = '../data/image_cache_64.npy'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-decode manifest images into a memory-mapped cache.')
+    parser.add_argument('--csv', default=CSV_FILE, help='Manifest CSV')
+    parser.add_argument('--root', default=IMG_DIR, help='Directory image paths are relative to')
+    parser.add_argument('--output', default=CACHE_PATH, help='Output .npy cache path')
+    parser.add_argument('--size', type=int, default=64, help='Image side length')
+    parser.add_argument('--workers', type=int, default=4, help='Decoding processes')
+    args = parser.parse_args()
+
+    start_time = time.time()
+    build_image_cache(args.csv, args.root, args.output, image_size=args.size, num_workers=args.workers)
+    print(f"Cache written to {args.output} in {time.time() - start_time:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -20,6 +20,30 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def _env_int(name: str, default: int) -> int:
+    """Read an integer environment variable, falling back to default on bad values."""
+    value = os.environ.get(name)
+    if value is None or value.strip() == '':
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning(f"Invalid integer for {name}: {value!r}, using {default}")
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read a float environment variable, falling back to default on bad values."""
+    value = os.environ.get(name)
+    if value is None or value.strip() == '':
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning(f"Invalid number for {name}: {value!r}, using {default}")
+        return default
+
+
 @dataclass
 class Config:
     """Configuration class for application settings."""
@@ -28,12 +52,81 @@ class Config:
     SENTINEL_CLIENT_ID: Optional[str] = None
     SENTINEL_CLIENT_SECRET: Optional[str] = None
     
+    # Refresh the cached Sentinel Hub token this long before it expires
+    SENTINEL_TOKEN_REFRESH_MARGIN_SECONDS: float = 300.0
+    # API root (point at sentinel_stub.py for local testing)
+    SENTINEL_BASE_URL: str = 'https://services.sentinel-hub.com'
+    # Read timeout of Sentinel Hub calls (rendering a tile can take a while)
+    SENTINEL_TIMEOUT_SECONDS: float = 60.0
+    
+    # On-disk Sentinel-2 tile cache (0 MB disables) and the grid request centers snap to
+    TILE_CACHE_DIR: str = '../data/tile_cache'
+    TILE_CACHE_MAX_MB: int = 1024
+    TILE_GRID_DEGREES: float = 0.001
+    
     # OpenWeatherMap API key
     OPENWEATHER_API_KEY: Optional[str] = None
+    # Weather cache: locations kept (LRU), and how long past its 30 minute TTL an entry
+    # is still served while it is refreshed in the background
+    WEATHER_CACHE_MAX_ENTRIES: int = 10000
+    WEATHER_CACHE_STALE_SECONDS: float = 1800.0
+    # Where it lives: 'memory' (per process) or 'sqlite' (WEATHER_CACHE_PATH, shared by workers)
+    WEATHER_CACHE_BACKEND: str = 'memory'
+    WEATHER_CACHE_PATH: str = '../data/weather_cache.sqlite'
+    # Serve a fresh cached entry from a cell within this distance instead of fetching (0 disables)
+    WEATHER_REUSE_RADIUS_KM: float = 0.0
+    # /api/weather/batch: locations per request, and cells fetched in parallel
+    WEATHER_BATCH_MAX_LOCATIONS: int = 500
+    WEATHER_BATCH_CONCURRENCY: int = 8
     
     # Flask settings
     DEBUG: bool = False
     
+    # /predict: fill a missing temp from the OpenWeatherMap forecast for the field's lat/lon,
+    # waiting at most this long for it
+    WEATHER_FEATURES_ENABLED: bool = True
+    WEATHER_FEATURES_TIMEOUT_SECONDS: float = 3.0
+    
+    # Micro-batching for /predict inference
+    BATCH_MAX_SIZE: int = 16
+    BATCH_MAX_WAIT_MS: float = 5.0
+    
+    # /api/predict/batch settings
+    PREDICT_BATCH_CHUNK_SIZE: int = 64
+    PREDICT_BATCH_MAX_ITEMS: int = 2000
+    DECODE_WORKERS: int = 4
+    
+    # Backbone feature cache for repeated /predict images (0 entries disables)
+    EMBEDDING_CACHE_SIZE: int = 1024
+    EMBEDDING_CACHE_TTL_SECONDS: float = 3600.0
+    
+    # /api/predict/sweep limits
+    SWEEP_MAX_POINTS: int = 10000
+    SWEEP_CHUNK_SIZE: int = 4096
+    
+    # Inference runtime: 'eager' (checkpoint), 'torchscript' or 'onnx' (exported artifact)
+    MODEL_RUNTIME: str = 'eager'
+    MODEL_ARTIFACT: Optional[str] = None
+    # Eager checkpoint to serve (default: model_checkpoint_full.pth, else model_checkpoint.pth)
+    MODEL_CHECKPOINT: Optional[str] = None
+    # Load and warm the model before serving (otherwise it loads on the first request)
+    MODEL_WARMUP: bool = True
+    
+    # serve.py: worker processes and torch intra-op threads per worker (0 = derive from cores)
+    SERVE_WORKERS: int = 0
+    SERVE_THREADS_PER_WORKER: int = 0
+    
+    # asgi_app.py: threads running model inference, and the pooled upstream HTTP client's connection cap
+    ASGI_INFERENCE_THREADS: int = 8
+    UPSTREAM_MAX_CONNECTIONS: int = 100
+    
+    # Outbound HTTP (http_client.py): keep-alive connections per upstream host, connect
+    # timeout, and retries of transient upstream failures with their base backoff
+    HTTP_POOL_SIZE: int = 20
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    HTTP_MAX_RETRIES: int = 2
+    HTTP_BACKOFF_SECONDS: float = 0.5
+    
     @classmethod
     def load_from_env(cls) -> 'Config':
         """
@@ -45,8 +138,46 @@ class Config:
         config = cls(
             SENTINEL_CLIENT_ID=os.environ.get('SENTINEL_CLIENT_ID'),
             SENTINEL_CLIENT_SECRET=os.environ.get('SENTINEL_CLIENT_SECRET'),
+            SENTINEL_TOKEN_REFRESH_MARGIN_SECONDS=_env_float('SENTINEL_TOKEN_REFRESH_MARGIN_SECONDS',
+                                                             cls.SENTINEL_TOKEN_REFRESH_MARGIN_SECONDS),
+            SENTINEL_BASE_URL=os.environ.get('SENTINEL_BASE_URL') or cls.SENTINEL_BASE_URL,
+            SENTINEL_TIMEOUT_SECONDS=_env_float('SENTINEL_TIMEOUT_SECONDS', cls.SENTINEL_TIMEOUT_SECONDS),
+            TILE_CACHE_DIR=os.environ.get('TILE_CACHE_DIR') or cls.TILE_CACHE_DIR,
+            TILE_CACHE_MAX_MB=_env_int('TILE_CACHE_MAX_MB', cls.TILE_CACHE_MAX_MB),
+            TILE_GRID_DEGREES=_env_float('TILE_GRID_DEGREES', cls.TILE_GRID_DEGREES),
             OPENWEATHER_API_KEY=os.environ.get('OPENWEATHER_API_KEY'),
-            DEBUG=os.environ.get('FLASK_DEBUG', 'false').lower() == 'true'
+            WEATHER_CACHE_MAX_ENTRIES=_env_int('WEATHER_CACHE_MAX_ENTRIES', cls.WEATHER_CACHE_MAX_ENTRIES),
+            WEATHER_CACHE_STALE_SECONDS=_env_float('WEATHER_CACHE_STALE_SECONDS', cls.WEATHER_CACHE_STALE_SECONDS),
+            WEATHER_CACHE_BACKEND=os.environ.get('WEATHER_CACHE_BACKEND', cls.WEATHER_CACHE_BACKEND).strip().lower(),
+            WEATHER_CACHE_PATH=os.environ.get('WEATHER_CACHE_PATH') or cls.WEATHER_CACHE_PATH,
+            WEATHER_REUSE_RADIUS_KM=_env_float('WEATHER_REUSE_RADIUS_KM', cls.WEATHER_REUSE_RADIUS_KM),
+            WEATHER_BATCH_MAX_LOCATIONS=_env_int('WEATHER_BATCH_MAX_LOCATIONS', cls.WEATHER_BATCH_MAX_LOCATIONS),
+            WEATHER_BATCH_CONCURRENCY=_env_int('WEATHER_BATCH_CONCURRENCY', cls.WEATHER_BATCH_CONCURRENCY),
+            DEBUG=os.environ.get('FLASK_DEBUG', 'false').lower() == 'true',
+            WEATHER_FEATURES_ENABLED=os.environ.get('WEATHER_FEATURES_ENABLED', 'true').lower() == 'true',
+            WEATHER_FEATURES_TIMEOUT_SECONDS=_env_float('WEATHER_FEATURES_TIMEOUT_SECONDS',
+                                                        cls.WEATHER_FEATURES_TIMEOUT_SECONDS),
+            BATCH_MAX_SIZE=_env_int('BATCH_MAX_SIZE', cls.BATCH_MAX_SIZE),
+            BATCH_MAX_WAIT_MS=_env_float('BATCH_MAX_WAIT_MS', cls.BATCH_MAX_WAIT_MS),
+            PREDICT_BATCH_CHUNK_SIZE=_env_int('PREDICT_BATCH_CHUNK_SIZE', cls.PREDICT_BATCH_CHUNK_SIZE),
+            PREDICT_BATCH_MAX_ITEMS=_env_int('PREDICT_BATCH_MAX_ITEMS', cls.PREDICT_BATCH_MAX_ITEMS),
+            DECODE_WORKERS=_env_int('DECODE_WORKERS', cls.DECODE_WORKERS),
+            EMBEDDING_CACHE_SIZE=_env_int('EMBEDDING_CACHE_SIZE', cls.EMBEDDING_CACHE_SIZE),
+            EMBEDDING_CACHE_TTL_SECONDS=_env_float('EMBEDDING_CACHE_TTL_SECONDS', cls.EMBEDDING_CACHE_TTL_SECONDS),
+            SWEEP_MAX_POINTS=_env_int('SWEEP_MAX_POINTS', cls.SWEEP_MAX_POINTS),
+            SWEEP_CHUNK_SIZE=_env_int('SWEEP_CHUNK_SIZE', cls.SWEEP_CHUNK_SIZE),
+            MODEL_RUNTIME=os.environ.get('MODEL_RUNTIME', cls.MODEL_RUNTIME).strip().lower(),
+            MODEL_ARTIFACT=os.environ.get('MODEL_ARTIFACT') or None,
+            MODEL_CHECKPOINT=os.environ.get('MODEL_CHECKPOINT') or None,
+            MODEL_WARMUP=os.environ.get('MODEL_WARMUP', 'true').lower() == 'true',
+            SERVE_WORKERS=_env_int('SERVE_WORKERS', cls.SERVE_WORKERS),
+            SERVE_THREADS_PER_WORKER=_env_int('SERVE_THREADS_PER_WORKER', cls.SERVE_THREADS_PER_WORKER),
+            ASGI_INFERENCE_THREADS=_env_int('ASGI_INFERENCE_THREADS', cls.ASGI_INFERENCE_THREADS),
+            UPSTREAM_MAX_CONNECTIONS=_env_int('UPSTREAM_MAX_CONNECTIONS', cls.UPSTREAM_MAX_CONNECTIONS),
+            HTTP_POOL_SIZE=_env_int('HTTP_POOL_SIZE', cls.HTTP_POOL_SIZE),
+            HTTP_CONNECT_TIMEOUT_SECONDS=_env_float('HTTP_CONNECT_TIMEOUT_SECONDS', cls.HTTP_CONNECT_TIMEOUT_SECONDS),
+            HTTP_MAX_RETRIES=_env_int('HTTP_MAX_RETRIES', cls.HTTP_MAX_RETRIES),
+            HTTP_BACKOFF_SECONDS=_env_float('HTTP_BACKOFF_SECONDS', cls.HTTP_BACKOFF_SECONDS)
         )
         
         # Log warnings for missing credentials
@@ -1,20 +1,168 @@
 import torch
+import torch.nn.functional as F
 from torch.utils.data import Dataset
 from PIL import Image
+import numpy as np
 import pandas as pd
+import json
 import os
+from multiprocessing import Pool
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+def load_image_uint8(path, image_size=64):
+    """Decode an image and resize it to a uint8 [H, W, 3] array."""
+    with Image.open(path) as image:
+        image = image.convert('RGB').resize((image_size, image_size), Image.BILINEAR)
+        return np.asarray(image, dtype=np.uint8)
+
+
+def _load_cache_item(args):
+    return load_image_uint8(*args)
+
+
+def build_image_cache(csv_file, root_dir, cache_path, image_size=64, num_workers=4, chunk_size=1024):
+    """
+    Decode every image in a manifest once into a packed, memory-mappable cache.
+
+    Writes `cache_path` (.npy of uint8 [N, H, W, 3]) and `cache_path + '.index.json'`
+    mapping image_path -> row. Both files are written under temporary names
+    and renamed at the end, so an interrupted build never looks complete.
+
+    Args:
+        csv_file (string): Manifest with an image_path column.
+        root_dir (string): Directory image paths are relative to.
+        cache_path (string): Output .npy path.
+        image_size (int): Side length images are resized to.
+        num_workers (int): Decoding processes (0 decodes in-process).
+        chunk_size (int): Images decoded per pool round.
+    """
+    image_paths = pd.read_csv(csv_file, usecols=['image_path'])['image_path'].drop_duplicates().tolist()
+    tmp_path = cache_path + '.tmp.npy'
+    images = np.lib.format.open_memmap(
+        tmp_path, mode='w+', dtype=np.uint8, shape=(len(image_paths), image_size, image_size, 3)
+    )
+
+    pool = Pool(num_workers) if num_workers > 0 else None
+    try:
+        for start in range(0, len(image_paths), chunk_size):
+            batch = [(os.path.join(root_dir, p), image_size) for p in image_paths[start:start + chunk_size]]
+            decoded = pool.map(_load_cache_item, batch) if pool else [_load_cache_item(b) for b in batch]
+            images[start:start + len(decoded)] = np.stack(decoded)
+            print(f"Cached {start + len(decoded)}/{len(image_paths)} images")
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    images.flush()
+    del images
+    os.replace(tmp_path, cache_path)
+
+    index_tmp = cache_path + '.index.json.tmp'
+    with open(index_tmp, 'w') as f:
+        json.dump({'image_size': image_size, 'image_paths': image_paths}, f)
+    os.replace(index_tmp, cache_path + '.index.json')
+
+
+def normalize_batch(images, mean=IMAGENET_MEAN, std=IMAGENET_STD):
+    """
+    Normalize a uint8 [B, 3, H, W] batch in one vectorized op.
+
+    A float batch still in [0, 255] is accepted too, and scaled in place.
+
+    Equivalent to ToTensor() + Normalize(mean, std) applied per sample.
+    """
+    mean = torch.tensor(mean, device=images.device).view(1, 3, 1, 1)
+    std = torch.tensor(std, device=images.device).view(1, 3, 1, 1)
+    return (images.float().div_(255.0) - mean) / std
+
+
+class BatchCollate:
+    """
+    DataLoader collate_fn that preprocesses a whole batch of raw uint8 images at once.
+
+    Resizing, optional augmentation and normalization run as single tensor ops
+    over the batch instead of a per-sample transforms.Compose. Augmentations are
+    random horizontal/vertical flips and rot90, which keep overhead satellite
+    tiles realistic. With DataLoader workers this runs inside each worker.
+    """
+
+    def __init__(self, image_size=64, augment=False, mean=IMAGENET_MEAN, std=IMAGENET_STD):
+        """
+        Args:
+            image_size (int): Side length batches are resized to.
+            augment (bool): Apply random flips and rot90 per sample.
+            mean (tuple): Per-channel normalization mean.
+            std (tuple): Per-channel normalization std.
+        """
+        self.image_size = image_size
+        self.augment = augment
+        self.mean = mean
+        self.std = std
+
+    def _resize(self, images):
+        if images.shape[-2:] == (self.image_size, self.image_size):
+            return images
+        return F.interpolate(images, size=(self.image_size, self.image_size), mode='bilinear',
+                             align_corners=False, antialias=True)
+
+    def _augment(self, images):
+        batch_size = images.shape[0]
+        flip_h = torch.rand(batch_size) < 0.5
+        flip_v = torch.rand(batch_size) < 0.5
+        images = torch.where(flip_h.view(-1, 1, 1, 1), images.flip(-1), images)
+        images = torch.where(flip_v.view(-1, 1, 1, 1), images.flip(-2), images)
+        turns = torch.randint(0, 4, (batch_size,))
+        for k in (1, 2, 3):
+            mask = turns == k
+            if mask.any():
+                images[mask] = torch.rot90(images[mask], k, dims=(-2, -1))
+        return images
+
+    def __call__(self, samples):
+        images, tab_data, labels = zip(*samples)
+        if all(img.shape == images[0].shape for img in images):
+            batch = self._resize(torch.stack(images).float())
+        else:
+            batch = torch.cat([self._resize(img.unsqueeze(0).float()) for img in images])
+        if self.augment:
+            batch = self._augment(batch)
+        return normalize_batch(batch, self.mean, self.std), torch.stack(tab_data), torch.stack(labels)
+
 
 class CropDataset(Dataset):
-    def __init__(self, csv_file, root_dir, transform=None, crop_classes=None, tab_columns=None):
+    """
+    Satellite images joined with the manifest's tabular features and labels.
+
+    Samples are (image, tabular [F] float32, label) tuples. The image is what
+    `transform` returns for the decoded PIL image, or, without a transform, a
+    raw uint8 [3, H, W] tensor to be resized and normalized per batch by
+    BatchCollate. Callers that want PIL images, e.g. to apply torchvision PIL
+    transforms themselves, should pass those transforms as `transform`.
+    """
+
+    def __init__(self, csv_file, root_dir, transform=None, crop_classes=None, tab_columns=None, image_cache=None,
+                 share_memory=False):
         """
         Args:
             csv_file (string): Path to the csv file with annotations.
             root_dir (string): Directory with all the images.
-            transform (callable, optional): Optional transform to be applied on a sample.
+            transform (callable, optional): Optional transform applied to each
+                decoded PIL image. Without one, images are returned as raw uint8
+                [3, H, W] tensors for batch-level preprocessing with BatchCollate.
             crop_classes (list): List of class names to map to integers.
             tab_columns (list): List of columns to use as tabular features.
+            image_cache (string, optional): Path to a cache from build_image_cache().
+                Images are then served as uint8 [3, H, W] views of the memory-mapped
+                cache (normalize them per batch with normalize_batch); transform,
+                if given, still receives a PIL image.
+            share_memory (bool): Move the feature and label arrays into shared
+                memory so DataLoader workers started with 'spawn' map them
+                instead of receiving pickled copies.
         """
-        self.data_frame = pd.read_csv(csv_file)
         self.root_dir = root_dir
         self.transform = transform
         self.crop_classes = crop_classes
@@ -22,29 +170,57 @@ class CropDataset(Dataset):
         
         # Create class to index mapping
         self.class_to_idx = {cls_name: idx for idx, cls_name in enumerate(self.crop_classes)}
+        
+        # Extract columns once into contiguous arrays; the DataFrame is not kept,
+        # so workers index flat buffers instead of a pandas object graph
+        data_frame = pd.read_csv(csv_file, usecols=['image_path', 'crop_label'] + list(self.tab_columns))
+        self.image_paths = data_frame['image_path'].to_numpy(dtype=str)
+        self.tab_data = torch.from_numpy(
+            np.ascontiguousarray(data_frame[self.tab_columns].to_numpy(dtype=np.float32, copy=True))
+        )
+        label_idx = data_frame['crop_label'].map(self.class_to_idx)
+        if label_idx.isna().any():
+            unknown = sorted(data_frame.loc[label_idx.isna(), 'crop_label'].astype(str).unique())
+            raise ValueError(f"Unknown crop labels in {csv_file}: {unknown}")
+        self.labels = torch.from_numpy(label_idx.to_numpy(dtype=np.int64, copy=True))
+        del data_frame
+        if share_memory:
+            self.tab_data.share_memory_()
+            self.labels.share_memory_()
+        
+        self.image_cache = None
+        if image_cache is not None:
+            with open(image_cache + '.index.json') as f:
+                cache_index = json.load(f)
+            row_of = {path: row for row, path in enumerate(cache_index['image_paths'])}
+            missing = [p for p in self.image_paths if p not in row_of]
+            if missing:
+                raise ValueError(f"{len(missing)} images missing from cache {image_cache}, e.g. {missing[0]}")
+            self.cache_rows = np.array([row_of[p] for p in self.image_paths], dtype=np.int64)
+            # Copy-on-write mapping: pages are shared and read lazily, tensors are zero-copy views
+            self.image_cache = np.load(image_cache, mmap_mode='c')
 
     def __len__(self):
-        return len(self.data_frame)
+        return len(self.labels)
 
     def __getitem__(self, idx):
         if torch.is_tensor(idx):
             idx = idx.tolist()
 
-        # Load Image
-        img_name = os.path.join(self.root_dir, self.data_frame.iloc[idx]['image_path'])
-        image = Image.open(img_name).convert('RGB')
-
-        if self.transform:
-            image = self.transform(image)
-
-        # Load Tabular Data
-        # Extract specified columns and convert to float tensor
-        tab_data = self.data_frame.iloc[idx][self.tab_columns].values.astype('float32')
-        tab_data = torch.tensor(tab_data)
-
-        # Load Label
-        label_str = self.data_frame.iloc[idx]['crop_label']
-        label = self.class_to_idx[label_str]
-        label = torch.tensor(label, dtype=torch.long)
+        # Load Image: PIL for a transform, otherwise a raw uint8 [3, H, W] tensor
+        if self.image_cache is not None:
+            pixels = self.image_cache[self.cache_rows[idx]]
+            if self.transform:
+                image = self.transform(Image.fromarray(pixels))
+            else:
+                image = torch.from_numpy(pixels).permute(2, 0, 1)
+        else:
+            img_name = os.path.join(self.root_dir, self.image_paths[idx])
+            image = Image.open(img_name).convert('RGB')
+            if self.transform:
+                image = self.transform(image)
+            else:
+                image = torch.from_numpy(np.array(image, dtype=np.uint8)).permute(2, 0, 1)
 
-        return image, tab_data, label
+        # Tabular features and label are row views of the pre-extracted arrays
+        return image, self.tab_data[idx], self.labels[idx]
@@ -0,0 +1,143 @@
+"""
+Precomputed backbone embedding cache for head-only training.
+
+The frozen EfficientNet backbone is run once over every distinct image and
+its 1280-dim features are stored in a memory-mapped .npy keyed by
+image_path. The cache records a hash of the backbone weights, so changing
+the backbone invalidates it automatically.
+"""
+
+import os
+import json
+import hashlib
+from typing import Optional, Tuple, Dict
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import Dataset, DataLoader, Subset
+
+from dataset import CropDataset, BatchCollate
+
+
+def backbone_fingerprint(backbone: nn.Module) -> str:
+    """Hash the backbone's parameters and buffers (names, shapes, dtypes and values)."""
+    digest = hashlib.sha256()
+    for name, tensor in sorted(backbone.state_dict().items()):
+        tensor = tensor.detach().cpu().contiguous()
+        digest.update(name.encode())
+        digest.update(str(tuple(tensor.shape)).encode())
+        digest.update(str(tensor.dtype).encode())
+        digest.update(tensor.numpy().tobytes())
+    return digest.hexdigest()
+
+
+def load_embedding_cache(cache_path: str, fingerprint: str) -> Optional[Tuple[np.ndarray, Dict[str, int]]]:
+    """
+    Open an embedding cache if it exists and matches the backbone.
+
+    Returns:
+        (memory-mapped [N, D] float32 features, image_path -> row), or None
+        when the cache is missing or was built from different backbone weights
+    """
+    index_path = cache_path + '.index.json'
+    if not (os.path.exists(cache_path) and os.path.exists(index_path)):
+        return None
+    with open(index_path) as f:
+        index = json.load(f)
+    if index.get('backbone_hash') != fingerprint:
+        return None
+    features = np.load(cache_path, mmap_mode='r')
+    return features, {path: row for row, path in enumerate(index['image_paths'])}
+
+
+def build_embedding_cache(
+    backbone: nn.Module,
+    dataset: CropDataset,
+    cache_path: str,
+    device: torch.device,
+    feature_dim: int = 1280,
+    image_size: int = 64,
+    batch_size: int = 128,
+    num_workers: int = 0
+) -> Tuple[np.ndarray, Dict[str, int]]:
+    """
+    Run the backbone once over every distinct image in a dataset and store the features.
+
+    Args:
+        backbone: Image backbone producing [B, feature_dim] features
+        dataset: CropDataset returning raw uint8 images (no transform)
+        cache_path: Output .npy path; an .index.json is written next to it
+        device: Device to run the backbone on
+        feature_dim: Backbone output size
+        image_size: Side length images are resized to
+        batch_size: Images per forward pass
+        num_workers: DataLoader worker processes
+
+    Returns:
+        Same as load_embedding_cache()
+    """
+    fingerprint = backbone_fingerprint(backbone)
+
+    # One row per distinct image_path
+    first_index = {}
+    for idx, path in enumerate(dataset.image_paths):
+        first_index.setdefault(str(path), idx)
+    image_paths = list(first_index.keys())
+
+    loader = DataLoader(
+        Subset(dataset, list(first_index.values())),
+        batch_size=batch_size,
+        shuffle=False,
+        collate_fn=BatchCollate(image_size=image_size, augment=False),
+        num_workers=num_workers
+    )
+
+    tmp_path = cache_path + '.tmp.npy'
+    features = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32,
+                                         shape=(len(image_paths), feature_dim))
+    was_training = backbone.training
+    backbone.eval()
+    row = 0
+    with torch.no_grad():
+        for images, _, _ in loader:
+            feats = backbone(images.to(device)).cpu().numpy()
+            features[row:row + len(feats)] = feats
+            row += len(feats)
+            print(f"Embedded {row}/{len(image_paths)} images")
+    backbone.train(was_training)
+    features.flush()
+    del features
+    os.replace(tmp_path, cache_path)
+
+    index_tmp = cache_path + '.index.json.tmp'
+    with open(index_tmp, 'w') as f:
+        json.dump({'backbone_hash': fingerprint, 'image_size': image_size, 'image_paths': image_paths}, f)
+    os.replace(index_tmp, cache_path + '.index.json')
+
+    return load_embedding_cache(cache_path, fingerprint)
+
+
+class EmbeddingDataset(Dataset):
+    """
+    Serves (image features, tabular features, label) from an embedding cache.
+
+    Tabular data and labels come from the CropDataset's columnar arrays; image
+    features are read row by row from the memory-mapped cache.
+    """
+
+    def __init__(self, dataset: CropDataset, features: np.ndarray, row_of: Dict[str, int]):
+        missing = [p for p in dataset.image_paths if p not in row_of]
+        if missing:
+            raise ValueError(f"{len(missing)} images missing from embedding cache, e.g. {missing[0]}")
+        self.rows = np.array([row_of[p] for p in dataset.image_paths], dtype=np.int64)
+        self.features = features
+        self.tab_data = dataset.tab_data
+        self.labels = dataset.labels
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, idx):
+        img_feat = torch.from_numpy(np.array(self.features[self.rows[idx]]))
+        return img_feat, self.tab_data[idx], self.labels[idx]
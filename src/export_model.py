@@ -0,0 +1,66 @@
+"""
+Export a trained LiteGeoNet checkpoint for the optimized inference runtimes.
+
+TorchScript output is a single frozen .pt file; ONNX output is a directory
+with image_encoder.onnx, head.onnx and meta.json. After exporting, the
+artifact is reloaded and its logits are compared with the eager model.
+
+Serve the artifact by setting MODEL_RUNTIME=torchscript|onnx and
+MODEL_ARTIFACT=<path>.
+
+Usage:
+    python export_model.py --format torchscript --output model_litegeonet.pt
+    python export_model.py --format onnx --output model_litegeonet_onnx
+"""
+
+import argparse
+import time
+
+import torch
+
+from inference_runtime import load_checkpoint_model, load_model, export_torchscript, export_onnx
+
+# --- Configuration ---
+CHECKPOINT_PATH = 'model_checkpoint_full.pth'
+IMAGE_SIZE = 64
+PARITY_ATOL = 1e-4
+
+
+def check_parity(model, runtime, num_tabular_features, image_size, batch_size=8):
+    """Return the max absolute logit/gate difference between the eager model and a runtime."""
+    img = torch.randn(batch_size, 3, image_size, image_size)
+    tab = torch.randn(batch_size, num_tabular_features)
+    with torch.no_grad():
+        expected_logits, expected_gate = model(img, tab)
+        logits, gate = runtime(img, tab)
+    return max((logits - expected_logits).abs().max().item(), (gate - expected_gate).abs().max().item())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export LiteGeoNet to TorchScript or ONNX.')
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH, help='Model checkpoint')
+    parser.add_argument('--format', choices=['torchscript', 'onnx'], default='torchscript', help='Export format')
+    parser.add_argument('--output', default=None, help='Output .pt file (torchscript) or directory (onnx)')
+    parser.add_argument('--size', type=int, default=IMAGE_SIZE, help='Image side length used for tracing')
+    args = parser.parse_args()
+
+    output = args.output or ('model_litegeonet.pt' if args.format == 'torchscript' else 'model_litegeonet_onnx')
+    device = torch.device('cpu')
+    model, crop_classes, tab_columns = load_checkpoint_model(args.checkpoint, device)
+
+    start_time = time.time()
+    if args.format == 'torchscript':
+        export_torchscript(model, output, crop_classes, tab_columns, image_size=args.size)
+    else:
+        export_onnx(model, output, crop_classes, tab_columns, image_size=args.size)
+    print(f"Exported {args.format} model to {output} in {time.time() - start_time:.1f}s")
+
+    runtime, _, _ = load_model(args.format, args.checkpoint, output, device)
+    max_diff = check_parity(model, runtime, len(tab_columns), args.size)
+    print(f"Parity check: max abs difference {max_diff:.2e}")
+    if max_diff > PARITY_ATOL:
+        raise SystemExit(f"Exported model differs from the checkpoint by {max_diff:.2e} (> {PARITY_ATOL})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""
+Resolution of /predict tabular features.
+
+Values in the request form are used as given. A temp the caller left out is
+filled from WeatherService for the field's lat/lon. The Flask app requests
+the weather on a small thread pool as soon as the form is parsed, so the
+(usually cached) lookup overlaps image decoding instead of adding to it. The
+ASGI app awaits it on its async upstream client before inference, so no
+inference thread waits on OpenWeatherMap. rainfall is never filled: the
+model's rainfall is annual mm, which a 5 day forecast cannot measure.
+Anything still unknown falls back to 0.0, as before. Every feature reports
+where its value came from and, for weather, how old it is.
+"""
+
+import asyncio
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from config import config
+from weather_service import weather_service, WeatherServiceError
+
+logger = logging.getLogger(__name__)
+
+# Columns that can be filled from weather data
+WEATHER_COLUMNS = ('temp',)
+# Why a missing column is left at the default rather than filled from weather
+DEFAULT_REASONS = {
+    'rainfall': 'Annual rainfall cannot be derived from a 5 day forecast; send rainfall to use it',
+}
+DEFAULT_VALUE = 0.0
+FEATURE_WORKERS = 8
+
+_feature_pool = ThreadPoolExecutor(max_workers=FEATURE_WORKERS, thread_name_prefix='features')
+# Async lookups that outlived their request; they still finish and fill the cache
+_lookup_tasks = set()
+
+
+def is_missing(raw_value: Any) -> bool:
+    """Whether a form value counts as not supplied."""
+    return raw_value is None or (isinstance(raw_value, str) and not raw_value.strip())
+
+
+def weather_features(weather: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Model features derived from a get_weather_with_forecast() result.
+
+    temp is the mean daily temperature of the forecast (or the current
+    temperature without one).
+
+    Returns:
+        {column: {'value', 'source' ('forecast' or 'current'), 'basis'}}
+    """
+    features = {}
+    forecast = weather.get('forecast') or []
+    daily_means = [day['temp_mean'] if day.get('temp_mean') is not None else (day['temp_high'] + day['temp_low']) / 2
+                   for day in forecast]
+    if daily_means:
+        features['temp'] = {'value': round(sum(daily_means) / len(daily_means), 1), 'source': 'forecast',
+                            'basis': f'mean daily temperature over the {len(daily_means)} day forecast'}
+    elif weather.get('current'):
+        features['temp'] = {'value': weather['current']['temperature'], 'source': 'current',
+                            'basis': 'current temperature'}
+    return features
+
+
+def _timeout_error(timeout: Optional[float]) -> str:
+    return f'Weather not available within {timeout:g}s'
+
+
+class PendingFeatures:
+    """Tabular features of one request, with any weather lookup in flight."""
+
+    def __init__(self, tab_columns: Sequence[str], provided: Dict[str, float],
+                 location: Optional[Tuple[float, float]] = None, weather_error: Optional[str] = None):
+        self.tab_columns = list(tab_columns)
+        self.provided = provided
+        # (lat, lon) to look up weather for, if any is wanted
+        self.location = location
+        self.weather: Optional[Future] = None
+        self.weather_error = weather_error
+
+    def wait(self, timeout: Optional[float] = None) -> Tuple[List[float], Dict[str, Dict[str, Any]]]:
+        """
+        Finish resolution, waiting at most `timeout` seconds for the weather.
+
+        Returns:
+            (values in tab_columns order, {column: report}) where a report has
+            'value', 'source' ('form', 'forecast', 'current' or 'default'),
+            and for weather values 'basis' and 'age_seconds' (time since the
+            weather was fetched from OpenWeatherMap); a default for a weather
+            column carries the 'error' that prevented filling it, and one for
+            a column never filled from weather the 'reason'
+        """
+        resolved, age, error = {}, None, self.weather_error
+        if self.weather is not None:
+            try:
+                data, age = self.weather.result(timeout=timeout)
+                resolved = weather_features(data)
+            except FutureTimeoutError:
+                error = _timeout_error(timeout)
+            except WeatherServiceError as e:
+                error = str(e)
+            except Exception as e:
+                logger.warning(f"Weather features unavailable: {e}")
+                error = f'Weather lookup failed: {e}'
+
+        values, report = [], {}
+        for col in self.tab_columns:
+            if col in self.provided:
+                entry = {'value': self.provided[col], 'source': 'form'}
+            elif col in resolved:
+                entry = {**resolved[col], 'age_seconds': round(age, 1) if age is not None else None}
+            else:
+                entry = {'value': DEFAULT_VALUE, 'source': 'default'}
+                if col in WEATHER_COLUMNS and error:
+                    entry['error'] = error
+                elif col in DEFAULT_REASONS:
+                    entry['reason'] = DEFAULT_REASONS[col]
+            values.append(entry['value'])
+            report[col] = entry
+        return values, report
+
+
+def prepare_features(form: Mapping[str, Any], tab_columns: Sequence[str], service=None,
+                     enabled: Optional[bool] = None) -> PendingFeatures:
+    """
+    Parse supplied features and decide whether weather is needed, without fetching it.
+
+    Args:
+        form: Mapping of form fields
+        tab_columns: The model's tabular columns
+        service: WeatherService (default: the shared one)
+        enabled: Fill from weather at all (default WEATHER_FEATURES_ENABLED)
+
+    Raises:
+        ValueError: If a supplied value is not numeric
+    """
+    service = service or weather_service
+    enabled = config.WEATHER_FEATURES_ENABLED if enabled is None else enabled
+    provided = {col: float(form[col]) for col in tab_columns if not is_missing(form.get(col))}
+    wanted = [col for col in WEATHER_COLUMNS if col in tab_columns and col not in provided]
+    if not (wanted and enabled):
+        return PendingFeatures(tab_columns, provided)
+
+    try:
+        location = float(form.get('lat')), float(form.get('lon'))
+    except (TypeError, ValueError):
+        return PendingFeatures(tab_columns, provided, weather_error='No valid lat/lon to look up weather for')
+    if not service.is_configured():
+        return PendingFeatures(tab_columns, provided, weather_error='Weather service not configured')
+    return PendingFeatures(tab_columns, provided, location)
+
+
+def start_feature_resolution(form: Mapping[str, Any], tab_columns: Sequence[str], service=None,
+                             enabled: Optional[bool] = None) -> PendingFeatures:
+    """
+    Parse supplied features and start fetching weather for missing ones on a thread.
+
+    Arguments and errors as for prepare_features().
+    """
+    service = service or weather_service
+    pending = prepare_features(form, tab_columns, service, enabled)
+    if pending.location is not None:
+        pending.weather = _feature_pool.submit(service.get_weather_with_age, *pending.location)
+    return pending
+
+
+async def resolve_features_async(form: Mapping[str, Any], tab_columns: Sequence[str], client, service=None,
+                                 enabled: Optional[bool] = None, timeout: Optional[float] = None) -> PendingFeatures:
+    """
+    Parse supplied features and await the weather for missing ones on `client`.
+
+    The result's wait() returns at once. Other arguments and errors as for
+    prepare_features().
+
+    Args:
+        client: httpx.AsyncClient for the OpenWeatherMap requests
+        timeout: Seconds to wait for the weather (default
+            WEATHER_FEATURES_TIMEOUT_SECONDS)
+    """
+    service = service or weather_service
+    timeout = config.WEATHER_FEATURES_TIMEOUT_SECONDS if timeout is None else timeout
+    pending = prepare_features(form, tab_columns, service, enabled)
+    if pending.location is None:
+        return pending
+
+    # Shielded: a timeout must not cancel the cache's in-flight fetch, which other requests may share
+    lookup = asyncio.get_running_loop().create_task(service.get_weather_with_age_async(*pending.location, client))
+    _lookup_tasks.add(lookup)
+    lookup.add_done_callback(_lookup_tasks.discard)
+    weather = Future()
+    try:
+        weather.set_result(await asyncio.wait_for(asyncio.shield(lookup), timeout))
+    except asyncio.TimeoutError:
+        pending.weather_error = _timeout_error(timeout)
+        return pending
+    except Exception as e:
+        weather.set_exception(e)
+    pending.weather = weather
+    return pending
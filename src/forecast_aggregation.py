@@ -0,0 +1,201 @@
+"""
+Columnar daily aggregation of OpenWeatherMap /forecast responses.
+
+The 3-hourly items of one or many responses are flattened into numpy arrays
+(location, day, temperature, humidity, precipitation) and grouped by
+(location, day) with sort + reduceat, giving per day the high, low and mean
+temperature, total rain + snow, mean humidity, and the condition and icon of
+the day's first item. WeatherService uses it for every /forecast response;
+the same path aggregates bulk dumps (historic forecasts, thousands of
+locations) in one pass.
+
+Usage:
+    python forecast_aggregation.py dumps/forecasts.jsonl --output daily.csv
+    python forecast_aggregation.py forecasts.json --days 3
+"""
+
+import json
+import argparse
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+FORECAST_DAYS = 5
+OUTPUT_PATH = 'daily_forecast.csv'
+
+SECONDS_PER_DAY = 86400
+
+
+def forecast_columns(responses: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Flatten /forecast responses into columns, one row per 3-hourly item.
+
+    Args:
+        responses: Parsed /forecast responses ({'list': [...]}), one per location
+
+    Returns:
+        Dictionary of equal-length arrays: 'location' (index into
+        `responses`), 'day' (UTC day number, from the item's dt timestamp or
+        else its dt_txt), 'temp', 'humidity' (NaN when missing),
+        'precipitation' (rain + snow mm over 3 h), and 'items', the raw
+        items for reading conditions
+    """
+    items, locations = [], []
+    for location, response in enumerate(responses):
+        entries = response.get('list', [])
+        items.extend(entries)
+        locations.append(np.full(len(entries), location, dtype=np.int64))
+    count = len(items)
+    mains = [item['main'] for item in items]
+    try:
+        day = np.fromiter((item['dt'] for item in items), np.int64, count) // SECONDS_PER_DAY
+    except KeyError:
+        day = np.array([item['dt_txt'].split(' ', 1)[0] for item in items], dtype='datetime64[D]').astype(np.int64)
+    return {
+        'location': np.concatenate(locations) if locations else np.zeros(0, dtype=np.int64),
+        'day': day,
+        'temp': np.fromiter((main['temp'] for main in mains), np.float64, count),
+        'humidity': np.fromiter((main.get('humidity', np.nan) for main in mains), np.float64, count),
+        'precipitation': np.fromiter(((item['rain'].get('3h', 0.0) if item.get('rain') else 0.0)
+                                      + (item['snow'].get('3h', 0.0) if item.get('snow') else 0.0)
+                                      for item in items), np.float64, count),
+        'items': items
+    }
+
+
+def aggregate_daily(columns: Dict[str, Any], days: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Group forecast columns by (location, day).
+
+    Days of a location keep the order they first appear in its response, and
+    only the first `days` of each location are kept (all if None).
+
+    Returns:
+        Dictionary of arrays, one row per location and day: 'location',
+        'date', 'temp_high', 'temp_low', 'temp_mean', 'precipitation_mm',
+        'humidity_mean' (NaN when no item has humidity), 'condition', 'icon'
+    """
+    location, day = columns['location'], columns['day']
+    count = len(location)
+    if count == 0:
+        empty = np.zeros(0)
+        return {'location': np.zeros(0, dtype=np.int64), 'date': np.zeros(0, dtype='datetime64[D]'),
+                'temp_high': empty, 'temp_low': empty, 'temp_mean': empty, 'precipitation_mm': empty,
+                'humidity_mean': empty, 'condition': np.zeros(0, dtype=object), 'icon': np.zeros(0, dtype=object)}
+
+    # Sort by location, day, then position, so each group starts at its first item.
+    # Responses are normally chronological already, which needs no sort at all.
+    in_order = bool(np.all((location[1:] > location[:-1])
+                           | ((location[1:] == location[:-1]) & (day[1:] >= day[:-1]))))
+    humidity = columns['humidity']
+    has_humidity = ~np.isnan(humidity)
+    # temp, humidity, humidity count, precipitation: summed per group in one reduceat
+    values = np.column_stack((columns['temp'], np.where(has_humidity, humidity, 0.0), has_humidity,
+                              columns['precipitation']))
+    if in_order:
+        order = np.arange(count)
+    else:
+        order = np.lexsort((np.arange(count), day, location))
+        location, day, values = location[order], day[order], values[order]
+    starts = np.flatnonzero(np.r_[True, (location[1:] != location[:-1]) | (day[1:] != day[:-1])])
+    first = order[starts]
+
+    # Back to first-appearance order within each location, then keep `days` per location
+    group_location = location[starts]
+    groups = np.arange(len(starts)) if in_order else np.lexsort((first, group_location))
+    if days is not None:
+        ordered_location = group_location[groups]
+        rank = np.arange(len(groups)) - np.searchsorted(ordered_location, ordered_location, side='left')
+        groups = groups[rank < days]
+
+    sums = np.add.reduceat(values, starts, axis=0)[groups]
+    sizes = np.diff(np.r_[starts, count])[groups]
+    temp = values[:, 0]
+    first_items = [columns['items'][i] for i in first[groups]]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        humidity_mean = sums[:, 1] / sums[:, 2]
+    return {
+        'location': group_location[groups],
+        'date': day[starts][groups].astype('datetime64[D]'),
+        'temp_high': np.maximum.reduceat(temp, starts)[groups],
+        'temp_low': np.minimum.reduceat(temp, starts)[groups],
+        'temp_mean': sums[:, 0] / sizes,
+        'precipitation_mm': sums[:, 3],
+        'humidity_mean': humidity_mean,
+        'condition': np.array([item['weather'][0]['main'] for item in first_items], dtype=object),
+        'icon': np.array([item['weather'][0]['icon'] for item in first_items], dtype=object)
+    }
+
+
+def daily_rows(data: Dict[str, Any], days: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Daily aggregates of a single /forecast response.
+
+    Returns:
+        One dict per day with the aggregate_daily() fields (date as
+        'YYYY-MM-DD', values rounded to 1 decimal, humidity_mean None if unknown)
+    """
+    daily = aggregate_daily(forecast_columns([data]), days)
+    return [{
+        'date': str(date),
+        'temp_high': round(high, 1),
+        'temp_low': round(low, 1),
+        'temp_mean': round(mean, 1),
+        'precipitation_mm': round(precipitation, 1),
+        'humidity_mean': None if humidity != humidity else round(humidity, 1),
+        'condition': condition,
+        'icon': icon
+    } for date, high, low, mean, precipitation, humidity, condition, icon in zip(
+        daily['date'], daily['temp_high'].tolist(), daily['temp_low'].tolist(), daily['temp_mean'].tolist(),
+        daily['precipitation_mm'].tolist(), daily['humidity_mean'].tolist(), daily['condition'], daily['icon'])]
+
+
+def load_forecasts(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Read a bulk forecast dump.
+
+    Accepts JSON lines (one /forecast response per line), a JSON list of
+    responses, or a JSON object mapping a location key to its response.
+
+    Returns:
+        Dictionary of location key (given, or the list/line index) to response
+    """
+    with open(path) as f:
+        if path.endswith('.jsonl'):
+            return {str(i): json.loads(line) for i, line in enumerate(f) if line.strip()}
+        data = json.load(f)
+    if isinstance(data, dict) and 'list' not in data:
+        return data
+    return {str(i): response for i, response in enumerate(data if isinstance(data, list) else [data])}
+
+
+def aggregate_forecast_file(path: str, days: Optional[int] = FORECAST_DAYS) -> pd.DataFrame:
+    """
+    Daily aggregates of every response in a bulk forecast dump (see load_forecasts).
+
+    Returns:
+        DataFrame with one row per location and day: 'location' (the key in
+        the dump) and the aggregate_daily() columns
+    """
+    forecasts = load_forecasts(path)
+    daily = aggregate_daily(forecast_columns(forecasts.values()), days)
+    keys = np.array(list(forecasts), dtype=object)
+    return pd.DataFrame({**daily, 'location': keys[daily['location']]})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Aggregate bulk OpenWeatherMap forecast dumps into daily rows.')
+    parser.add_argument('path', help='.jsonl (one /forecast response per line) or .json (list or {key: response})')
+    parser.add_argument('--days', type=int, default=FORECAST_DAYS, help='Days kept per location (0 = all)')
+    parser.add_argument('--output', default=OUTPUT_PATH, help='CSV to write')
+    args = parser.parse_args()
+
+    daily = aggregate_forecast_file(args.path, args.days or None)
+    daily.round(1).to_csv(args.output, index=False)
+    print(f"{daily['location'].nunique()} locations, {len(daily)} daily rows written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+"""
+Shared outbound HTTP layer for GeoCrop Predictor.
+
+Every upstream integration (Sentinel Hub, OpenWeatherMap, Gemini) goes
+through one HttpClient: a requests.Session whose adapter keeps a pool of
+keep-alive connections per host, so repeat calls skip the TCP and TLS
+handshakes. Each client applies default (connect, read) timeouts and a retry
+policy with exponential backoff, and records per-upstream latency and error
+metrics that /api/health reports.
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import config
+from metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+# Latency histogram bucket upper bounds (ms)
+LATENCY_MS_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    When and how long to wait before repeating a request.
+
+    Only methods in `methods` are retried, on connection failures (including
+    connect timeouts) and on `statuses`. Read timeouts are never retried: the
+    upstream received the request and is slow, and asking again only makes
+    the caller wait longer.
+    """
+    max_retries: int = 2
+    backoff_seconds: float = 0.5
+    max_backoff_seconds: float = 10.0
+    statuses: FrozenSet[int] = frozenset({502, 503, 504})
+    methods: FrozenSet[str] = frozenset({'GET', 'HEAD'})
+
+    def delay(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        """Seconds to sleep before retry number `attempt` (0-based); Retry-After wins when present."""
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(self.max_backoff_seconds, max(0.0, float(retry_after)))
+            except ValueError:
+                pass
+        return min(self.max_backoff_seconds, self.backoff_seconds * (2 ** attempt) * random.uniform(0.5, 1.0))
+
+
+NO_RETRIES = RetryPolicy(max_retries=0)
+
+
+class HttpClient:
+    """
+    Pooled, instrumented HTTP client for one upstream service.
+
+    Thread-safe: requests go through one shared Session, whose connection
+    pools hand each thread its own connection.
+    """
+
+    def __init__(self, name: str, timeout: Timeout = 30.0, retry: RetryPolicy = RetryPolicy(),
+                 pool_size: Optional[int] = None):
+        """
+        Initialize HttpClient.
+
+        Args:
+            name: Upstream name used in metrics and logs
+            timeout: Default read timeout in seconds, or a (connect, read) tuple;
+                the connect timeout defaults to HTTP_CONNECT_TIMEOUT_SECONDS
+            retry: Retry policy for this upstream
+            pool_size: Keep-alive connections per host (default HTTP_POOL_SIZE)
+        """
+        self.name = name
+        self.timeout = self._timeout(timeout)
+        self.retry = retry
+        self.pool_size = pool_size or config.HTTP_POOL_SIZE
+        self.latency_hist = Histogram(LATENCY_MS_BUCKETS)
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._retries = 0
+        self._errors = 0
+        self._status_counts: Dict[str, int] = {}
+        self.session = self._new_session()
+
+    @staticmethod
+    def _timeout(timeout: Timeout) -> Tuple[float, float]:
+        if isinstance(timeout, tuple):
+            return timeout
+        return (config.HTTP_CONNECT_TIMEOUT_SECONDS, float(timeout))
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        # Retries are handled in request() so they show up in the metrics
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=self.pool_size, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def reset(self) -> None:
+        """Drop pooled connections (e.g. after fork, so processes never share a socket)."""
+        self.session = self._new_session()
+
+    def close(self) -> None:
+        self.session.close()
+
+    def _record(self, status: Optional[int], elapsed_ms: float, retried: bool) -> None:
+        label = f"{status // 100}xx" if status is not None else 'error'
+        self.latency_hist.observe(elapsed_ms)
+        with self._lock:
+            self._status_counts[label] = self._status_counts.get(label, 0) + 1
+            if retried:
+                self._retries += 1
+
+    def request(self, method: str, url: str, timeout: Optional[Timeout] = None, **kwargs) -> requests.Response:
+        """
+        Send a request with this upstream's timeouts and retry policy.
+
+        Args:
+            method: HTTP method
+            url: Absolute URL
+            timeout: Override of the client's default timeout
+            **kwargs: Passed to requests.Session.request
+
+        Returns:
+            The final response (callers still check its status)
+
+        Raises:
+            requests.RequestException: If the last attempt fails to get a response
+        """
+        method = method.upper()
+        timeout = self._timeout(timeout) if timeout is not None else self.timeout
+        retryable = method in self.retry.methods
+        with self._lock:
+            self._requests += 1
+
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, timeout=timeout, **kwargs)
+            except requests.RequestException as e:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                # ReadTimeout is not a ConnectionError; ConnectTimeout is both
+                can_retry = (retryable and attempt < self.retry.max_retries
+                             and isinstance(e, requests.ConnectionError))
+                self._record(None, elapsed_ms, can_retry)
+                if not can_retry:
+                    with self._lock:
+                        self._errors += 1
+                    logger.warning(f"{self.name} {method} failed after {attempt + 1} attempt(s): {e}")
+                    raise
+                delay = self.retry.delay(attempt)
+            else:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                can_retry = (retryable and attempt < self.retry.max_retries
+                             and response.status_code in self.retry.statuses)
+                self._record(response.status_code, elapsed_ms, can_retry)
+                if not can_retry:
+                    if response.status_code >= 500:
+                        with self._lock:
+                            self._errors += 1
+                    return response
+                delay = self.retry.delay(attempt, response)
+                response.close()
+            logger.info(f"{self.name} {method} retry {attempt + 1}/{self.retry.max_retries} in {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get upstream statistics.
+
+        Returns:
+            Dictionary with request, retry and error counters, responses by
+            status class and the per-attempt latency histogram (ms)
+        """
+        with self._lock:
+            return {
+                'requests': self._requests,
+                'retries': self._retries,
+                'errors': self._errors,
+                'responses': dict(self._status_counts),
+                'timeout_seconds': {'connect': self.timeout[0], 'read': self.timeout[1]},
+                'latency_ms': self.latency_hist.snapshot()
+            }
+
+
+# Registry of the process's upstream clients, by name
+_clients: Dict[str, HttpClient] = {}
+_clients_lock = threading.Lock()
+
+
+def client_for(name: str, **kwargs) -> HttpClient:
+    """
+    The shared client for an upstream, created on first use.
+
+    Args:
+        name: Upstream name
+        **kwargs: HttpClient options, used only when the client is created
+
+    Returns:
+        HttpClient registered under `name`
+    """
+    with _clients_lock:
+        if name not in _clients:
+            _clients[name] = HttpClient(name, **kwargs)
+        return _clients[name]
+
+
+def upstream_stats() -> Dict[str, Any]:
+    """Statistics of every registered upstream client."""
+    with _clients_lock:
+        clients = list(_clients.values())
+    return {client.name: client.stats() for client in clients}
+
+
+def _reset_after_fork() -> None:
+    # serve.py forks workers after importing the app; a worker must not reuse
+    # a keep-alive socket opened by its parent
+    for client in list(_clients.values()):
+        client.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
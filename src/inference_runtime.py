@@ -0,0 +1,323 @@
+"""
+Inference runtimes for GeoCrop Predictor.
+
+LiteGeoNet can be served as the eager PyTorch module, as a frozen TorchScript
+artifact (traced, with conv/BN folding and no Python dispatch per layer) or
+as ONNX graphs run by onnxruntime. Every runtime exposes the same calls the
+server uses: model(img, tab), encode_image, forward_head and
+forward_broadcast.
+"""
+
+import os
+import json
+import time
+import logging
+import zipfile
+import warnings
+import threading
+from typing import List, Optional, Tuple
+
+import torch
+import torch.nn as nn
+
+from model import LiteGeoNet
+
+logger = logging.getLogger(__name__)
+
+RUNTIMES = ('eager', 'torchscript', 'onnx')
+
+ONNX_IMAGE_ENCODER = 'image_encoder.onnx'
+ONNX_HEAD = 'head.onnx'
+META_FILE = 'meta.json'
+
+
+def load_checkpoint_model(checkpoint_path: str, device: torch.device) -> Tuple[LiteGeoNet, List[str], List[str]]:
+    """
+    Build the eager LiteGeoNet from a training checkpoint.
+
+    The model is built without pretrained weights (the checkpoint overwrites
+    them anyway), and the memory-mapped state dict is assigned rather than
+    copied, so on CPU the parameters stay backed by the checkpoint file.
+    """
+    checkpoint = torch.load(checkpoint_path, map_location=device, mmap=True, weights_only=True)
+    crop_classes = checkpoint['crop_classes']
+    tab_columns = checkpoint['tab_columns']
+
+    model = LiteGeoNet(num_classes=len(crop_classes), num_tabular_features=len(tab_columns), pretrained=False)
+    model.load_state_dict(checkpoint['model_state_dict'], assign=True)
+    model.to(device)
+    model.eval()
+    return model, crop_classes, tab_columns
+
+
+# --- Export ---
+class _ImageEncoder(nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, img):
+        return self.model.encode_image(img)
+
+
+class _Head(nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, img_feat, tab_data):
+        return self.model.forward_head(img_feat, tab_data)
+
+
+def _example_inputs(model: LiteGeoNet, num_tabular_features: int, image_size: int):
+    img = torch.randn(2, 3, image_size, image_size)
+    tab = torch.randn(2, num_tabular_features)
+    with torch.no_grad():
+        img_feat = model.encode_image(img)
+    return img, tab, img_feat
+
+
+def export_torchscript(model: LiteGeoNet, output_path: str, crop_classes: List[str], tab_columns: List[str],
+                       image_size: int = 64, quantized_engine: Optional[str] = None) -> None:
+    """
+    Trace forward, encode_image and forward_head into one frozen TorchScript file.
+
+    Class names and tabular columns are stored in the archive as meta.json,
+    along with the quantized engine for int8 models from quantization.py.
+    """
+    model = model.cpu().eval()
+    img, tab, img_feat = _example_inputs(model, len(tab_columns), image_size)
+    with torch.no_grad(), warnings.catch_warnings():
+        # The single-image broadcast branch in fuse_and_classify is not traced;
+        # TorchScriptRuntime.forward_broadcast expands the embedding instead
+        warnings.simplefilter('ignore', torch.jit.TracerWarning)
+        # Recent torch releases flag the torch.jit API as deprecated; it is still supported
+        warnings.simplefilter('ignore', FutureWarning)
+        traced = torch.jit.trace_module(model, {
+            'forward': (img, tab),
+            'encode_image': (img,),
+            'forward_head': (img_feat, tab)
+        })
+        frozen = torch.jit.freeze(traced, preserved_attrs=['encode_image', 'forward_head'])
+
+        meta = {'crop_classes': crop_classes, 'tab_columns': tab_columns, 'image_size': image_size}
+        if quantized_engine:
+            meta['quantized_engine'] = quantized_engine
+        torch.jit.save(frozen, output_path, _extra_files={META_FILE: json.dumps(meta)})
+
+
+def export_onnx(model: LiteGeoNet, output_dir: str, crop_classes: List[str], tab_columns: List[str],
+                image_size: int = 64, opset: int = 17) -> None:
+    """
+    Export the image encoder and the fusion head as two ONNX graphs with a dynamic batch axis.
+
+    Writes image_encoder.onnx, head.onnx and meta.json into output_dir.
+    """
+    model = model.cpu().eval()
+    img, tab, img_feat = _example_inputs(model, len(tab_columns), image_size)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Wrappers must be in eval mode: export restores the wrapper's training flag recursively
+    encoder = _ImageEncoder(model).eval()
+    head = _Head(model).eval()
+    with torch.no_grad(), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        torch.onnx.export(
+            encoder, (img,), os.path.join(output_dir, ONNX_IMAGE_ENCODER),
+            input_names=['image'], output_names=['img_feat'],
+            dynamic_axes={'image': {0: 'batch'}, 'img_feat': {0: 'batch'}},
+            opset_version=opset, dynamo=False
+        )
+        torch.onnx.export(
+            head, (img_feat, tab), os.path.join(output_dir, ONNX_HEAD),
+            input_names=['img_feat', 'tab_data'], output_names=['logits', 'gate_weights'],
+            dynamic_axes={'img_feat': {0: 'batch'}, 'tab_data': {0: 'batch'},
+                          'logits': {0: 'batch'}, 'gate_weights': {0: 'batch'}},
+            opset_version=opset, dynamo=False
+        )
+
+    meta = {'crop_classes': crop_classes, 'tab_columns': tab_columns, 'image_size': image_size}
+    with open(os.path.join(output_dir, META_FILE), 'w') as f:
+        json.dump(meta, f)
+
+
+# --- Runtimes ---
+class TorchScriptRuntime:
+    """Serves a frozen TorchScript artifact from export_torchscript()."""
+
+    def __init__(self, path: str, device: torch.device):
+        self.meta = self._read_meta(path)
+        # Packed int8 weights are re-packed at load time for the active engine
+        if self.meta.get('quantized_engine'):
+            torch.backends.quantized.engine = self.meta['quantized_engine']
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', FutureWarning)
+            self.module = torch.jit.load(path, map_location=device)
+        self.module.eval()
+
+    @staticmethod
+    def _read_meta(path):
+        # TorchScript archives are zip files with extra files under <archive>/extra/
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                if name.endswith('/extra/' + META_FILE):
+                    return json.loads(archive.read(name))
+        raise ValueError(f"{path} has no {META_FILE}; export it with export_model.py")
+
+    def __call__(self, img, tab_data):
+        return self.module(img, tab_data)
+
+    def encode_image(self, img):
+        return self.module.encode_image(img)
+
+    def forward_head(self, img_feat, tab_data):
+        return self.module.forward_head(img_feat, tab_data)
+
+    def forward_broadcast(self, img_feat, tab_data):
+        if img_feat.shape[0] != 1:
+            raise ValueError(f"forward_broadcast expects a single image embedding, got {img_feat.shape[0]}")
+        return self.module.forward_head(img_feat.expand(tab_data.shape[0], -1), tab_data)
+
+
+class OnnxRuntime:
+    """Serves the ONNX graphs from export_onnx() with onnxruntime (CPU)."""
+
+    def __init__(self, path: str, num_threads: int = 0):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("The 'onnx' runtime requires onnxruntime (pip install onnxruntime)")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        providers = ['CPUExecutionProvider']
+        self.encoder = ort.InferenceSession(os.path.join(path, ONNX_IMAGE_ENCODER), options, providers=providers)
+        self.head = ort.InferenceSession(os.path.join(path, ONNX_HEAD), options, providers=providers)
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+
+    def __call__(self, img, tab_data):
+        return self.forward_head(self.encode_image(img), tab_data)
+
+    def encode_image(self, img):
+        (img_feat,) = self.encoder.run(None, {'image': img.detach().cpu().numpy()})
+        return torch.from_numpy(img_feat)
+
+    def forward_head(self, img_feat, tab_data):
+        logits, gate_weights = self.head.run(None, {
+            'img_feat': img_feat.detach().cpu().numpy(),
+            'tab_data': tab_data.detach().cpu().numpy()
+        })
+        return torch.from_numpy(logits), torch.from_numpy(gate_weights)
+
+    def forward_broadcast(self, img_feat, tab_data):
+        if img_feat.shape[0] != 1:
+            raise ValueError(f"forward_broadcast expects a single image embedding, got {img_feat.shape[0]}")
+        return self.forward_head(img_feat.expand(tab_data.shape[0], -1), tab_data)
+
+
+class ModelService:
+    """
+    Lazily loaded model shared by the server.
+
+    Constructing the service loads nothing; the model is loaded once, on the
+    first access to model/crop_classes/tab_columns or an explicit warmup(),
+    so importing the app (or a test that imports it) stays cheap.
+    """
+
+    def __init__(self, runtime: str, checkpoint_path: str, artifact_path: Optional[str], device: torch.device,
+                 image_size: int = 64):
+        """
+        Initialize ModelService.
+
+        Args:
+            runtime: 'eager', 'torchscript' or 'onnx'
+            checkpoint_path: Training checkpoint (used by the eager runtime)
+            artifact_path: Exported artifact (used by the torchscript and onnx runtimes)
+            device: Inference device
+            image_size: Side length of the dummy images used by warmup()
+        """
+        self.runtime = runtime
+        self.checkpoint_path = checkpoint_path
+        self.artifact_path = artifact_path
+        self.device = device
+        self.image_size = image_size
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self._loaded = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Tuple[object, List[str], List[str]]:
+        """Load the model if needed and return (model, crop_classes, tab_columns)."""
+        if self._loaded is None:
+            with self._lock:
+                if self._loaded is None:
+                    source = self.checkpoint_path if self.runtime == 'eager' else self.artifact_path
+                    logger.info(f"Loading {self.runtime} model from {source}")
+                    start = time.perf_counter()
+                    self._loaded = load_model(self.runtime, self.checkpoint_path, self.artifact_path, self.device)
+                    self.load_seconds = time.perf_counter() - start
+                    logger.info(f"Model loaded in {self.load_seconds:.2f}s")
+        return self._loaded
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded is not None
+
+    @property
+    def model(self):
+        return self.load()[0]
+
+    @property
+    def crop_classes(self) -> List[str]:
+        return self.load()[1]
+
+    @property
+    def tab_columns(self) -> List[str]:
+        return self.load()[2]
+
+    def warmup(self, batch_sizes=(1,)) -> None:
+        """Load the model and run dummy batches so the first request does not pay for it."""
+        model, _, tab_columns = self.load()
+        start = time.perf_counter()
+        with torch.no_grad():
+            for batch_size in batch_sizes:
+                img = torch.zeros(batch_size, 3, self.image_size, self.image_size, device=self.device)
+                tab = torch.zeros(batch_size, len(tab_columns), device=self.device)
+                model(img, tab)
+        self.warmup_seconds = time.perf_counter() - start
+
+    def stats(self) -> dict:
+        """Runtime, load state and load/warm-up timings."""
+        return {
+            'runtime': self.runtime,
+            'loaded': self.is_loaded,
+            'load_seconds': round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            'warmup_seconds': round(self.warmup_seconds, 3) if self.warmup_seconds is not None else None
+        }
+
+
+def load_model(runtime: str, checkpoint_path: str, artifact_path: str, device: torch.device):
+    """
+    Load LiteGeoNet with the requested runtime.
+
+    Args:
+        runtime: 'eager', 'torchscript' or 'onnx'
+        checkpoint_path: Training checkpoint (used by the eager runtime)
+        artifact_path: Exported artifact (used by the torchscript and onnx runtimes)
+        device: Device for eager/TorchScript inference (onnx runs on CPU)
+
+    Returns:
+        Tuple of (model, crop_classes, tab_columns)
+    """
+    if runtime == 'eager':
+        return load_checkpoint_model(checkpoint_path, device)
+    if runtime == 'torchscript':
+        model = TorchScriptRuntime(artifact_path, device)
+    elif runtime == 'onnx':
+        model = OnnxRuntime(artifact_path)
+    else:
+        raise ValueError(f"Unknown model runtime '{runtime}', expected one of {RUNTIMES}")
+    return model, model.meta['crop_classes'], model.meta['tab_columns']
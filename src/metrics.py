@@ -0,0 +1,67 @@
+"""
+Lightweight metrics primitives shared by the inference and HTTP layers.
+"""
+
+import threading
+from collections import deque
+from typing import Any, Dict, List, Sequence
+
+
+class Histogram:
+    """Thread-safe bucketed histogram with a window of recent samples for percentiles."""
+
+    def __init__(self, buckets: Sequence[float], window: int = 2048):
+        """
+        Initialize Histogram.
+
+        Args:
+            buckets: Sorted bucket upper bounds (an overflow bucket is added)
+            window: Number of recent observations kept for percentile estimates
+        """
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._recent = deque(maxlen=window)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Record a single observation."""
+        with self._lock:
+            index = len(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    index = i
+                    break
+            self._counts[index] += 1
+            self._recent.append(value)
+            self._count += 1
+            self._sum += value
+
+    def _percentile(self, values: List[float], pct: float) -> float:
+        if not values:
+            return 0.0
+        rank = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+        return values[rank]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get a point-in-time view of the histogram.
+
+        Returns:
+            Dictionary with count, mean, p50/p95/p99 and per-bucket counts
+        """
+        with self._lock:
+            recent = sorted(self._recent)
+            counts = list(self._counts)
+            count, total = self._count, self._sum
+
+        labels = [f"le_{bound:g}" for bound in self.buckets] + ['overflow']
+        return {
+            'count': count,
+            'mean': round(total / count, 3) if count else 0.0,
+            'p50': round(self._percentile(recent, 50), 3),
+            'p95': round(self._percentile(recent, 95), 3),
+            'p99': round(self._percentile(recent, 99), 3),
+            'buckets': dict(zip(labels, counts))
+        }
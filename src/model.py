@@ -3,12 +3,14 @@ import torch.nn as nn
 import timm
 
 class LiteGeoNet(nn.Module):
-    def __init__(self, num_classes=3, num_tabular_features=8):
+    def __init__(self, num_classes=3, num_tabular_features=8, pretrained=True):
         super(LiteGeoNet, self).__init__()
         
         # 1. Image Backbone (EfficientNet-B0)
-        # We use a pretrained model and remove the classifier
-        self.backbone = timm.create_model('efficientnet_b0', pretrained=True, num_classes=0)
+        # We use a pretrained model and remove the classifier.
+        # Pass pretrained=False when a checkpoint will be loaded anyway:
+        # this skips downloading ImageNet weights that would be overwritten
+        self.backbone = timm.create_model('efficientnet_b0', pretrained=pretrained, num_classes=0)
         # EfficientNet-B0 outputs 1280 dim features
         self.img_feature_dim = 1280
         
@@ -50,15 +52,34 @@ class LiteGeoNet(nn.Module):
         )
 
     def forward(self, img, tab_data):
+        return self.forward_head(self.encode_image(img), tab_data)
+
+    def encode_image(self, img):
         # Extract Image Features
-        img_feat = self.backbone(img) # [Batch, 1280]
-        
+        return self.backbone(img) # [Batch, 1280]
+
+    def encode_tabular(self, tab_data):
         # Extract Tabular Features
-        tab_feat = self.tab_mlp(tab_data) # [Batch, 32]
-        
+        return self.tab_mlp(tab_data) # [Batch, 32]
+
+    def forward_head(self, img_feat, tab_data):
+        # Everything after the backbone, so precomputed image features can be reused
+        return self.fuse_and_classify(img_feat, self.encode_tabular(tab_data))
+
+    def forward_broadcast(self, img_feat, tab_data):
+        # Score one image embedding [1, 1280] against many tabular rows [N, F],
+        # e.g. a soil-parameter sweep: one backbone pass, one batched head pass
+        if img_feat.shape[0] != 1:
+            raise ValueError(f"forward_broadcast expects a single image embedding, got {img_feat.shape[0]}")
+        return self.forward_head(img_feat, tab_data)
+
+    def fuse_and_classify(self, img_feat, tab_feat):
+        # img_feat [B or 1, 1280], tab_feat [B, 32]; a single image row is broadcast
         # Project to common dimension
         img_emb = self.img_project(img_feat) # [Batch, 64]
         tab_emb = self.tab_project(tab_feat) # [Batch, 64]
+        if img_emb.shape[0] == 1 and tab_emb.shape[0] > 1:
+            img_emb = img_emb.expand(tab_emb.shape[0], -1)
         
         # Calculate Gating Weights
         # Concatenate embeddings to decide weights
@@ -4,7 +4,8 @@ from PIL import Image
 import pandas as pd
 import os
 
-from model import LiteGeoNet
+from config import config
+from inference_runtime import load_model
 
 # --- Configuration ---
 CHECKPOINT_PATH = 'model_checkpoint_full.pth'
@@ -16,21 +17,16 @@ TEST_TABULAR = [6.4,25,18,14,900,30.1,19.10,73.80]
 def main():
     print("Loading Model...")
     
-    # 1. Load Checkpoint
-    if not os.path.exists(CHECKPOINT_PATH):
+    # 1. Load Model (eager checkpoint, or an exported artifact per MODEL_RUNTIME)
+    if config.MODEL_RUNTIME == 'eager' and not os.path.exists(CHECKPOINT_PATH):
         print(f"Error: Checkpoint {CHECKPOINT_PATH} not found. Run train.py first.")
         return
 
-    checkpoint = torch.load(CHECKPOINT_PATH)
-    crop_classes = checkpoint['crop_classes']
-    tab_columns = checkpoint['tab_columns']
+    model, crop_classes, tab_columns = load_model(
+        config.MODEL_RUNTIME, CHECKPOINT_PATH, config.MODEL_ARTIFACT, torch.device('cpu')
+    )
     
-    # 2. Initialize Model
-    model = LiteGeoNet(num_classes=len(crop_classes), num_tabular_features=len(tab_columns))
-    model.load_state_dict(checkpoint['model_state_dict'])
-    model.eval()
-    
-    # 3. Prepare Input
+    # 2. Prepare Input
     # Image
     transform = transforms.Compose([
         transforms.Resize((224, 224)),
@@ -44,7 +40,7 @@ def main():
     # Tabular
     tab_tensor = torch.tensor(TEST_TABULAR, dtype=torch.float32).unsqueeze(0) # Add batch dim
     
-    # 4. Inference
+    # 3. Inference
     print(f"Predicting for image: {TEST_IMAGE_PATH}")
     print(f"Tabular data: {TEST_TABULAR}")
     
@@ -61,7 +57,7 @@ def main():
         w_img = gate_weights[0, 0].item()
         w_tab = gate_weights[0, 1].item()
         
-    # 5. Output Results
+    # 4. Output Results
     print("-" * 30)
     print(f"Predicted Crop: {predicted_crop}")
     print(f"Confidence:     {confidence:.4f}")
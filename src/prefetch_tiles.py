@@ -0,0 +1,291 @@
+"""
+Prefetch Sentinel-2 tiles for registered farms into the tile cache.
+
+Reads farm coordinates from a CSV with lat/lon columns (by default the
+crops_full.csv manifest), collapses points that map to the same cached tile,
+skips tiles already on disk and downloads the rest through SentinelService,
+so the images are ready before farmers open the app. Requests run on a
+bounded thread pool behind a token-bucket rate limit that every upstream
+call, token requests and retries included, goes through; 429/5xx responses
+and connection errors are retried with exponential backoff (honouring
+Retry-After). Progress and throughput are printed while it runs.
+
+Usage:
+    python prefetch_tiles.py --farms ../data/crops_full.csv --limit 500
+    python prefetch_tiles.py --farms farms.csv --concurrency 16 --rate 10
+    python prefetch_tiles.py --base-url http://127.0.0.1:8081   # against sentinel_stub.py
+"""
+
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+import requests
+
+from config import config
+from http_client import HttpClient, NO_RETRIES
+from sentinel_service import SentinelService, sentinel_service
+
+# --- Configuration ---
+FARMS_PATH = '../data/crops_full.csv'
+CONCURRENCY = 8
+RATE_PER_SECOND = 5.0  # Sentinel Hub requests per second, across all threads
+MAX_RETRIES = 4
+BACKOFF_SECONDS = 1.0
+PROGRESS_EVERY_SECONDS = 5.0
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: at most `rate_per_second` acquisitions per
+    second on average, with bursts of up to `burst`.
+    """
+
+    def __init__(self, rate_per_second: float, burst: int = 1,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        """
+        Initialize RateLimiter.
+
+        Args:
+            rate_per_second: Sustained rate (0 or less disables limiting)
+            burst: Tokens available at once
+            clock: Monotonic time source (injectable for tests)
+            sleep: Sleep function (injectable for tests)
+        """
+        self.rate_per_second = rate_per_second
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Take one token, sleeping until it is available.
+
+        Returns:
+            Seconds waited
+        """
+        if self.rate_per_second <= 0:
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_per_second)
+            self._updated = now
+            # Reserve a token even if that takes the bucket negative; the
+            # deficit is this caller's wait
+            self._tokens -= 1
+            wait = -self._tokens / self.rate_per_second if self._tokens < 0 else 0.0
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+
+def retry_delay(error: Exception, attempt: int, backoff_seconds: float) -> Optional[float]:
+    """
+    Seconds to wait before retrying after `error`, or None if it is not retriable.
+
+    Rate limiting and server errors (RETRY_STATUSES) and connection
+    failures/timeouts are retried; a Retry-After header wins over the
+    jittered exponential backoff.
+    """
+    if isinstance(error, requests.HTTPError):
+        response = error.response
+        if response is None or response.status_code not in RETRY_STATUSES:
+            return None
+        retry_after = response.headers.get('Retry-After')
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                pass
+    elif not isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return None
+    return backoff_seconds * (2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+class RateLimitedClient(HttpClient):
+    """
+    HttpClient that takes a RateLimiter token before every request.
+
+    Pacing at this level covers everything SentinelService sends, including
+    OAuth token requests and the retry after a 401, not just tile requests.
+    """
+
+    def __init__(self, name: str, limiter: RateLimiter, **kwargs):
+        super().__init__(name, **kwargs)
+        self.limiter = limiter
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        self.limiter.acquire()
+        return super().request(method, url, **kwargs)
+
+
+def prefetch_service(rate_per_second: float = RATE_PER_SECOND, burst: int = CONCURRENCY, **kwargs) -> SentinelService:
+    """
+    SentinelService for prefetch_tiles(): rate-limited and never retrying itself.
+
+    prefetch_tiles() does all retrying; retries inside the shared 'sentinel'
+    client would multiply the attempts per tile.
+
+    Args:
+        rate_per_second: Maximum upstream requests per second, retries and
+            token requests included (0 or less disables limiting)
+        burst: Requests allowed at once (usually the prefetch concurrency)
+        **kwargs: SentinelService options (base_url, tile_cache, ...)
+    """
+    http = RateLimitedClient('sentinel_prefetch', RateLimiter(rate_per_second, burst=burst),
+                             timeout=config.SENTINEL_TIMEOUT_SECONDS, retry=NO_RETRIES)
+    return SentinelService(http=http, **kwargs)
+
+
+def unique_tiles(service, points: Iterable[Tuple[float, float]]) -> List[Tuple[str, float, float]]:
+    """One (key, lat, lon) per distinct tile, in first-seen order."""
+    tiles = {}
+    for lat, lon in points:
+        key = service.tile_key_for(lat, lon)
+        if key not in tiles:
+            tiles[key] = (key, lat, lon)
+    return list(tiles.values())
+
+
+def prefetch_tiles(
+    service,
+    points: Iterable[Tuple[float, float]],
+    concurrency: int = CONCURRENCY,
+    max_retries: int = MAX_RETRIES,
+    backoff_seconds: float = BACKOFF_SECONDS,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Download the tiles for `points` that are not cached yet.
+
+    Args:
+        service: SentinelService from prefetch_service(), with a tile cache;
+            its client sets the request rate
+        points: (lat, lon) pairs
+        concurrency: Maximum requests in flight
+        max_retries: Retries per tile after the first attempt
+        backoff_seconds: Base of the exponential backoff
+        progress: Called with the running report after every tile
+
+    Returns:
+        Report with counts of points, distinct tiles, tiles already cached,
+        fetched and failed, retries, bytes downloaded, elapsed seconds,
+        tiles/second and the first few failures
+
+    Raises:
+        ValueError: If the service has no tile cache to fill
+    """
+    if service.tile_cache is None:
+        raise ValueError("Prefetching needs the tile cache (TILE_CACHE_MAX_MB > 0)")
+
+    points = list(points)
+    tiles = unique_tiles(service, points)
+    pending = [(key, lat, lon) for key, lat, lon in tiles if key not in service.tile_cache]
+    lock = threading.Lock()
+    start = time.perf_counter()
+    report = {
+        'points': len(points),
+        'tiles': len(tiles),
+        'already_cached': len(tiles) - len(pending),
+        'fetched': 0,
+        'failed': 0,
+        'retries': 0,
+        'bytes': 0,
+        'seconds': 0.0,
+        'tiles_per_second': 0.0,
+        'failures': []
+    }
+
+    def fetch(lat, lon):
+        for attempt in range(max_retries + 1):
+            try:
+                return service.fetch_image(lat, lon)
+            except Exception as e:
+                delay = retry_delay(e, attempt, backoff_seconds)
+                if delay is None or attempt == max_retries:
+                    raise
+                with lock:
+                    report['retries'] += 1
+                time.sleep(delay)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='prefetch') as pool:
+        futures = {pool.submit(fetch, lat, lon): (lat, lon) for _, lat, lon in pending}
+        for future in as_completed(futures):
+            with lock:
+                try:
+                    report['bytes'] += len(future.result())
+                    report['fetched'] += 1
+                except Exception as e:
+                    report['failed'] += 1
+                    if len(report['failures']) < 10:
+                        report['failures'].append({'lat': futures[future][0], 'lon': futures[future][1],
+                                                   'error': str(e)})
+                elapsed = time.perf_counter() - start
+                report['seconds'] = round(elapsed, 3)
+                report['tiles_per_second'] = round(report['fetched'] / elapsed, 2) if elapsed else 0.0
+                snapshot = dict(report, pending=len(pending) - report['fetched'] - report['failed'])
+            if progress is not None:
+                progress(snapshot)
+
+    report['seconds'] = round(time.perf_counter() - start, 3)
+    return report
+
+
+def load_points(path: str, limit: Optional[int] = None) -> List[Tuple[float, float]]:
+    """(lat, lon) pairs from a CSV with lat and lon columns."""
+    farms = pd.read_csv(path, usecols=['lat', 'lon'], nrows=limit).dropna()
+    return list(zip(farms['lat'].astype(float), farms['lon'].astype(float)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prefetch Sentinel-2 tiles for farm coordinates into the tile cache.')
+    parser.add_argument('--farms', default=FARMS_PATH, help='CSV with lat and lon columns')
+    parser.add_argument('--limit', type=int, default=None, help='Only the first N rows')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help='Requests in flight')
+    parser.add_argument('--rate', type=float, default=RATE_PER_SECOND, help='Max Sentinel Hub requests/second (0 = unlimited)')
+    parser.add_argument('--retries', type=int, default=MAX_RETRIES, help='Retries per tile')
+    parser.add_argument('--backoff', type=float, default=BACKOFF_SECONDS, help='Base backoff in seconds')
+    parser.add_argument('--base-url', default=None, help='Sentinel Hub API root (e.g. a sentinel_stub.py URL)')
+    args = parser.parse_args()
+
+    service = prefetch_service(rate_per_second=args.rate, burst=args.concurrency,
+                               base_url=args.base_url, tile_cache=sentinel_service.tile_cache)
+    if not service.is_configured():
+        print("Error: Sentinel Hub credentials not configured (SENTINEL_CLIENT_ID / SENTINEL_CLIENT_SECRET).")
+        return
+    if service.tile_cache is None:
+        print("Error: The tile cache is disabled (TILE_CACHE_MAX_MB=0), nothing to prefetch into.")
+        return
+
+    points = load_points(args.farms, args.limit)
+    print(f"{len(points)} farm points from {args.farms}, tile cache at {config.TILE_CACHE_DIR}")
+    last_print = [0.0]
+
+    def show(report):
+        now = time.monotonic()
+        if now - last_print[0] < PROGRESS_EVERY_SECONDS and report['pending']:
+            return
+        last_print[0] = now
+        print(f"  {report['fetched'] + report['failed']}/{report['fetched'] + report['failed'] + report['pending']} "
+              f"fetched={report['fetched']} failed={report['failed']} retries={report['retries']} "
+              f"{report['tiles_per_second']:.1f} tiles/s")
+
+    report = prefetch_tiles(service, points, concurrency=args.concurrency, max_retries=args.retries, backoff_seconds=args.backoff, progress=show)
+    print(f"Done: {report['tiles']} distinct tiles, {report['already_cached']} already cached, "
+          f"{report['fetched']} fetched ({report['bytes'] / 1e6:.1f} MB), {report['failed']} failed, "
+          f"{report['retries']} retries in {report['seconds']:.1f}s ({report['tiles_per_second']:.1f} tiles/s)")
+    for failure in report['failures']:
+        print(f"  failed {failure['lat']}, {failure['lon']}: {failure['error']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Post-training int8 quantization for LiteGeoNet CPU serving.
+
+The EfficientNet backbone is quantized statically (FX graph mode, per-channel
+weights, activation ranges calibrated on sample images); the Linear layers of
+the tabular MLP, projections, gating network and classifier are quantized
+dynamically. The result keeps LiteGeoNet's staged API, so it can be exported
+with inference_runtime.export_torchscript() and served with
+MODEL_RUNTIME=torchscript.
+"""
+
+import copy
+from typing import Iterable, List, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.ao.quantization import get_default_qconfig_mapping, default_dynamic_qconfig, quantize_dynamic
+from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+from model import LiteGeoNet
+
+# Head modules whose nn.Linear layers get dynamic int8 weights
+HEAD_MODULES = ('tab_mlp', 'img_project', 'tab_project', 'gate_net', 'classifier')
+
+
+def quantize_model(model: LiteGeoNet, calibration_images: List[torch.Tensor], backend: str = 'x86') -> LiteGeoNet:
+    """
+    Build an int8 copy of a trained LiteGeoNet (the input model is not modified).
+
+    Args:
+        model: Trained fp32 LiteGeoNet
+        calibration_images: Normalized [B, 3, H, W] batches used to calibrate
+            the backbone's activation ranges
+        backend: Quantized engine the model will run on ('x86', 'fbgemm', 'onednn' or 'qnnpack')
+
+    Returns:
+        LiteGeoNet with a quantized backbone and dynamically quantized head
+    """
+    if not calibration_images:
+        raise ValueError("At least one calibration batch is required")
+    torch.backends.quantized.engine = backend
+    qmodel = copy.deepcopy(model).cpu().eval()
+
+    # Static: insert observers, run calibration images, convert to int8 ops
+    prepared = prepare_fx(qmodel.backbone, get_default_qconfig_mapping(backend), (calibration_images[0],))
+    with torch.no_grad():
+        for images in calibration_images:
+            prepared(images)
+    qmodel.backbone = convert_fx(prepared)
+
+    # Dynamic: int8 weights, activations quantized on the fly per batch
+    quantize_dynamic(qmodel, {name: default_dynamic_qconfig for name in HEAD_MODULES}, inplace=True)
+    return qmodel
+
+
+def evaluate(model, batches: Iterable[Tuple[torch.Tensor, torch.Tensor, torch.Tensor]]) -> np.ndarray:
+    """
+    Run a model over (images, tabular, labels) batches.
+
+    Returns:
+        Predicted class index per sample
+    """
+    predictions = []
+    with torch.no_grad():
+        for images, tab_data, _ in batches:
+            logits, _ = model(images, tab_data)
+            predictions.append(logits.argmax(dim=1).numpy())
+    return np.concatenate(predictions)
@@ -0,0 +1,163 @@
+"""
+Post-training int8 quantization of a LiteGeoNet checkpoint for CPU serving.
+
+Calibrates the backbone on a sample of the training manifest, exports the
+int8 model as TorchScript and reports accuracy, latency, resident memory and
+file size for fp32 vs int8 on a held-out sample of the same manifest.
+
+Serve the result with MODEL_RUNTIME=torchscript MODEL_ARTIFACT=<output>.
+
+Usage:
+    python quantize_model.py
+    python quantize_model.py --calibration-samples 1024 --eval-samples 5000 --output model_litegeonet_int8.pt
+"""
+
+import os
+import time
+import argparse
+import resource
+import tempfile
+import multiprocessing
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Subset
+
+from dataset import CropDataset, BatchCollate
+from inference_runtime import load_checkpoint_model, load_model, export_torchscript
+from quantization import quantize_model, evaluate
+
+# --- Configuration ---
+CHECKPOINT_PATH = 'model_checkpoint_full.pth'
+CSV_FILE = '../data/crops_full.csv'
+IMG_DIR = '../data'
+IMAGE_CACHE_PATH = '../data/image_cache_64.npy'
+OUTPUT_PATH = 'model_litegeonet_int8.pt'
+IMAGE_SIZE = 64
+CALIBRATION_SAMPLES = 512
+EVAL_SAMPLES = 2000
+BATCH_SIZE = 64
+LATENCY_BATCH_SIZES = (1, 32)
+LATENCY_ITERS = 30
+
+
+def _current_rss_mb():
+    # Linux: resident pages from /proc; elsewhere fall back to the peak RSS
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure_rss(runtime, checkpoint, artifact, batch_size, image_size, queue):
+    # Runs in a fresh process: RSS growth from loading the model and one forward pass
+    baseline = _current_rss_mb()
+    model, _, tab_columns = load_model(runtime, checkpoint, artifact, torch.device('cpu'))
+    with torch.no_grad():
+        model(torch.randn(batch_size, 3, image_size, image_size), torch.randn(batch_size, len(tab_columns)))
+    queue.put(_current_rss_mb() - baseline)
+
+
+def measure_rss_mb(runtime, checkpoint, artifact, batch_size=BATCH_SIZE, image_size=IMAGE_SIZE):
+    """Resident memory (MB) added by loading and running a model, measured in a spawned process."""
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_measure_rss,
+                              args=(runtime, checkpoint, artifact, batch_size, image_size, queue))
+    process.start()
+    rss = queue.get()
+    process.join()
+    return rss
+
+
+def measure_latency_ms(model, batch_size, num_tabular_features, image_size=IMAGE_SIZE, iters=LATENCY_ITERS):
+    """Median forward latency in milliseconds."""
+    img = torch.randn(batch_size, 3, image_size, image_size)
+    tab = torch.randn(batch_size, num_tabular_features)
+    latencies = []
+    with torch.no_grad():
+        for i in range(iters + 3):
+            start = time.perf_counter()
+            model(img, tab)
+            if i >= 3:
+                latencies.append((time.perf_counter() - start) * 1000)
+    return float(np.median(latencies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Quantize LiteGeoNet to int8 for CPU serving.')
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH, help='fp32 model checkpoint')
+    parser.add_argument('--csv', default=CSV_FILE, help='Manifest used for calibration and evaluation')
+    parser.add_argument('--root', default=IMG_DIR, help='Directory image paths are relative to')
+    parser.add_argument('--image-cache', default=IMAGE_CACHE_PATH, help='Packed image cache, used when present')
+    parser.add_argument('--output', default=OUTPUT_PATH, help='Output TorchScript file')
+    parser.add_argument('--calibration-samples', type=int, default=CALIBRATION_SAMPLES)
+    parser.add_argument('--eval-samples', type=int, default=EVAL_SAMPLES)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--backend', default='x86', choices=['x86', 'fbgemm', 'onednn', 'qnnpack'], help='Quantized engine')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    device = torch.device('cpu')
+    model, crop_classes, tab_columns = load_checkpoint_model(args.checkpoint, device)
+
+    # 1. Disjoint calibration and evaluation samples from the manifest
+    dataset = CropDataset(
+        csv_file=args.csv,
+        root_dir=args.root,
+        crop_classes=crop_classes,
+        tab_columns=tab_columns,
+        image_cache=args.image_cache if os.path.exists(args.image_cache) else None
+    )
+    order = np.random.default_rng(args.seed).permutation(len(dataset))
+    calibration_idx = order[:args.calibration_samples].tolist()
+    eval_idx = order[args.calibration_samples:args.calibration_samples + args.eval_samples].tolist()
+    collate = BatchCollate(image_size=IMAGE_SIZE, augment=False)
+    calibration_loader = DataLoader(Subset(dataset, calibration_idx), batch_size=args.batch_size, collate_fn=collate)
+    eval_batches = list(DataLoader(Subset(dataset, eval_idx), batch_size=args.batch_size, collate_fn=collate))
+
+    # 2. Quantize and export
+    start_time = time.time()
+    calibration_images = [images for images, _, _ in calibration_loader]
+    qmodel = quantize_model(model, calibration_images, backend=args.backend)
+    export_torchscript(qmodel, args.output, crop_classes, tab_columns, image_size=IMAGE_SIZE,
+                       quantized_engine=args.backend)
+    print(f"Calibrated on {len(calibration_idx)} samples, wrote {args.output} in {time.time() - start_time:.1f}s")
+
+    # 3. Compare the served artifacts: fp32 TorchScript vs int8 TorchScript
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        fp32_path = os.path.join(tmp_dir, 'model_fp32.pt')
+        export_torchscript(model, fp32_path, crop_classes, tab_columns, image_size=IMAGE_SIZE)
+        variants = {'fp32': fp32_path, 'int8': args.output}
+
+        labels = torch.cat([batch_labels for _, _, batch_labels in eval_batches]).numpy()
+        results = {}
+        for name, path in variants.items():
+            runtime, _, _ = load_model('torchscript', None, path, device)
+            predictions = evaluate(runtime, eval_batches)
+            results[name] = {
+                'predictions': predictions,
+                'accuracy': float((predictions == labels).mean()),
+                'latency': [measure_latency_ms(runtime, b, len(tab_columns)) for b in LATENCY_BATCH_SIZES],
+                'rss_mb': measure_rss_mb('torchscript', None, path),
+                'size_mb': os.path.getsize(path) / 1e6
+            }
+
+    # 4. Report
+    fp32, int8 = results['fp32'], results['int8']
+    latency_cols = ''.join(f" {f'p50 b={b} ms':>13}" for b in LATENCY_BATCH_SIZES)
+    print(f"\nEvaluated on {len(labels)} held-out samples")
+    print(f"{'model':<6} {'accuracy':>9}{latency_cols} {'RSS MB':>8} {'file MB':>8}")
+    for name, r in results.items():
+        latency = ''.join(f" {ms:>13.2f}" for ms in r['latency'])
+        print(f"{name:<6} {r['accuracy']:>9.4f}{latency} {r['rss_mb']:>8.1f} {r['size_mb']:>8.1f}")
+    speedups = ', '.join(f"b={b}: {f / i:.2f}x" for b, f, i in zip(LATENCY_BATCH_SIZES, fp32['latency'], int8['latency']))
+    print(f"\nAccuracy delta (int8 - fp32): {int8['accuracy'] - fp32['accuracy']:+.4f}")
+    print(f"Top-1 agreement with fp32:    {(int8['predictions'] == fp32['predictions']).mean():.4f}")
+    print(f"Speedup:                      {speedups}")
+    print(f"RSS saved:                    {fp32['rss_mb'] - int8['rss_mb']:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+"""
+Offline bulk scoring for GeoCrop Predictor.
+
+Streams a manifest in the crops_full.csv schema (image_path plus tabular
+columns) in chunks, decodes images on a worker pool, runs LiteGeoNet in
+batches and appends predictions to CSV or Parquet as it goes. Memory stays
+constant in the number of rows, and an interrupted run resumes from the
+last completed chunk.
+
+Usage:
+    python score_manifest.py --manifest ../data/crops_full.csv --output predictions.csv
+    python score_manifest.py --output predictions.parquet --workers 8
+"""
+
+import os
+import json
+import argparse
+import time
+from multiprocessing import Pool
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from dataset import load_image_uint8
+
+# --- Configuration ---
+MANIFEST_PATH = '../data/crops_full.csv'
+IMAGE_ROOT = '../data'
+CHECKPOINT_PATH = 'model_checkpoint_full.pth'
+OUTPUT_PATH = 'predictions.csv'
+CHUNK_SIZE = 1024
+BATCH_SIZE = 64
+NUM_WORKERS = 4
+TOP_K = 3
+IMAGE_SIZE = 64  # EuroSAT size, matches training
+
+# predict_fn(images [B, H, W, 3] uint8, tabular [B, F] float32) -> (probabilities [B, C], gate_weights [B, 2])
+PredictFn = Callable[[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]
+
+
+def load_image(path: str) -> Optional[np.ndarray]:
+    """Decode and resize one image to uint8 [H, W, 3] as in training; None if it cannot be read."""
+    try:
+        return load_image_uint8(path, IMAGE_SIZE)
+    except (OSError, ValueError):
+        return None
+
+
+class ProgressTracker:
+    """
+    Records how many manifest rows have been durably written.
+
+    The progress file is replaced atomically after each chunk's output is
+    flushed, so after a crash it never claims more rows than were written.
+    """
+
+    def __init__(self, output_path: str):
+        self.path = output_path + '.progress.json'
+
+    def load(self) -> dict:
+        if not os.path.exists(self.path):
+            return {'rows_done': 0, 'parts': 0, 'bytes': 0}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def save(self, state: dict) -> None:
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class CsvSink:
+    """Appends chunks to a single CSV file, truncating any partial tail on resume."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def resume(self, state: dict) -> None:
+        if state['rows_done'] == 0:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        elif os.path.exists(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(state['bytes'])
+
+    def write(self, frame: pd.DataFrame, state: dict) -> None:
+        header = state['bytes'] == 0
+        with open(self.path, 'a', newline='') as f:
+            frame.to_csv(f, header=header, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+            state['bytes'] = f.tell()
+
+
+class ParquetSink:
+    """Writes each chunk as a numbered part file inside an output directory."""
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)")
+        self.path = path
+
+    def _part_path(self, index: int) -> str:
+        return os.path.join(self.path, f'part-{index:05d}.parquet')
+
+    def resume(self, state: dict) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        # Drop parts written after the last recorded checkpoint
+        for name in os.listdir(self.path):
+            if name.startswith('part-') and name.endswith('.parquet'):
+                if int(name[5:10]) >= state['parts']:
+                    os.remove(os.path.join(self.path, name))
+
+    def write(self, frame: pd.DataFrame, state: dict) -> None:
+        frame.to_parquet(self._part_path(state['parts']), index=False)
+
+
+def build_results(
+    image_paths: List[str],
+    probabilities: np.ndarray,
+    gate_weights: np.ndarray,
+    crop_classes: List[str],
+    top_k: int
+) -> pd.DataFrame:
+    """Turn batched model outputs into output rows."""
+    k = min(top_k, len(crop_classes))
+    top_idx = np.argsort(-probabilities, axis=1)[:, :k]
+    top_prob = np.take_along_axis(probabilities, top_idx, axis=1)
+    classes = np.asarray(crop_classes)
+
+    frame = pd.DataFrame({
+        'image_path': image_paths,
+        'predicted_crop': classes[top_idx[:, 0]],
+        'confidence': top_prob[:, 0],
+    })
+    for rank in range(k):
+        frame[f'top{rank + 1}_crop'] = classes[top_idx[:, rank]]
+        frame[f'top{rank + 1}_prob'] = top_prob[:, rank]
+    frame['w_img'] = gate_weights[:, 0]
+    frame['w_tab'] = gate_weights[:, 1]
+    frame['error'] = ''
+    return frame
+
+
+def error_rows(image_paths: List[str], crop_classes: List[str], top_k: int, message: str) -> pd.DataFrame:
+    """Output rows for inputs that could not be scored."""
+    k = min(top_k, len(crop_classes))
+    n = len(image_paths)
+    nan = np.full(n, np.nan, dtype=np.float32)
+    frame = pd.DataFrame({
+        'image_path': image_paths,
+        'predicted_crop': [''] * n,
+        'confidence': nan,
+    })
+    for rank in range(k):
+        frame[f'top{rank + 1}_crop'] = [''] * n
+        frame[f'top{rank + 1}_prob'] = nan
+    frame['w_img'] = nan
+    frame['w_tab'] = nan
+    frame['error'] = [message] * n
+    return frame
+
+
+def score_manifest(
+    manifest_path: str,
+    output_path: str,
+    predict_fn: PredictFn,
+    crop_classes: List[str],
+    tab_columns: List[str],
+    image_root: str = IMAGE_ROOT,
+    chunk_size: int = CHUNK_SIZE,
+    batch_size: int = BATCH_SIZE,
+    num_workers: int = NUM_WORKERS,
+    top_k: int = TOP_K,
+    restart: bool = False,
+    log_every: int = 1
+) -> int:
+    """
+    Score every row of a manifest, resuming from the last checkpoint.
+
+    Args:
+        manifest_path: CSV with image_path and the tabular columns
+        output_path: .csv file, or .parquet directory of part files
+        predict_fn: Batched prediction function (see PredictFn)
+        crop_classes: Class names in model output order
+        tab_columns: Tabular feature columns in model input order
+        image_root: Directory image paths are relative to
+        chunk_size: Manifest rows read and written per chunk
+        batch_size: Samples per forward pass
+        num_workers: Image decoding processes (0 decodes in-process)
+        top_k: Number of ranked predictions to write per row
+        restart: Ignore existing progress and start from row 0
+        log_every: Print progress every N chunks
+
+    Returns:
+        Total number of rows written, including rows from earlier runs
+    """
+    if output_path.endswith('.parquet'):
+        sink = ParquetSink(output_path)
+    else:
+        sink = CsvSink(output_path)
+
+    tracker = ProgressTracker(output_path)
+    if restart:
+        tracker.clear()
+    state = tracker.load()
+    sink.resume(state)
+    if state['rows_done']:
+        print(f"Resuming from row {state['rows_done']}")
+
+    reader = pd.read_csv(
+        manifest_path,
+        usecols=['image_path'] + list(tab_columns),
+        skiprows=range(1, state['rows_done'] + 1),
+        chunksize=chunk_size
+    )
+
+    pool = Pool(num_workers) if num_workers > 0 else None
+    start_time = time.time()
+    rows_this_run = 0
+    try:
+        for chunk_index, chunk in enumerate(reader):
+            if chunk.empty:
+                continue
+            image_paths = chunk['image_path'].astype(str).tolist()
+            tabular = chunk[tab_columns].to_numpy(dtype=np.float32)
+            full_paths = [os.path.join(image_root, p) for p in image_paths]
+
+            if pool is not None:
+                images = pool.map(load_image, full_paths, chunksize=max(1, len(full_paths) // (num_workers * 4)))
+            else:
+                images = [load_image(p) for p in full_paths]
+
+            frames = []
+            for start in range(0, len(images), batch_size):
+                stop = start + batch_size
+                ok = [i for i in range(start, min(stop, len(images))) if images[i] is not None]
+                bad = [i for i in range(start, min(stop, len(images))) if images[i] is None]
+                if ok:
+                    probabilities, gate_weights = predict_fn(np.stack([images[i] for i in ok]), tabular[ok])
+                    frame = build_results([image_paths[i] for i in ok], probabilities, gate_weights, crop_classes, top_k)
+                    frame.index = ok
+                    frames.append(frame)
+                if bad:
+                    frame = error_rows([image_paths[i] for i in bad], crop_classes, top_k, 'image could not be read')
+                    frame.index = bad
+                    frames.append(frame)
+
+            output = pd.concat(frames).sort_index()
+            sink.write(output, state)
+            state['rows_done'] += len(chunk)
+            state['parts'] += 1
+            tracker.save(state)
+
+            rows_this_run += len(chunk)
+            if (chunk_index + 1) % log_every == 0:
+                elapsed = time.time() - start_time
+                print(f"Scored {state['rows_done']} rows ({rows_this_run / max(elapsed, 1e-9):.1f} rows/s)")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return state['rows_done']
+
+
+def load_predictor(checkpoint_path: str) -> Tuple[PredictFn, List[str], List[str]]:
+    """Load LiteGeoNet from a checkpoint and wrap it as a batched PredictFn."""
+    import torch
+    from dataset import normalize_batch
+    from inference_runtime import load_checkpoint_model
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model, crop_classes, tab_columns = load_checkpoint_model(checkpoint_path, device)
+
+    def predict_fn(images, tabular):
+        # Same normalization as training (BatchCollate / normalize_batch)
+        image_tensor = normalize_batch(torch.from_numpy(images).to(device).permute(0, 3, 1, 2)).contiguous()
+        tab_tensor = torch.from_numpy(tabular).to(device)
+        with torch.no_grad():
+            logits, gate_weights = model(image_tensor, tab_tensor)
+            probabilities = torch.softmax(logits, dim=1)
+        return probabilities.cpu().numpy(), gate_weights.cpu().numpy()
+
+    return predict_fn, crop_classes, tab_columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-score a crops_full.csv style manifest with LiteGeoNet.')
+    parser.add_argument('--manifest', default=MANIFEST_PATH, help='Input manifest CSV')
+    parser.add_argument('--image-root', default=IMAGE_ROOT, help='Directory image paths are relative to')
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH, help='Model checkpoint')
+    parser.add_argument('--output', default=OUTPUT_PATH, help='Output .csv file or .parquet directory')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Manifest rows per chunk')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Samples per forward pass')
+    parser.add_argument('--workers', type=int, default=NUM_WORKERS, help='Image decoding processes')
+    parser.add_argument('--top-k', type=int, default=TOP_K, help='Ranked predictions per row')
+    parser.add_argument('--restart', action='store_true', help='Ignore saved progress and start over')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.checkpoint):
+        print(f"Error: Checkpoint {args.checkpoint} not found. Run train_full.py first.")
+        return
+
+    print("Loading Model...")
+    predict_fn, crop_classes, tab_columns = load_predictor(args.checkpoint)
+
+    start_time = time.time()
+    total = score_manifest(
+        args.manifest, args.output, predict_fn, crop_classes, tab_columns,
+        image_root=args.image_root,
+        chunk_size=args.chunk_size,
+        batch_size=args.batch_size,
+        num_workers=args.workers,
+        top_k=args.top_k,
+        restart=args.restart
+    )
+    print(f"Done: {total} rows in {args.output} ({time.time() - start_time:.1f}s this run)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,420 @@
+"""
+Sentinel Hub service module for GeoCrop Predictor.
+Fetches true-color Sentinel-2 imagery through the Process API, with a cached
+OAuth token.
+"""
+
+import time
+import asyncio
+import threading
+import logging
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Any, Optional, Tuple
+
+from config import config
+from http_client import HttpClient, RetryPolicy, client_for
+from tile_cache import TileCache, snap_to_grid, tile_key
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATH = "/oauth/token"
+PROCESS_PATH = "/api/v1/process"
+
+# Lifetime assumed when the token response carries no expires_in
+DEFAULT_TOKEN_LIFETIME_SECONDS = 3600
+# After a failed background refresh, wait this long before trying again
+REFRESH_RETRY_SECONDS = 30
+
+EVALSCRIPT = """
+    //VERSION=3
+    function setup() {
+      return {
+        input: ["B04", "B03", "B02"],
+        output: { bands: 3 }
+      };
+    }
+    function evaluatePixel(sample) {
+      return [2.5 * sample.B04, 2.5 * sample.B03, 2.5 * sample.B02];
+    }
+    """
+
+
+class SentinelServiceError(Exception):
+    """Custom exception for Sentinel Hub errors."""
+    pass
+
+
+class TokenManager:
+    """
+    Thread-safe cache for an expiring access token.
+
+    The token is reused until `refresh_margin_seconds` before it expires.
+    Inside that margin callers still get the cached token while one
+    background thread fetches the next; only a missing or expired token
+    makes callers wait. Concurrent callers, threads and coroutines alike,
+    share a single in-flight fetch.
+    """
+
+    def __init__(
+        self,
+        fetch_token: Callable[[], Tuple[str, float]],
+        refresh_margin_seconds: float = 300.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize TokenManager.
+
+        Args:
+            fetch_token: Callable returning (access_token, expires_in_seconds)
+            refresh_margin_seconds: How long before expiry to refresh in the background
+            clock: Monotonic time source (injectable for tests)
+        """
+        self._fetch_token = fetch_token
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._inflight: Optional[Future] = None
+        self._requests = 0
+        self._fetches = 0
+        self._fetch_errors = 0
+        self._background_refreshes = 0
+
+    def get_token(self) -> str:
+        """
+        Get a valid token, fetching one only if none is cached or it expired.
+
+        Raises:
+            Exception: Whatever the fetch raised, if no valid token is cached
+        """
+        token, flight, leader = self._lookup()
+        if token is not None:
+            return token
+        if leader:
+            self._run_fetch(flight)
+        return flight.result()
+
+    async def get_token_async(self, fetch_token_async: Callable[[], Awaitable[Tuple[str, float]]]) -> str:
+        """
+        Async variant of get_token(): a needed fetch is made by awaiting
+        `fetch_token_async` instead of blocking, and shares the in-flight
+        fetch (and the cache) with synchronous callers.
+        """
+        token, flight, leader = self._lookup()
+        if token is not None:
+            return token
+        if leader:
+            try:
+                token, expires_in = await fetch_token_async()
+            except Exception as e:
+                self._fail(flight, e)
+            else:
+                self._publish(flight, token, expires_in)
+        return await asyncio.wrap_future(flight)
+
+    def invalidate(self) -> None:
+        """Drop the cached token, e.g. after the API rejected it."""
+        with self._lock:
+            self._token = None
+            self._expires_at = self._refresh_at = 0.0
+
+    def _lookup(self) -> Tuple[Optional[str], Optional[Future], bool]:
+        """
+        Count a request and find its token.
+
+        Returns:
+            (token, None, False) when a valid token is cached, starting a
+            background refresh inside the margin; otherwise (None, flight,
+            leader) where the leader must run the fetch for `flight`
+        """
+        with self._lock:
+            self._requests += 1
+            now = self._clock()
+            if self._token is not None and now < self._expires_at:
+                if now >= self._refresh_at and self._inflight is None:
+                    self._inflight = Future()
+                    self._background_refreshes += 1
+                    threading.Thread(target=self._run_fetch, args=(self._inflight,), daemon=True,
+                                     name='token-refresh').start()
+                return self._token, None, False
+            leader = self._inflight is None
+            if leader:
+                self._inflight = Future()
+            return None, self._inflight, leader
+
+    def _run_fetch(self, flight: Future) -> None:
+        """Fetch a token and publish it to everyone waiting on `flight`."""
+        try:
+            token, expires_in = self._fetch_token()
+        except Exception as e:
+            self._fail(flight, e)
+        else:
+            self._publish(flight, token, expires_in)
+
+    def _publish(self, flight: Future, token: str, expires_in: float) -> None:
+        with self._lock:
+            now = self._clock()
+            self._fetches += 1
+            self._token = token
+            self._expires_at = now + expires_in
+            self._refresh_at = now + max(0.0, expires_in - self.refresh_margin_seconds)
+            self._inflight = None
+        flight.set_result(token)
+
+    def _fail(self, flight: Future, error: Exception) -> None:
+        logger.error(f"Token fetch failed: {error}")
+        with self._lock:
+            self._fetch_errors += 1
+            self._inflight = None
+            # A still-valid token keeps being served; retry the refresh later
+            self._refresh_at = self._clock() + REFRESH_RETRY_SECONDS
+        flight.set_exception(error)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get token cache counters.
+
+        Returns:
+            Dictionary with token requests, upstream fetches (and errors),
+            background refreshes and the cached token's remaining lifetime
+        """
+        with self._lock:
+            remaining = max(0.0, self._expires_at - self._clock()) if self._token else None
+            return {
+                'token_requests': self._requests,
+                'token_fetches': self._fetches,
+                'token_fetch_errors': self._fetch_errors,
+                'background_refreshes': self._background_refreshes,
+                'token_expires_in_seconds': round(remaining, 1) if remaining is not None else None
+            }
+
+
+class SentinelService:
+    """Service for fetching Sentinel-2 imagery from Sentinel Hub."""
+
+    def __init__(
+        self,
+        client_id: Optional[str] = None,
+        client_secret: Optional[str] = None,
+        base_url: Optional[str] = None,
+        tile_cache: Optional[TileCache] = None,
+        grid_degrees: Optional[float] = None,
+        http: Optional[HttpClient] = None
+    ):
+        """
+        Initialize SentinelService.
+
+        Args:
+            client_id: OAuth client id. If None, uses config.
+            client_secret: OAuth client secret. If None, uses config.
+            base_url: API root, e.g. a local stub. If None, uses config.
+            tile_cache: Persistent cache for fetched tiles, or None to always fetch
+            grid_degrees: Grid that request centers are snapped to, so nearby
+                points share a tile. If None, uses config.
+            http: HTTP client for the OAuth and Process APIs. If None, uses
+                the shared 'sentinel' upstream client.
+        """
+        self.client_id = client_id if client_id is not None else config.SENTINEL_CLIENT_ID
+        self.client_secret = client_secret if client_secret is not None else config.SENTINEL_CLIENT_SECRET
+        base_url = (base_url or config.SENTINEL_BASE_URL).rstrip('/')
+        self.token_url = base_url + TOKEN_PATH
+        self.process_url = base_url + PROCESS_PATH
+        self.tile_cache = tile_cache
+        self.grid_degrees = grid_degrees if grid_degrees is not None else config.TILE_GRID_DEGREES
+        self.http = http or client_for(
+            'sentinel',
+            timeout=config.SENTINEL_TIMEOUT_SECONDS,
+            # The Process API is safe to repeat. 429 is left to callers: the
+            # request path fails fast and prefetch_tiles paces itself.
+            retry=RetryPolicy(max_retries=config.HTTP_MAX_RETRIES, backoff_seconds=config.HTTP_BACKOFF_SECONDS,
+                              methods=frozenset({'POST'}))
+        )
+        self.tokens = TokenManager(self._fetch_token, config.SENTINEL_TOKEN_REFRESH_MARGIN_SECONDS)
+        self._image_requests = 0
+        self._upstream_fetches = 0
+        self._lock = threading.Lock()
+
+    def is_configured(self) -> bool:
+        """Check if the service is properly configured."""
+        return bool(self.client_id and self.client_secret)
+
+    def token_payload(self) -> Dict[str, str]:
+        """OAuth client-credentials form for an access token."""
+        return {
+            "grant_type": "client_credentials",
+            "client_id": self.client_id,
+            "client_secret": self.client_secret
+        }
+
+    @staticmethod
+    def headers(token: str) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    @staticmethod
+    def request_payload(lat: float, lon: float) -> Dict[str, Any]:
+        """Process API request for a true-color 512x512 PNG around (lat, lon)."""
+        # Define a bounding box (approx 640m x 640m)
+        # 0.006 degrees is roughly 600-700m
+        delta = 0.003
+        bbox = [lon - delta, lat - delta, lon + delta, lat + delta]
+
+        return {
+            "input": {
+                "bounds": {
+                    "bbox": bbox,
+                    "properties": {"crs": "http://www.opengis.net/def/crs/EPSG/0/4326"}
+                },
+                "data": [{
+                    "type": "sentinel-2-l2a",
+                    "dataFilter": {
+                        "timeRange": {
+                            "from": "2023-01-01T00:00:00Z",
+                            "to": "2023-12-31T23:59:59Z"
+                        },
+                        "mosaickingOrder": "leastCC"
+                    }
+                }]
+            },
+            "output": {
+                "width": 512,
+                "height": 512,
+                "responses": [{"identifier": "default", "format": {"type": "image/png"}}]
+            },
+            "evalscript": EVALSCRIPT
+        }
+
+    @staticmethod
+    def parse_token(data: Dict[str, Any]) -> Tuple[str, float]:
+        """(access_token, expires_in) from an OAuth token response."""
+        return data["access_token"], float(data.get("expires_in", DEFAULT_TOKEN_LIFETIME_SECONDS))
+
+    @staticmethod
+    def cache_key(payload: Dict[str, Any]) -> str:
+        """Tile cache key for a Process API request: bbox, evalscript hash, time range, size."""
+        time_range = payload["input"]["data"][0]["dataFilter"]["timeRange"]
+        output = payload["output"]
+        return tile_key(payload["input"]["bounds"]["bbox"], payload["evalscript"],
+                        time_range["from"], time_range["to"], output["width"], output["height"])
+
+    def _fetch_token(self) -> Tuple[str, float]:
+        response = self.http.post(self.token_url, data=self.token_payload())
+        response.raise_for_status()
+        return self.parse_token(response.json())
+
+    def get_token(self) -> str:
+        """
+        Get an access token, cached until shortly before it expires.
+
+        Raises:
+            SentinelServiceError: If the service is not configured
+        """
+        if not self.is_configured():
+            raise SentinelServiceError("Sentinel Hub credentials not configured")
+        return self.tokens.get_token()
+
+    def _count(self, attr: str) -> None:
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def tile_key_for(self, lat: float, lon: float) -> str:
+        """Tile cache key of the image fetch_image(lat, lon) returns."""
+        return self.cache_key(self.request_payload(*snap_to_grid(lat, lon, self.grid_degrees)))
+
+    def _prepare(self, lat: float, lon: float) -> Tuple[Dict[str, Any], str]:
+        """Count the request; return its payload (grid-snapped) and tile cache key."""
+        self._count('_image_requests')
+        payload = self.request_payload(*snap_to_grid(lat, lon, self.grid_degrees))
+        return payload, self.cache_key(payload)
+
+    def fetch_image(self, lat: float, lon: float) -> bytes:
+        """
+        Fetch a true-color PNG around (lat, lon), from the tile cache when
+        this grid cell was fetched before.
+
+        A 401 means the cached token was revoked early: it is dropped and
+        the request retried once with a fresh token.
+
+        Returns:
+            PNG bytes
+
+        Raises:
+            SentinelServiceError: If the service is not configured
+            requests.RequestException: If an API call fails
+        """
+        payload, key = self._prepare(lat, lon)
+        if self.tile_cache is not None:
+            cached = self.tile_cache.get(key)
+            if cached is not None:
+                return cached
+
+        self._count('_upstream_fetches')
+        response = self.http.post(self.process_url, headers=self.headers(self.get_token()), json=payload)
+        if response.status_code == 401:
+            self.tokens.invalidate()
+            response = self.http.post(self.process_url, headers=self.headers(self.get_token()), json=payload)
+        response.raise_for_status()
+        if self.tile_cache is not None:
+            self.tile_cache.put(key, response.content)
+        return response.content
+
+    async def fetch_image_async(self, lat: float, lon: float, client) -> bytes:
+        """
+        Async variant of fetch_image for the ASGI server, on `client`, a
+        shared httpx.AsyncClient. Uses the same token and tile caches (tile
+        cache disk I/O runs off the event loop); a token fetch it needs is
+        also made on `client`.
+        """
+        if not self.is_configured():
+            raise SentinelServiceError("Sentinel Hub credentials not configured")
+
+        async def fetch_token():
+            response = await client.post(self.token_url, data=self.token_payload())
+            response.raise_for_status()
+            return self.parse_token(response.json())
+
+        payload, key = self._prepare(lat, lon)
+        if self.tile_cache is not None:
+            cached = await asyncio.to_thread(self.tile_cache.get, key)
+            if cached is not None:
+                return cached
+
+        self._count('_upstream_fetches')
+        for attempt in range(2):
+            token = await self.tokens.get_token_async(fetch_token)
+            response = await client.post(self.process_url, headers=self.headers(token), json=payload,
+                                         timeout=config.SENTINEL_TIMEOUT_SECONDS)
+            if response.status_code != 401 or attempt:
+                break
+            self.tokens.invalidate()
+        response.raise_for_status()
+        if self.tile_cache is not None:
+            await asyncio.to_thread(self.tile_cache.put, key, response.content)
+        return response.content
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get request counters.
+
+        Returns:
+            Dictionary with image requests, how many went upstream, the
+            token cache counters and the tile cache statistics
+        """
+        with self._lock:
+            counters = {'image_requests': self._image_requests, 'upstream_image_fetches': self._upstream_fetches}
+        return {
+            **counters,
+            **self.tokens.stats(),
+            'tile_cache': self.tile_cache.stats() if self.tile_cache is not None else None
+        }
+
+
+# Global service instance; tiles are cached on disk unless TILE_CACHE_MAX_MB is 0
+sentinel_service = SentinelService(
+    tile_cache=TileCache(config.TILE_CACHE_DIR, config.TILE_CACHE_MAX_MB * 1024 * 1024)
+    if config.TILE_CACHE_MAX_MB > 0 else None
+)
@@ -0,0 +1,161 @@
+"""
+Local stand-in for the Sentinel Hub OAuth and Process APIs.
+
+Serves POST /oauth/token and POST /api/v1/process on a background thread
+and answers each process request with a small PNG whose color is derived
+from the requested bbox, so the same bbox always gets the same image.
+Counts requests, and can add latency or fail the next N process requests
+(e.g. with 429) to exercise caching, retries and rate limiting.
+
+Usage:
+    python sentinel_stub.py --port 8081 --latency-ms 300
+    SENTINEL_BASE_URL=http://127.0.0.1:8081 python app.py
+
+In tests:
+    with SentinelStub() as stub:
+        service = SentinelService('id', 'secret', base_url=stub.url)
+"""
+
+import io
+import json
+import time
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+STUB_TOKEN = 'stub-token'
+
+
+class SentinelStub:
+    """Fake Sentinel Hub running on 127.0.0.1 in a daemon thread."""
+
+    def __init__(self, port: int = 0, latency_ms: float = 0.0, token_lifetime_seconds: int = 3600,
+                 image_size: int = 64):
+        """
+        Initialize SentinelStub.
+
+        Args:
+            port: Port to listen on (0 picks a free one)
+            latency_ms: Delay added to every process request
+            token_lifetime_seconds: expires_in returned with tokens
+            image_size: Width and height of the returned PNGs
+        """
+        self.latency_ms = latency_ms
+        self.token_lifetime_seconds = token_lifetime_seconds
+        self.image_size = image_size
+        self.token_requests = 0
+        self.process_requests = 0
+        self.max_concurrency = 0
+        self._active = 0
+        self._failures = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def fail_next(self, count: int, status: int = 429, retry_after: float = None) -> None:
+        """Answer the next `count` process requests with `status` (optionally with Retry-After)."""
+        with self._lock:
+            self._failures.extend([(status, retry_after)] * count)
+
+    def start(self) -> 'SentinelStub':
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05},
+                                        daemon=True, name='sentinel-stub')
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'SentinelStub':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def render(self, bbox) -> bytes:
+        """The PNG served for `bbox`: a solid color derived from its coordinates."""
+        digest = hashlib.sha256(json.dumps([round(v, 6) for v in bbox]).encode()).digest()
+        buf = io.BytesIO()
+        Image.new('RGB', (self.image_size, self.image_size), tuple(digest[:3])).save(buf, 'PNG')
+        return buf.getvalue()
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, content_type='application/json', headers=None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if self.path == '/oauth/token':
+                    with stub._lock:
+                        stub.token_requests += 1
+                    self._send(200, json.dumps({'access_token': STUB_TOKEN, 'token_type': 'Bearer',
+                                                'expires_in': stub.token_lifetime_seconds}).encode())
+                elif self.path == '/api/v1/process':
+                    self._process(body)
+                else:
+                    self._send(404, b'{"error": "not found"}')
+
+            def _process(self, body):
+                with stub._lock:
+                    stub.process_requests += 1
+                    stub._active += 1
+                    stub.max_concurrency = max(stub.max_concurrency, stub._active)
+                    failure = stub._failures.pop(0) if stub._failures else None
+                try:
+                    if stub.latency_ms:
+                        time.sleep(stub.latency_ms / 1000)
+                    if self.headers.get('Authorization') != f'Bearer {STUB_TOKEN}':
+                        self._send(401, b'{"error": "unauthorized"}')
+                    elif failure is not None:
+                        status, retry_after = failure
+                        headers = {'Retry-After': str(retry_after)} if retry_after is not None else None
+                        self._send(status, json.dumps({'error': {'status': status}}).encode(), headers=headers)
+                    else:
+                        bbox = json.loads(body)['input']['bounds']['bbox']
+                        self._send(200, stub.render(bbox), content_type='image/png')
+                finally:
+                    with stub._lock:
+                        stub._active -= 1
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local fake Sentinel Hub.')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--image-size', type=int, default=512)
+    args = parser.parse_args()
+
+    stub = SentinelStub(port=args.port, latency_ms=args.latency_ms, image_size=args.image_size)
+    print(f"Fake Sentinel Hub on {stub.url} (set SENTINEL_BASE_URL to use it)")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
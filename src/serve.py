@@ -0,0 +1,144 @@
+"""
+Production entry point: N preforked workers sharing one preloaded model.
+
+The parent process binds the listening socket, loads and warms the model
+once, moves eager weights into shared memory and freezes the GC so the
+forked workers share the weight pages instead of each holding a copy. Each
+worker then sets its own intra-op thread count (and optionally pins itself
+to a disjoint set of cores), so workers do not oversubscribe the CPU.
+Workers that exit are restarted; SIGTERM/SIGINT stops all of them.
+
+Usage:
+    python serve.py                                   # SERVE_WORKERS / SERVE_THREADS_PER_WORKER
+    python serve.py --workers 4 --threads-per-worker 2 --pin-cores --port 8000
+"""
+
+import os
+import gc
+import sys
+import signal
+import logging
+import argparse
+
+import torch
+from werkzeug.serving import make_server
+
+from config import config
+
+
+def worker_layout(workers: int, threads_per_worker: int, cpu_count: int):
+    """
+    Resolve worker and intra-op thread counts (0 means "derive from cpu_count").
+
+    Returns:
+        Tuple of (workers, threads_per_worker)
+    """
+    workers = workers if workers > 0 else cpu_count
+    threads_per_worker = threads_per_worker if threads_per_worker > 0 else max(1, cpu_count // workers)
+    return workers, threads_per_worker
+
+
+def worker_cores(index: int, threads_per_worker: int, cores):
+    """Cores for worker `index`: a contiguous, wrapping slice of the available cores."""
+    cores = sorted(cores)
+    return {cores[(index * threads_per_worker + i) % len(cores)] for i in range(threads_per_worker)}
+
+
+def preload(checkpoint_path=None):
+    """Import the app and load/warm its model in the parent process."""
+    # Single-threaded until fork: an OpenMP pool created here would not
+    # survive fork() in the workers
+    torch.set_num_threads(1)
+    import app as app_module
+
+    service = app_module.model_service
+    if checkpoint_path:
+        service.checkpoint_path = checkpoint_path
+    service.warmup()
+    if isinstance(service.model, torch.nn.Module):
+        # Shared-memory storages are never copied on write by the workers
+        service.model.share_memory()
+    return app_module.app
+
+
+def run_worker(server, index, threads_per_worker, pin_cores):
+    """Worker process body: configure threads, then serve until terminated."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    torch.set_num_threads(threads_per_worker)
+    if pin_cores and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, worker_cores(index, threads_per_worker, os.sched_getaffinity(0)))
+    print(f"Worker {index} (pid {os.getpid()}) serving with {threads_per_worker} intra-op thread(s)")
+    try:
+        server.serve_forever()
+    finally:
+        os._exit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve GeoCrop with preforked workers sharing one model.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=config.SERVE_WORKERS,
+                        help='Worker processes (0 = one per core)')
+    parser.add_argument('--threads-per-worker', type=int, default=config.SERVE_THREADS_PER_WORKER,
+                        help='torch intra-op threads per worker (0 = cores / workers)')
+    parser.add_argument('--pin-cores', action='store_true', help='Pin each worker to its own cores (Linux)')
+    parser.add_argument('--checkpoint', default=None, help='Override the eager model checkpoint')
+    parser.add_argument('--access-log', action='store_true', help='Log every request')
+    args = parser.parse_args()
+
+    cpu_count = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    workers, threads_per_worker = worker_layout(args.workers, args.threads_per_worker, cpu_count)
+    if not args.access_log:
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    app = preload(args.checkpoint)
+    server = make_server(args.host, args.port, app, threaded=True)
+    # Objects allocated so far (the app, the model) are never scanned or
+    # touched by the GC in the workers, keeping their pages shared
+    gc.freeze()
+
+    children = {}
+    stopping = False
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            run_worker(server, index, threads_per_worker, args.pin_cores)
+        children[pid] = index
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"Serving on http://{args.host}:{args.port} with {workers} worker(s) x "
+          f"{threads_per_worker} thread(s) on {cpu_count} core(s)")
+    for index in range(workers):
+        spawn(index)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index = children.pop(pid, None)
+        if index is not None and not stopping:
+            print(f"Worker {index} (pid {pid}) exited with status {status}, restarting")
+            spawn(index)
+    server.server_close()
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
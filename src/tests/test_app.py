@@ -0,0 +1,197 @@
+"""
+Tests for the Flask app's inference routes.
+"""
+
+import io
+import os
+import sys
+import json
+import pytest
+import torch
+from PIL import Image
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as flask_app
+from model import LiteGeoNet
+from inference_runtime import ModelService
+
+CROP_CLASSES = ['Maize', 'Rice', 'Wheat']
+TAB_COLUMNS = ['ph', 'N', 'P', 'K', 'rainfall', 'temp', 'lat', 'lon']
+FORM = {'ph': '6.5', 'N': '50', 'P': '30', 'K': '40', 'rainfall': '800', 'temp': '25', 'lat': '20.5', 'lon': '78.9'}
+
+
+def png_bytes(seed=0):
+    torch.manual_seed(seed)
+    pixels = (torch.rand(64, 64, 3) * 255).to(torch.uint8).numpy()
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, 'PNG')
+    return buf.getvalue()
+
+
+def row(i):
+    """Tabular row i, as form values keyed by column."""
+    return {**FORM, 'ph': str(5.5 + 0.5 * i), 'N': str(40 + 10 * i)}
+
+
+@pytest.fixture(scope='module')
+def model_service(tmp_path_factory):
+    """ModelService on a random-weight checkpoint, swapped into the app module."""
+    torch.manual_seed(0)
+    model = LiteGeoNet(num_classes=len(CROP_CLASSES), num_tabular_features=len(TAB_COLUMNS), pretrained=False)
+    path = str(tmp_path_factory.mktemp('app') / 'checkpoint.pth')
+    torch.save({'model_state_dict': model.state_dict(), 'crop_classes': CROP_CLASSES,
+                'tab_columns': TAB_COLUMNS}, path)
+    service = ModelService('eager', path, None, torch.device('cpu'))
+    service.warmup()
+    with patch.object(flask_app, 'model_service', service):
+        yield service
+
+
+@pytest.fixture
+def client(model_service):
+    return flask_app.app.test_client()
+
+
+def post_batch(client, images, data, query=''):
+    files = [(io.BytesIO(blob), f'{i}.png') for i, blob in enumerate(images)]
+    return client.post('/api/predict/batch' + query, data={**data, 'images': files})
+
+
+class TestPredictBatch:
+    """/api/predict/batch scores many fields like /predict, in input order."""
+
+    def test_results_in_input_order_with_per_row_errors(self, client):
+        images = [png_bytes(0), b'not an image', png_bytes(2)]
+        rows = json.dumps([row(i) for i in range(3)])
+
+        response = post_batch(client, images, {'rows': rows})
+
+        body = response.get_json()
+        assert response.status_code == 200
+        assert body['count'] == 3
+        assert [r['index'] for r in body['results']] == [0, 1, 2]
+        assert 'Error processing image' in body['results'][1]['error']
+        assert all(r['crop'] in CROP_CLASSES for r in (body['results'][0], body['results'][2]))
+
+    def test_matches_single_predictions(self, client):
+        images = [png_bytes(i) for i in range(3)]
+
+        results = post_batch(client, images, {'rows': json.dumps([row(i) for i in range(3)])}).get_json()['results']
+
+        for i, result in enumerate(results):
+            single = client.post('/predict', data={**row(i), 'image': (io.BytesIO(images[i]), 'field.png')}).get_json()
+            assert result['crop'] == single['crop']
+            assert result['confidence_value'] == pytest.approx(single['confidence_value'], abs=0.01)
+            assert result['image_weight'] == pytest.approx(single['image_weight'], abs=0.01)
+
+    def test_csv_rows_match_json_rows(self, client):
+        images = [png_bytes(i) for i in range(2)]
+        header = ','.join(TAB_COLUMNS)
+        csv_text = '\n'.join([header] + [','.join(row(i)[col] for col in TAB_COLUMNS) for i in range(2)])
+
+        from_json = post_batch(client, images, {'rows': json.dumps([row(i) for i in range(2)])}).get_json()
+        from_csv_field = post_batch(client, images, {'csv': csv_text}).get_json()
+        from_csv_file = post_batch(client, images, {'csv': (io.BytesIO(csv_text.encode()), 'rows.csv')}).get_json()
+
+        assert from_csv_field['results'] == from_json['results']
+        assert from_csv_file['results'] == from_json['results']
+
+    def test_image_and_row_counts_must_match(self, client):
+        response = post_batch(client, [png_bytes(0), png_bytes(1)], {'rows': json.dumps([row(0)])})
+
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'Got 2 images but 1 tabular rows'
+
+    def test_too_many_images(self, client):
+        with patch.object(flask_app.config, 'PREDICT_BATCH_MAX_ITEMS', 2):
+            response = post_batch(client, [png_bytes(i) for i in range(3)],
+                                  {'rows': json.dumps([row(i) for i in range(3)])})
+
+        assert response.status_code == 413
+
+    @pytest.mark.parametrize('data, message', [
+        ({}, "'rows' (JSON) or 'csv'"),
+        ({'rows': '[{"ph": 6.5'}, 'not valid JSON'),
+        ({'rows': '[[1, 2]]'}, 'Row 0')
+    ])
+    def test_invalid_rows(self, client, data, message):
+        response = post_batch(client, [png_bytes(0)], data)
+
+        assert response.status_code == 400
+        assert message in response.get_json()['error']
+
+    def test_streamed_results_match(self, client):
+        images = [png_bytes(i) for i in range(3)]
+        rows = json.dumps([row(i) for i in range(3)])
+
+        streamed = post_batch(client, images, {'rows': rows}, query='?stream=true')
+        body = post_batch(client, images, {'rows': rows}).get_json()
+
+        assert streamed.mimetype == 'application/x-ndjson'
+        assert [json.loads(line) for line in streamed.get_data(as_text=True).splitlines()] == body['results']
+
+
+class TestPredictSweep:
+    """/api/predict/sweep scores a parameter grid with one image."""
+
+    def post_sweep(self, client, sweep, image=None):
+        data = {**FORM, 'sweep': sweep if isinstance(sweep, str) else json.dumps(sweep),
+                'image': (io.BytesIO(image or png_bytes()), 'field.png')}
+        return client.post('/api/predict/sweep', data=data)
+
+    def test_grid_matches_per_row_forward(self, client, model_service):
+        response = self.post_sweep(client, {'N': {'min': 0, 'max': 100, 'steps': 3}, 'P': [10, 40]})
+
+        body = response.get_json()
+        assert response.status_code == 200
+        assert body['shape'] == [3, 2]
+        assert body['points'] == 6
+        assert [axis['column'] for axis in body['axes']] == ['N', 'P']
+        assert body['axes'][0]['values'] == [0.0, 50.0, 100.0]
+
+        image = flask_app.transform(Image.open(io.BytesIO(png_bytes())).convert('RGB')).unsqueeze(0)
+        base = [float(FORM[col]) for col in TAB_COLUMNS]
+        for i, n in enumerate(body['axes'][0]['values']):
+            for j, p in enumerate(body['axes'][1]['values']):
+                tab = list(base)
+                tab[TAB_COLUMNS.index('N')], tab[TAB_COLUMNS.index('P')] = n, p
+                with torch.no_grad():
+                    logits, _ = model_service.model(image, torch.tensor([tab]))
+                expected = torch.softmax(logits, dim=1)[0]
+                for k, crop in enumerate(CROP_CLASSES):
+                    assert body['probabilities'][crop][i][j] == pytest.approx(expected[k].item(), abs=1e-3)
+                assert body['best_crop_index'][i][j] == int(expected.argmax())
+
+    @pytest.mark.parametrize('sweep, message', [
+        ({'moisture': [1, 2]}, "Unknown column 'moisture'"),
+        ('{"N": [1, 2]', 'not valid JSON'),
+        ({'N': {'min': 0, 'max': 100, 'steps': 0}}, 'steps must be at least 1'),
+        ({'N': {'min': 0, 'max': 100, 'steps': -5}}, 'steps must be at least 1'),
+        ({'N': []}, 'no values to sweep'),
+        ({}, 'non-empty JSON object')
+    ])
+    def test_invalid_sweeps(self, client, sweep, message):
+        response = self.post_sweep(client, sweep)
+
+        assert response.status_code == 400
+        assert message in response.get_json()['error']
+
+    def test_oversized_grid(self, client):
+        with patch.object(flask_app.config, 'SWEEP_MAX_POINTS', 100):
+            response = self.post_sweep(client, {'N': {'min': 0, 'max': 100, 'steps': 20}, 'P': list(range(6))})
+
+        assert response.status_code == 400
+        assert 'more than 100 points' in response.get_json()['error']
+
+    def test_huge_steps_rejected_before_building_values(self, client):
+        with patch.object(flask_app.torch, 'linspace', side_effect=AssertionError('values built')):
+            response = self.post_sweep(client, {'N': {'min': 0, 'max': 100, 'steps': 1000000000}})
+
+        assert response.status_code == 400
+        assert 'points' in response.get_json()['error']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,385 @@
+"""
+Tests for the asyncio (ASGI) server variant.
+"""
+
+import io
+import os
+import sys
+import time
+import asyncio
+import pytest
+import torch
+from PIL import Image
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+httpx = pytest.importorskip('httpx')
+pytest.importorskip('starlette')
+pytest.importorskip('multipart')
+
+import app as flask_app
+import asgi_app
+from model import LiteGeoNet
+from inference_runtime import ModelService
+from weather_service import weather_service, _weather_cache
+from sentinel_service import SentinelService
+from feature_resolver import DEFAULT_REASONS
+
+CROP_CLASSES = ['Maize', 'Rice', 'Wheat']
+TAB_COLUMNS = ['ph', 'N', 'P', 'K', 'rainfall', 'temp', 'lat', 'lon']
+FORM = {'ph': '6.5', 'N': '50', 'P': '30', 'K': '40', 'rainfall': '800', 'temp': '25', 'lat': '20.5', 'lon': '78.9'}
+
+
+def png_bytes(seed=0):
+    torch.manual_seed(seed)
+    pixels = (torch.rand(64, 64, 3) * 255).to(torch.uint8).numpy()
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, 'PNG')
+    return buf.getvalue()
+
+
+@pytest.fixture(scope='module')
+def model_service(tmp_path_factory):
+    """ModelService on a random-weight checkpoint, swapped into the app module."""
+    torch.manual_seed(0)
+    model = LiteGeoNet(num_classes=len(CROP_CLASSES), num_tabular_features=len(TAB_COLUMNS), pretrained=False)
+    path = str(tmp_path_factory.mktemp('asgi') / 'checkpoint.pth')
+    torch.save({'model_state_dict': model.state_dict(), 'crop_classes': CROP_CLASSES,
+                'tab_columns': TAB_COLUMNS}, path)
+    service = ModelService('eager', path, None, torch.device('cpu'))
+    service.warmup()
+    with patch.object(flask_app, 'model_service', service):
+        yield service
+
+
+def run_with_upstream(handler, scenario):
+    """
+    Run `scenario(client)` against the ASGI app, with upstream HTTP calls
+    answered by `handler` instead of the network.
+    """
+    async def main():
+        asgi_app.app.state.upstream = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi_app.app),
+                                         base_url='http://test', timeout=60) as client:
+                return await scenario(client)
+        finally:
+            await asgi_app.app.state.upstream.aclose()
+    return asyncio.run(main())
+
+
+class TestRoutes:
+    """The ASGI server exposes the Flask app's routes."""
+
+    def test_same_routes_and_methods(self):
+        flask_routes = {
+            (rule.rule, method)
+            for rule in flask_app.app.url_map.iter_rules() if rule.endpoint != 'static'
+            for method in rule.methods - {'HEAD', 'OPTIONS'}
+        }
+        asgi_routes = {
+            (route.path, method)
+            for route in asgi_app.app.routes
+            for method in route.methods - {'HEAD'}
+        }
+
+        assert asgi_routes == flask_routes
+
+
+class TestPredict:
+    """Inference routes give the same answers as the Flask app."""
+
+    def test_predict_matches_flask(self, model_service):
+        image = png_bytes()
+        expected = flask_app.app.test_client().post(
+            '/predict', data={**FORM, 'image': (io.BytesIO(image), 'field.png')}).get_json()
+
+        async def scenario(client):
+            return await client.post('/predict', data=FORM, files={'image': ('field.png', image)})
+        response = run_with_upstream(lambda request: httpx.Response(500), scenario)
+
+        assert response.status_code == 200
+        assert response.json()['crop'] == expected['crop']
+        assert response.json()['confidence_value'] == expected['confidence_value']
+        # Gate weights come from the model, so both servers report the same split
+        assert response.json()['image_weight'] == expected['image_weight']
+        assert response.json()['image_weight'] + response.json()['tabular_weight'] == pytest.approx(100, abs=0.02)
+
+    def test_predict_fills_missing_weather_features(self, model_service):
+        _weather_cache.clear()
+        form = {col: value for col, value in FORM.items() if col not in ('rainfall', 'temp')}
+
+        async def scenario(client):
+            return await client.post('/predict', data=form, files={'image': ('field.png', png_bytes())})
+        with patch.object(weather_service, 'api_key', 'test-key'):
+            # The ASGI app awaits the weather on its async client, never the sync lookup
+            with patch.object(weather_service, 'get_weather_with_age', side_effect=AssertionError('sync lookup')):
+                response = run_with_upstream(openweathermap_response, scenario)
+            # Flask resolves on its thread pool, here from the now cached weather
+            expected = flask_app.app.test_client().post(
+                '/predict', data={**form, 'image': (io.BytesIO(png_bytes()), 'field.png')}).get_json()
+
+        features = response.json()['features']
+        assert response.status_code == 200
+        assert features['temp']['value'] == 22.5
+        assert features['temp']['source'] == 'forecast'
+        assert features['temp']['basis'] == 'mean daily temperature over the 1 day forecast'
+        assert features['rainfall'] == {'value': 0.0, 'source': 'default', 'reason': DEFAULT_REASONS['rainfall']}
+        assert features['ph'] == {'value': 6.5, 'source': 'form'}
+        assert expected['features']['temp']['value'] == features['temp']['value']
+        assert expected['features']['rainfall'] == features['rainfall']
+
+    def test_predict_invalid_feature(self, model_service):
+        response = flask_app.app.test_client().post(
+            '/predict', data={**FORM, 'ph': 'acidic', 'image': (io.BytesIO(png_bytes()), 'field.png')})
+
+        assert response.status_code == 400
+        assert 'Invalid tabular data' in response.get_json()['error']
+
+    def test_predict_without_image(self, model_service):
+        async def scenario(client):
+            return await client.post('/predict', data=FORM)
+        response = run_with_upstream(lambda request: httpx.Response(500), scenario)
+
+        assert response.status_code == 400
+        assert response.json() == {'error': 'No image uploaded'}
+
+    def test_batch_streams_ndjson(self, model_service):
+        images = [('images', (f'{i}.png', png_bytes(i))) for i in range(3)]
+        rows = '[' + ','.join(['{"ph": 6.5, "N": 50}'] * 3) + ']'
+
+        async def scenario(client):
+            return await client.post('/api/predict/batch?stream=true', data={'rows': rows}, files=images)
+        response = run_with_upstream(lambda request: httpx.Response(500), scenario)
+
+        lines = response.text.strip().split('\n')
+        assert response.headers['content-type'].startswith('application/x-ndjson')
+        assert [line.startswith('{"index": %d' % i) for i, line in enumerate(lines)] == [True] * 3
+
+
+class TestSlowUpstreams:
+    """Upstream calls are awaited, not parked on threads."""
+
+    def test_slow_upstreams_do_not_starve_predict(self, model_service):
+        upstream_delay = 1.0
+
+        async def slow_gemini(request):
+            await asyncio.sleep(upstream_delay)
+            return httpx.Response(200, json={'candidates': [{'content': {'parts': [{'text': 'Plant millet.'}]}}]})
+
+        async def scenario(client):
+            chats = [asyncio.create_task(client.post('/api/chat', json={'message': 'What to plant?'}))
+                     for _ in range(200)]
+            await asyncio.sleep(0.1)
+            start = time.perf_counter()
+            response = await client.post('/predict', data=FORM, files={'image': ('field.png', png_bytes())})
+            predict_seconds = time.perf_counter() - start
+            return response, predict_seconds, await asyncio.gather(*chats)
+
+        with patch.object(flask_app, 'GEMINI_API_KEY', 'test-key'):
+            response, predict_seconds, chats = run_with_upstream(slow_gemini, scenario)
+
+        assert response.status_code == 200
+        assert predict_seconds < upstream_delay
+        assert all(chat.json() == {'response': 'Plant millet.'} for chat in chats)
+
+    def test_slow_weather_does_not_hold_inference_threads(self, model_service):
+        _weather_cache.clear()
+        weather_delay = 1.0
+        without_temp = {col: value for col, value in FORM.items() if col != 'temp'}
+
+        async def slow_openweathermap(request):
+            await asyncio.sleep(weather_delay)
+            return openweathermap_response(request)
+
+        async def scenario(client):
+            waiting = [asyncio.create_task(client.post('/predict', data=without_temp,
+                                                       files={'image': ('field.png', png_bytes())}))
+                       for _ in range(3 * asgi_app.config.ASGI_INFERENCE_THREADS)]
+            await asyncio.sleep(0.2)
+            start = time.perf_counter()
+            response = await client.post('/predict', data=FORM, files={'image': ('field.png', png_bytes())})
+            predict_seconds = time.perf_counter() - start
+            return response, predict_seconds, await asyncio.gather(*waiting)
+
+        with patch.object(weather_service, 'api_key', 'test-key'):
+            response, predict_seconds, waited = run_with_upstream(slow_openweathermap, scenario)
+
+        assert response.status_code == 200
+        assert predict_seconds < weather_delay / 2
+        assert all(r.json()['features']['temp']['source'] == 'forecast' for r in waited)
+
+    def test_weather_lookup_overlaps_image_decoding(self, model_service):
+        _weather_cache.clear()
+        delay = 0.5
+        without_temp = {col: value for col, value in FORM.items() if col != 'temp'}
+        prepare_image = flask_app.prepare_image
+
+        def slow_prepare_image(image_bytes):
+            time.sleep(delay)
+            return prepare_image(image_bytes)
+
+        async def slow_openweathermap(request):
+            await asyncio.sleep(delay)
+            return openweathermap_response(request)
+
+        async def scenario(client):
+            start = time.perf_counter()
+            # A fresh image, so decoding is not skipped for cached features
+            response = await client.post('/predict', data=without_temp, files={'image': ('field.png', png_bytes(7))})
+            return response, time.perf_counter() - start
+
+        with patch.object(weather_service, 'api_key', 'test-key'), \
+                patch.object(flask_app, 'prepare_image', side_effect=slow_prepare_image) as decode:
+            response, predict_seconds = run_with_upstream(slow_openweathermap, scenario)
+
+        assert response.status_code == 200
+        assert decode.call_count == 1
+        assert response.json()['features']['temp']['source'] == 'forecast'
+        assert predict_seconds < 1.6 * delay
+
+    def test_chat_timeout(self):
+        def timeout(request):
+            raise httpx.ReadTimeout('timed out', request=request)
+
+        async def scenario(client):
+            return await client.post('/api/chat', json={'message': 'hi'})
+        with patch.object(flask_app, 'GEMINI_API_KEY', 'test-key'):
+            response = run_with_upstream(timeout, scenario)
+
+        assert response.status_code == 504
+
+
+class TestSampleImage:
+    """Sentinel Hub imagery is fetched on the async client with a cached token."""
+
+    def test_token_fetched_once(self):
+        calls = []
+
+        def sentinel(request):
+            calls.append(request.url.path)
+            if request.url.path == '/oauth/token':
+                return httpx.Response(200, json={'access_token': 'abc', 'expires_in': 3599})
+            assert request.headers['Authorization'] == 'Bearer abc'
+            return httpx.Response(200, content=b'png-bytes')
+
+        async def scenario(client):
+            return [await client.get(f'/get_sample_image?lat=20.5&lon={78.9 + i}') for i in range(3)]
+        service = SentinelService(client_id='id', client_secret='secret')
+        with patch.object(asgi_app, 'sentinel_service', service), \
+                patch.object(asgi_app.config, 'is_sentinel_configured', return_value=True):
+            responses = run_with_upstream(sentinel, scenario)
+
+        assert [r.content for r in responses] == [b'png-bytes'] * 3
+        assert calls.count('/oauth/token') == 1
+        assert service.stats()['image_requests'] == 3
+
+
+def openweathermap_response(request):
+    """Canned OpenWeatherMap /weather and /forecast responses."""
+    if request.url.path.endswith('/weather'):
+        return httpx.Response(200, json={
+            'main': {'temp': 24.46, 'humidity': 60}, 'wind': {'speed': 2.0},
+            'weather': [{'main': 'Clear', 'icon': '01d', 'description': 'clear sky'}]})
+    return httpx.Response(200, json={'list': [
+        {'dt_txt': '2026-01-01 00:00:00', 'main': {'temp': 18.0},
+         'weather': [{'main': 'Rain', 'icon': '10d'}]},
+        {'dt_txt': '2026-01-01 12:00:00', 'main': {'temp': 27.0},
+         'weather': [{'main': 'Clear', 'icon': '01d'}]}]})
+
+
+class TestWeather:
+    """The async weather path fetches and parses like the sync one."""
+
+    def setup_method(self):
+        _weather_cache.clear()
+
+    def test_weather_fetched_concurrently_and_cached(self):
+        calls = []
+
+        def openweathermap(request):
+            calls.append(request.url.path)
+            return openweathermap_response(request)
+
+        async def scenario(client):
+            first = await client.get('/api/weather?lat=28.61&lon=77.21')
+            second = await client.get('/api/weather?lat=28.61&lon=77.21')
+            return first, second
+        with patch.object(weather_service, 'api_key', 'test-key'):
+            first, second = run_with_upstream(openweathermap, scenario)
+
+        assert first.status_code == 200
+        assert first.json()['current']['temperature'] == 24.5
+        assert first.json()['current']['wind_speed'] == 7.2
+        assert first.json()['forecast'] == [
+            {'date': '2026-01-01', 'temp_high': 27.0, 'temp_low': 18.0, 'condition': 'Rain', 'icon': '10d',
+             'temp_mean': 22.5, 'precipitation_mm': 0.0, 'humidity_mean': None}]
+        assert second.json() == first.json()
+        assert sorted(calls) == ['/data/2.5/forecast', '/data/2.5/weather']
+
+    def test_upstream_error(self):
+        async def scenario(client):
+            return await client.get('/api/weather?lat=1&lon=2')
+        with patch.object(weather_service, 'api_key', 'test-key'):
+            response = run_with_upstream(lambda request: httpx.Response(502), scenario)
+
+        assert response.status_code == 500
+        assert 'Failed to fetch weather' in response.json()['error']
+
+    def test_batch_dedupes_cells(self):
+        calls = []
+
+        def openweathermap(request):
+            calls.append((request.url.params['lat'], request.url.path))
+            return openweathermap_response(request)
+
+        locations = [{'lat': 28.611, 'lon': 77.21}, [28.612, 77.21], {'lat': 19.07, 'lon': 72.88}]
+
+        async def scenario(client):
+            return await client.post('/api/weather/batch', json={'locations': locations})
+        with patch.object(weather_service, 'api_key', 'test-key'):
+            response = run_with_upstream(openweathermap, scenario)
+
+        body = response.json()
+        assert response.status_code == 200
+        assert (body['count'], body['cells']) == (3, 2)
+        assert [(r['lat'], r['lon']) for r in body['results']] == [(28.611, 77.21), (28.612, 77.21), (19.07, 72.88)]
+        assert all(r['current']['temperature'] == 24.5 for r in body['results'])
+        assert len(calls) == 4
+
+    def test_batch_reports_failures_per_location(self):
+        def openweathermap(request):
+            if request.url.params['lat'] == '1.0':
+                return httpx.Response(502)
+            return openweathermap_response(request)
+
+        async def scenario(client):
+            return await client.post('/api/weather/batch', json={'locations': [[1, 2], [3, 4]]})
+        with patch.object(weather_service, 'api_key', 'test-key'):
+            response = run_with_upstream(openweathermap, scenario)
+
+        first, second = response.json()['results']
+        assert 'Failed to fetch weather' in first['error']
+        assert 'current' in second
+
+    @pytest.mark.parametrize('body, status', [
+        ({'locations': [{'lat': 1}]}, 400),
+        ({'locations': [[91, 0]]}, 400),
+        ({'locations': []}, 400),
+        ([1, 2], 400),
+        ({'locations': [[1, 2]] * 501}, 413),
+    ])
+    def test_batch_validation_matches_flask(self, body, status):
+        async def scenario(client):
+            return await client.post('/api/weather/batch', json=body)
+        with patch.object(weather_service, 'api_key', 'test-key'):
+            asgi_response = run_with_upstream(openweathermap_response, scenario)
+            flask_response = flask_app.app.test_client().post('/api/weather/batch', json=body)
+
+        assert asgi_response.status_code == flask_response.status_code == status
+        assert asgi_response.json() == flask_response.get_json()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
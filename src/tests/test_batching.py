@@ -0,0 +1,157 @@
+"""
+Tests for the micro-batching inference engine.
+"""
+
+import os
+import sys
+import threading
+import pytest
+import torch
+import torch.nn as nn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batching import MicroBatcher, Histogram
+
+
+class TinyFusionModel(nn.Module):
+    """Small stand-in for LiteGeoNet returning (logits, gate_weights)."""
+
+    def __init__(self):
+        super().__init__()
+        torch.manual_seed(0)
+        self.img = nn.Linear(12, 4)
+        self.tab = nn.Linear(3, 4)
+        self.gate = nn.Linear(8, 2)
+
+    def forward(self, img, tab):
+        img_emb = self.img(img.flatten(1))
+        tab_emb = self.tab(tab)
+        gate = torch.softmax(self.gate(torch.cat([img_emb, tab_emb], dim=1)), dim=1)
+        return img_emb + tab_emb, gate
+
+
+class TestHistogram:
+    """Unit tests for Histogram."""
+
+    def test_buckets_and_percentiles(self):
+        hist = Histogram(buckets=(1, 2, 4))
+        for value in [1, 1, 2, 3, 10]:
+            hist.observe(value)
+
+        snap = hist.snapshot()
+
+        assert snap['count'] == 5
+        assert snap['buckets'] == {'le_1': 2, 'le_2': 1, 'le_4': 1, 'overflow': 1}
+        assert snap['p50'] == 2
+        assert snap['p99'] == 10
+
+    def test_empty_snapshot(self):
+        snap = Histogram(buckets=(1,)).snapshot()
+        assert snap['count'] == 0
+        assert snap['p99'] == 0.0
+
+
+class TestMicroBatcher:
+    """Unit tests for MicroBatcher."""
+
+    def setup_method(self):
+        self.model = TinyFusionModel().eval()
+
+    def test_single_request_matches_direct_call(self):
+        batcher = MicroBatcher(self.model, max_batch_size=8, max_wait_ms=0)
+        img, tab = torch.randn(1, 3, 2, 2), torch.randn(1, 3)
+
+        logits, gate = batcher.predict(img, tab, timeout=5)
+
+        with torch.no_grad():
+            expected_logits, expected_gate = self.model(img, tab)
+        assert torch.allclose(logits, expected_logits, atol=1e-6)
+        assert torch.allclose(gate, expected_gate, atol=1e-6)
+        batcher.close()
+
+    def test_concurrent_requests_are_grouped_and_sliced(self):
+        batcher = MicroBatcher(self.model, max_batch_size=8, max_wait_ms=500)
+        inputs = [(torch.randn(1, 3, 2, 2), torch.randn(1, 3)) for _ in range(8)]
+        results = [None] * len(inputs)
+        barrier = threading.Barrier(len(inputs))
+
+        def worker(i):
+            barrier.wait()
+            results[i] = batcher.predict(*inputs[i], timeout=5)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(inputs))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for (img, tab), (logits, gate) in zip(inputs, results):
+            with torch.no_grad():
+                expected_logits, expected_gate = self.model(img, tab)
+            assert logits.shape == (1, 4)
+            assert torch.allclose(logits, expected_logits, atol=1e-5)
+            assert torch.allclose(gate, expected_gate, atol=1e-5)
+
+        stats = batcher.stats()
+        assert stats['requests'] == 8
+        assert stats['batches'] < 8
+        assert stats['batch_size']['count'] == stats['batches']
+        assert stats['queue_wait_ms']['count'] == 8
+        batcher.close()
+
+    def test_batch_never_exceeds_max_size(self):
+        batcher = MicroBatcher(self.model, max_batch_size=3, max_wait_ms=50)
+        futures = [batcher.submit(torch.randn(1, 3, 2, 2), torch.randn(1, 3)) for _ in range(10)]
+        for f in futures:
+            f.result(timeout=5)
+
+        stats = batcher.stats()
+        assert stats['requests'] == 10
+        assert stats['batches'] >= 4
+        assert stats['batch_size']['p99'] <= 3
+        batcher.close()
+
+    def test_multi_sample_requests_never_overflow_a_batch(self):
+        sizes = []
+
+        def model(img, tab):
+            sizes.append(img.shape[0])
+            return self.model(img, tab)
+
+        batcher = MicroBatcher(model, max_batch_size=4, max_wait_ms=50)
+        requests = [(torch.randn(n, 3, 2, 2), torch.randn(n, 3)) for n in (3, 3, 2, 1, 4, 1)]
+        futures = [batcher.submit(img, tab) for img, tab in requests]
+        results = [f.result(timeout=5) for f in futures]
+
+        assert max(sizes) <= 4
+        assert sum(sizes) == 14
+        for (img, tab), (logits, _) in zip(requests, results):
+            assert torch.allclose(logits, self.model(img, tab)[0], atol=1e-6)
+        batcher.close()
+
+    def test_errors_propagate_to_every_caller(self):
+        def failing(img, tab):
+            raise RuntimeError("boom")
+
+        batcher = MicroBatcher(failing, max_batch_size=4, max_wait_ms=0)
+
+        with pytest.raises(RuntimeError, match="boom"):
+            batcher.predict(torch.randn(1, 3, 2, 2), torch.randn(1, 3), timeout=5)
+        assert batcher.stats()['errors'] == 1
+        batcher.close()
+
+    def test_submit_after_close_raises(self):
+        batcher = MicroBatcher(self.model)
+        batcher.close()
+
+        with pytest.raises(RuntimeError):
+            batcher.submit(torch.randn(1, 3, 2, 2), torch.randn(1, 3))
+
+    def test_invalid_batch_size(self):
+        with pytest.raises(ValueError):
+            MicroBatcher(self.model, max_batch_size=0)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,81 @@
+"""
+Tests for the in-process LRU cache.
+"""
+
+import os
+import sys
+import threading
+import pytest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import LRUCache
+
+
+class TestLRUCache:
+    """Unit tests for LRUCache."""
+
+    def test_hit_and_miss_counters(self):
+        cache = LRUCache(max_entries=4)
+        cache.put('a', 1)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['hit_rate'] == 0.5
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_entries=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+        assert cache.stats()['evictions'] == 1
+
+    def test_entries_expire_after_ttl(self):
+        cache = LRUCache(max_entries=2, ttl_seconds=10)
+        with patch('cache.time.monotonic', return_value=100.0):
+            cache.put('a', 1)
+        with patch('cache.time.monotonic', return_value=105.0):
+            assert cache.get('a') == 1
+        with patch('cache.time.monotonic', return_value=111.0):
+            assert cache.get('a') is None
+
+        assert len(cache) == 0
+        assert cache.stats()['expirations'] == 1
+
+    def test_zero_size_disables_cache(self):
+        cache = LRUCache(max_entries=0)
+        cache.put('a', 1)
+
+        assert cache.get('a') is None
+        assert len(cache) == 0
+
+    def test_concurrent_access_stays_bounded(self):
+        cache = LRUCache(max_entries=50)
+
+        def worker(offset):
+            for i in range(500):
+                cache.put((offset, i), i)
+                cache.get((offset, i - 1))
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        stats = cache.stats()
+        assert stats['size'] == 50
+        assert stats['hits'] + stats['misses'] == 8 * 500
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,179 @@
+"""
+Tests for the CropDataset module.
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+from PIL import Image
+from torchvision import transforms
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset import CropDataset, BatchCollate, build_image_cache, normalize_batch
+
+CROP_CLASSES = ['Maize', 'Rice', 'Wheat']
+TAB_COLUMNS = ['ph', 'N', 'P', 'K', 'rainfall', 'temp', 'lat', 'lon']
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    """Write 6 random 64x64 images and a manifest in the crops_full.csv schema."""
+    rng = np.random.default_rng(0)
+    rows = []
+    for i in range(6):
+        name = f'images/img_{i}.png'
+        os.makedirs(tmp_path / 'images', exist_ok=True)
+        Image.fromarray(rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)).save(tmp_path / name)
+        rows.append([name, 6.0 + i, 10 * i, 20, 30, 900, 25.0, 19.0, 73.0, CROP_CLASSES[i % 3]])
+    path = tmp_path / 'manifest.csv'
+    pd.DataFrame(rows, columns=['image_path'] + TAB_COLUMNS + ['crop_label']).to_csv(path, index=False)
+    return path
+
+
+def to_tensor_transform():
+    return transforms.Compose([
+        transforms.Resize((64, 64)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+    ])
+
+
+class TestImageCache:
+    """Tests for the packed image cache."""
+
+    def test_cached_samples_match_decoded_images(self, tmp_path, manifest):
+        cache_path = str(tmp_path / 'cache.npy')
+        build_image_cache(str(manifest), str(tmp_path), cache_path, num_workers=0)
+
+        decoded = CropDataset(str(manifest), str(tmp_path), transform=to_tensor_transform(),
+                              crop_classes=CROP_CLASSES, tab_columns=TAB_COLUMNS)
+        cached = CropDataset(str(manifest), str(tmp_path), crop_classes=CROP_CLASSES,
+                             tab_columns=TAB_COLUMNS, image_cache=cache_path)
+
+        assert len(cached) == len(decoded)
+        for idx in range(len(decoded)):
+            image, tab, label = cached[idx]
+            expected_image, expected_tab, expected_label = decoded[idx]
+            assert image.dtype == torch.uint8
+            assert image.shape == (3, 64, 64)
+            assert torch.allclose(normalize_batch(image.unsqueeze(0))[0], expected_image, atol=1e-5)
+            assert torch.equal(tab, expected_tab)
+            assert label == expected_label
+
+    def test_transform_receives_pil_image_with_cache(self, tmp_path, manifest):
+        cache_path = str(tmp_path / 'cache.npy')
+        build_image_cache(str(manifest), str(tmp_path), cache_path, num_workers=0)
+        seen = []
+
+        def pil_only(image):
+            seen.append(type(image))
+            return to_tensor_transform()(image)
+
+        decoded = CropDataset(str(manifest), str(tmp_path), transform=pil_only,
+                              crop_classes=CROP_CLASSES, tab_columns=TAB_COLUMNS)
+        cached = CropDataset(str(manifest), str(tmp_path), transform=pil_only,
+                             crop_classes=CROP_CLASSES, tab_columns=TAB_COLUMNS, image_cache=cache_path)
+
+        assert torch.allclose(cached[2][0], decoded[2][0], atol=1e-5)
+        assert all(issubclass(kind, Image.Image) for kind in seen)
+
+    def test_cache_rows_follow_index_not_csv_order(self, tmp_path, manifest):
+        cache_path = str(tmp_path / 'cache.npy')
+        build_image_cache(str(manifest), str(tmp_path), cache_path, num_workers=0)
+        reversed_csv = tmp_path / 'reversed.csv'
+        pd.read_csv(manifest).iloc[::-1].to_csv(reversed_csv, index=False)
+
+        dataset = CropDataset(str(reversed_csv), str(tmp_path), crop_classes=CROP_CLASSES,
+                              tab_columns=TAB_COLUMNS, image_cache=cache_path)
+
+        expected = np.asarray(Image.open(tmp_path / 'images/img_5.png').convert('RGB'))
+        assert np.array_equal(dataset[0][0].permute(1, 2, 0).numpy(), expected)
+
+    def test_missing_cache_entries_raise(self, tmp_path, manifest):
+        cache_path = str(tmp_path / 'cache.npy')
+        partial_csv = tmp_path / 'partial.csv'
+        pd.read_csv(manifest).iloc[:2].to_csv(partial_csv, index=False)
+        build_image_cache(str(partial_csv), str(tmp_path), cache_path, num_workers=0)
+
+        with pytest.raises(ValueError, match="missing from cache"):
+            CropDataset(str(manifest), str(tmp_path), crop_classes=CROP_CLASSES,
+                        tab_columns=TAB_COLUMNS, image_cache=cache_path)
+
+
+class TestTabularStore:
+    """Tests for the pre-extracted tabular features and labels."""
+
+    def test_features_and_labels_match_csv(self, tmp_path, manifest):
+        dataset = CropDataset(str(manifest), str(tmp_path), crop_classes=CROP_CLASSES, tab_columns=TAB_COLUMNS)
+        frame = pd.read_csv(manifest)
+
+        assert dataset.tab_data.dtype == torch.float32
+        assert dataset.tab_data.is_contiguous()
+        assert dataset.labels.dtype == torch.int64
+        assert not hasattr(dataset, 'data_frame')
+        for idx in range(len(frame)):
+            _, tab, label = dataset[idx]
+            expected = torch.tensor(frame.iloc[idx][TAB_COLUMNS].values.astype('float32'))
+            assert torch.equal(tab, expected)
+            assert label.item() == CROP_CLASSES.index(frame.iloc[idx]['crop_label'])
+
+    def test_share_memory(self, tmp_path, manifest):
+        dataset = CropDataset(str(manifest), str(tmp_path), crop_classes=CROP_CLASSES,
+                              tab_columns=TAB_COLUMNS, share_memory=True)
+
+        assert dataset.tab_data.is_shared()
+        assert dataset.labels.is_shared()
+
+    def test_unknown_label_raises(self, tmp_path, manifest):
+        with pytest.raises(ValueError, match="Unknown crop labels"):
+            CropDataset(str(manifest), str(tmp_path), crop_classes=['Maize'], tab_columns=TAB_COLUMNS)
+
+
+class TestBatchCollate:
+    """Tests for batch-level preprocessing."""
+
+    def test_matches_per_sample_transform(self, tmp_path, manifest):
+        raw = CropDataset(str(manifest), str(tmp_path), crop_classes=CROP_CLASSES, tab_columns=TAB_COLUMNS)
+        decoded = CropDataset(str(manifest), str(tmp_path), transform=to_tensor_transform(),
+                              crop_classes=CROP_CLASSES, tab_columns=TAB_COLUMNS)
+
+        images, tab, labels = BatchCollate(image_size=64)([raw[i] for i in range(len(raw))])
+
+        assert raw[0][0].dtype == torch.uint8
+        assert images.shape == (6, 3, 64, 64)
+        assert torch.allclose(images, torch.stack([decoded[i][0] for i in range(6)]), atol=1e-5)
+        assert torch.equal(tab, raw.tab_data)
+        assert torch.equal(labels, raw.labels)
+
+    def test_resizes_mixed_sizes(self):
+        samples = [
+            (torch.zeros(3, 64, 64, dtype=torch.uint8), torch.zeros(8), torch.tensor(0)),
+            (torch.zeros(3, 128, 96, dtype=torch.uint8), torch.zeros(8), torch.tensor(1)),
+        ]
+
+        images, _, _ = BatchCollate(image_size=32)(samples)
+
+        assert images.shape == (2, 3, 32, 32)
+
+    def test_augmentation_is_a_dihedral_transform(self):
+        torch.manual_seed(0)
+        base = torch.arange(3 * 8 * 8, dtype=torch.float32).view(3, 8, 8) % 256
+        samples = [(base.to(torch.uint8), torch.zeros(8), torch.tensor(0)) for _ in range(16)]
+        plain = BatchCollate(image_size=8)(samples[:1])[0][0]
+        variants = []
+        for flipped in (plain, plain.flip(-1)):
+            variants += [torch.rot90(flipped, k, dims=(-2, -1)) for k in range(4)]
+
+        images, _, _ = BatchCollate(image_size=8, augment=True)(samples)
+
+        for image in images:
+            assert any(torch.allclose(image, v) for v in variants)
+        assert len({tuple(image.flatten()[:5].tolist()) for image in images}) > 1
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,93 @@
+"""
+Tests for the backbone embedding cache.
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+import torch.nn as nn
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset import CropDataset, BatchCollate
+from embedding_cache import backbone_fingerprint, build_embedding_cache, load_embedding_cache, EmbeddingDataset
+
+CROP_CLASSES = ['Maize', 'Rice']
+TAB_COLUMNS = ['ph', 'N', 'P', 'K', 'rainfall', 'temp', 'lat', 'lon']
+
+
+class TinyBackbone(nn.Module):
+    """Cheap stand-in for EfficientNet producing 16-dim features."""
+
+    def __init__(self):
+        super().__init__()
+        self.conv = nn.Conv2d(3, 16, 3)
+        self.pool = nn.AdaptiveAvgPool2d(1)
+
+    def forward(self, x):
+        return self.pool(self.conv(x)).flatten(1)
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    """Dataset with 5 rows over 4 distinct images."""
+    rng = np.random.default_rng(0)
+    os.makedirs(tmp_path / 'images')
+    for i in range(4):
+        Image.fromarray(rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)).save(tmp_path / f'images/{i}.png')
+    rows = [[f'images/{i % 4}.png', 6.0, i, 1, 1, 900, 25.0, 19.0, 73.0, CROP_CLASSES[i % 2]] for i in range(5)]
+    path = tmp_path / 'manifest.csv'
+    pd.DataFrame(rows, columns=['image_path'] + TAB_COLUMNS + ['crop_label']).to_csv(path, index=False)
+    return CropDataset(str(path), str(tmp_path), crop_classes=CROP_CLASSES, tab_columns=TAB_COLUMNS)
+
+
+class TestEmbeddingCache:
+    """Unit tests for the embedding cache."""
+
+    def test_build_stores_one_row_per_image(self, tmp_path, dataset):
+        torch.manual_seed(0)
+        backbone = TinyBackbone()
+        cache_path = str(tmp_path / 'emb.npy')
+
+        features, row_of = build_embedding_cache(backbone, dataset, cache_path, torch.device('cpu'), feature_dim=16)
+
+        assert features.shape == (4, 16)
+        images, _, _ = BatchCollate()([dataset[i] for i in range(4)])
+        with torch.no_grad():
+            expected = backbone(images).numpy()
+        for i in range(4):
+            assert np.allclose(features[row_of[f'images/{i}.png']], expected[i], atol=1e-5)
+
+    def test_cache_invalidated_when_backbone_changes(self, tmp_path, dataset):
+        backbone = TinyBackbone()
+        cache_path = str(tmp_path / 'emb.npy')
+        build_embedding_cache(backbone, dataset, cache_path, torch.device('cpu'), feature_dim=16)
+
+        assert load_embedding_cache(cache_path, backbone_fingerprint(backbone)) is not None
+        with torch.no_grad():
+            backbone.conv.weight.add_(0.01)
+        assert load_embedding_cache(cache_path, backbone_fingerprint(backbone)) is None
+
+    def test_missing_cache_returns_none(self, tmp_path):
+        assert load_embedding_cache(str(tmp_path / 'nope.npy'), 'abc') is None
+
+    def test_embedding_dataset_rows(self, tmp_path, dataset):
+        backbone = TinyBackbone()
+        features, row_of = build_embedding_cache(backbone, dataset, str(tmp_path / 'emb.npy'),
+                                                 torch.device('cpu'), feature_dim=16)
+
+        emb_dataset = EmbeddingDataset(dataset, features, row_of)
+
+        assert len(emb_dataset) == 5
+        img_feat, tab, label = emb_dataset[4]
+        assert torch.allclose(img_feat, emb_dataset[0][0])
+        assert torch.equal(tab, dataset.tab_data[4])
+        assert label == dataset.labels[4]
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
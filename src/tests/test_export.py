@@ -0,0 +1,164 @@
+"""
+Tests for model loading and the TorchScript and ONNX inference runtimes.
+"""
+
+import os
+import sys
+import pytest
+import timm
+import torch
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model import LiteGeoNet
+from inference_runtime import export_torchscript, export_onnx, load_model, ModelService
+
+CROP_CLASSES = ['Maize', 'Rice', 'Wheat', 'Cotton']
+TAB_COLUMNS = ['ph', 'N', 'P', 'K', 'rainfall', 'temp', 'lat', 'lon']
+
+
+@pytest.fixture(scope='module')
+def checkpoint(tmp_path_factory):
+    """Checkpoint of a LiteGeoNet with random backbone weights (no download)."""
+    torch.manual_seed(0)
+    model = LiteGeoNet(num_classes=len(CROP_CLASSES), num_tabular_features=len(TAB_COLUMNS), pretrained=False)
+    path = str(tmp_path_factory.mktemp('export') / 'checkpoint.pth')
+    torch.save({'model_state_dict': model.state_dict(), 'crop_classes': CROP_CLASSES,
+                'tab_columns': TAB_COLUMNS}, path)
+    eager, _, _ = load_model('eager', path, None, torch.device('cpu'))
+    return path, eager
+
+
+@pytest.fixture(scope='module', params=['torchscript', 'onnx'])
+def runtime(request, checkpoint, tmp_path_factory):
+    """Exported model loaded through load_model()."""
+    _, eager = checkpoint
+    if request.param == 'onnx':
+        pytest.importorskip('onnxruntime')
+        artifact = str(tmp_path_factory.mktemp('onnx'))
+        export_onnx(eager, artifact, CROP_CLASSES, TAB_COLUMNS)
+    else:
+        artifact = str(tmp_path_factory.mktemp('torchscript') / 'model.pt')
+        export_torchscript(eager, artifact, CROP_CLASSES, TAB_COLUMNS)
+    return load_model(request.param, None, artifact, torch.device('cpu'))
+
+
+class TestRuntimeParity:
+    """Exported runtimes must reproduce the eager model's outputs."""
+
+    @pytest.mark.parametrize('batch_size', [1, 5, 64])
+    def test_forward_matches_eager(self, checkpoint, runtime, batch_size):
+        _, eager = checkpoint
+        model, _, _ = runtime
+        torch.manual_seed(batch_size)
+        img, tab = torch.randn(batch_size, 3, 64, 64), torch.randn(batch_size, 8)
+
+        with torch.no_grad():
+            expected_logits, expected_gate = eager(img, tab)
+            logits, gate = model(img, tab)
+
+        assert logits.shape == expected_logits.shape
+        assert torch.allclose(logits, expected_logits, atol=1e-4)
+        assert torch.allclose(gate, expected_gate, atol=1e-4)
+
+    def test_stages_match_eager(self, checkpoint, runtime):
+        _, eager = checkpoint
+        model, _, _ = runtime
+        img, tab = torch.randn(3, 3, 64, 64), torch.randn(3, 8)
+
+        with torch.no_grad():
+            expected_feat = eager.encode_image(img)
+            img_feat = model.encode_image(img)
+            expected_logits, _ = eager.forward_head(expected_feat, tab)
+            logits, _ = model.forward_head(img_feat, tab)
+
+        assert torch.allclose(img_feat, expected_feat, atol=1e-4)
+        assert torch.allclose(logits, expected_logits, atol=1e-4)
+
+    def test_forward_broadcast_matches_eager(self, checkpoint, runtime):
+        _, eager = checkpoint
+        model, _, _ = runtime
+        img, tab = torch.randn(1, 3, 64, 64), torch.randn(7, 8)
+
+        with torch.no_grad():
+            img_feat = eager.encode_image(img)
+            expected_logits, _ = eager.forward_broadcast(img_feat, tab)
+            logits, _ = model.forward_broadcast(img_feat, tab)
+
+        assert logits.shape == (7, len(CROP_CLASSES))
+        assert torch.allclose(logits, expected_logits, atol=1e-4)
+
+    def test_metadata_round_trip(self, runtime):
+        _, crop_classes, tab_columns = runtime
+
+        assert crop_classes == CROP_CLASSES
+        assert tab_columns == TAB_COLUMNS
+
+
+def test_unknown_runtime_raises():
+    with pytest.raises(ValueError, match="Unknown model runtime"):
+        load_model('tensorrt', None, None, torch.device('cpu'))
+
+
+class TestCheckpointLoading:
+    """Loading a checkpoint must not fetch pretrained weights."""
+
+    def test_no_pretrained_weights_requested(self, checkpoint):
+        path, eager = checkpoint
+        real_create = timm.create_model
+        calls = []
+
+        def create_model(name, pretrained=False, **kw):
+            calls.append(pretrained)
+            return real_create(name, pretrained=pretrained, **kw)
+
+        with patch('model.timm.create_model', create_model):
+            model, crop_classes, _ = load_model('eager', path, None, torch.device('cpu'))
+
+        assert calls == [False]
+        assert crop_classes == CROP_CLASSES
+        assert not any(t.is_meta for t in list(model.parameters()) + list(model.buffers()))
+        assert not model.training
+        img, tab = torch.randn(2, 3, 64, 64), torch.randn(2, 8)
+        with torch.no_grad():
+            assert torch.equal(model(img, tab)[0], eager(img, tab)[0])
+
+
+class TestModelService:
+    """The server's model is loaded lazily, once."""
+
+    def test_construction_loads_nothing(self, checkpoint):
+        path, _ = checkpoint
+        with patch('inference_runtime.load_model') as load:
+            service = ModelService('eager', path, None, torch.device('cpu'))
+
+            assert not service.is_loaded
+            assert service.stats()['load_seconds'] is None
+            load.assert_not_called()
+
+    def test_first_access_loads_once(self, checkpoint):
+        path, _ = checkpoint
+        service = ModelService('eager', path, None, torch.device('cpu'))
+
+        with patch('inference_runtime.load_model', wraps=load_model) as load:
+            assert service.crop_classes == CROP_CLASSES
+            assert service.tab_columns == TAB_COLUMNS
+            service.model
+
+        assert load.call_count == 1
+        assert service.is_loaded
+        assert service.stats()['load_seconds'] >= 0
+
+    def test_warmup(self, checkpoint):
+        path, _ = checkpoint
+        service = ModelService('eager', path, None, torch.device('cpu'))
+
+        service.warmup(batch_sizes=(1, 4))
+
+        assert service.is_loaded
+        assert service.stats()['warmup_seconds'] > 0
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,174 @@
+"""
+Tests for the /predict feature resolution stage.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from feature_resolver import start_feature_resolution, resolve_features_async, weather_features, DEFAULT_REASONS
+from weather_service import WeatherServiceError
+
+TAB_COLUMNS = ['ph', 'N', 'P', 'K', 'rainfall', 'temp', 'lat', 'lon']
+SOIL = {'ph': '6.5', 'N': '50', 'P': '30', 'K': '40', 'lat': '20.5', 'lon': '78.9'}
+WEATHER = {
+    'current': {'temperature': 31.0},
+    'forecast': [
+        {'date': '2026-01-01', 'temp_high': 30.0, 'temp_low': 20.0, 'temp_mean': 24.0, 'precipitation_mm': 2.0},
+        {'date': '2026-01-02', 'temp_high': 32.0, 'temp_low': 22.0, 'temp_mean': 26.0, 'precipitation_mm': 8.0}
+    ]
+}
+
+
+class FakeWeatherService:
+    def __init__(self, data=WEATHER, age=120.0, delay=0.0, error=None, configured=True):
+        self.data, self.age, self.delay, self.error, self.configured = data, age, delay, error, configured
+        self.calls = []
+        self.completed = 0
+
+    def is_configured(self):
+        return self.configured
+
+    def get_weather_with_age(self, lat, lon):
+        self.calls.append((lat, lon))
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.data, self.age
+
+    async def get_weather_with_age_async(self, lat, lon, client):
+        self.calls.append((lat, lon))
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        self.completed += 1
+        return self.data, self.age
+
+
+class TestWeatherFeatures:
+    """Weather responses mapped onto the model's rainfall and temp."""
+
+    def test_forecast_temperature_only(self):
+        features = weather_features(WEATHER)
+
+        assert features['temp']['value'] == 25.0
+        assert features['temp']['source'] == 'forecast'
+        # Annual rainfall is not derivable from a short forecast
+        assert 'rainfall' not in features
+
+    def test_current_temperature_without_forecast(self):
+        features = weather_features({'current': {'temperature': 31.0}, 'forecast': []})
+
+        assert features == {'temp': {'value': 31.0, 'source': 'current', 'basis': 'current temperature'}}
+
+
+class TestResolution:
+    """Supplied values win; missing weather columns are filled, or defaulted with a reason."""
+
+    def test_supplied_values_skip_weather(self):
+        service = FakeWeatherService()
+
+        pending = start_feature_resolution({**SOIL, 'rainfall': '800', 'temp': '25'}, TAB_COLUMNS, service,
+                                           enabled=True)
+        values, report = pending.wait()
+
+        assert service.calls == []
+        assert values == [6.5, 50.0, 30.0, 40.0, 800.0, 25.0, 20.5, 78.9]
+        assert {entry['source'] for entry in report.values()} == {'form'}
+
+    def test_missing_columns_filled_with_source_and_age(self):
+        service = FakeWeatherService(age=95.04)
+
+        values, report = start_feature_resolution({**SOIL, 'rainfall': ''}, TAB_COLUMNS, service,
+                                                  enabled=True).wait()
+
+        assert service.calls == [(20.5, 78.9)]
+        assert values[4:6] == [0.0, 25.0]
+        assert report['temp'] == {'value': 25.0, 'source': 'forecast', 'age_seconds': 95.0,
+                                  'basis': 'mean daily temperature over the 2 day forecast'}
+        assert report['rainfall'] == {'value': 0.0, 'source': 'default', 'reason': DEFAULT_REASONS['rainfall']}
+        assert report['ph'] == {'value': 6.5, 'source': 'form'}
+
+    def test_rainfall_alone_needs_no_lookup(self):
+        service = FakeWeatherService()
+
+        values, report = start_feature_resolution({**SOIL, 'temp': '25'}, TAB_COLUMNS, service, enabled=True).wait()
+
+        assert service.calls == []
+        assert report['rainfall']['source'] == 'default'
+
+    def test_weather_lookup_overlaps_other_work(self):
+        service = FakeWeatherService(delay=0.2)
+
+        start = time.perf_counter()
+        pending = start_feature_resolution(SOIL, TAB_COLUMNS, service, enabled=True)
+        time.sleep(0.2)  # image decoding
+        pending.wait()
+
+        assert time.perf_counter() - start < 0.35
+
+    @pytest.mark.parametrize('service, form, message', [
+        (FakeWeatherService(delay=0.5), SOIL, 'not available within 0.05s'),
+        (FakeWeatherService(error=WeatherServiceError('Failed to fetch weather: 502')), SOIL, '502'),
+        (FakeWeatherService(configured=False), SOIL, 'not configured'),
+        (FakeWeatherService(), {**SOIL, 'lat': ''}, 'lat/lon')
+    ])
+    def test_falls_back_to_default_with_reason(self, service, form, message):
+        values, report = start_feature_resolution(form, TAB_COLUMNS, service, enabled=True).wait(timeout=0.05)
+
+        assert values[4:6] == [0.0, 0.0]
+        assert report['rainfall']['source'] == report['temp']['source'] == 'default'
+        assert message in report['temp']['error']
+
+    def test_disabled_keeps_previous_defaults(self):
+        service = FakeWeatherService()
+
+        values, report = start_feature_resolution(SOIL, TAB_COLUMNS, service, enabled=False).wait()
+
+        assert service.calls == []
+        assert values[4:6] == [0.0, 0.0]
+        assert 'error' not in report['temp']
+
+    def test_async_lookup(self):
+        service = FakeWeatherService(age=10.0)
+
+        pending = asyncio.run(resolve_features_async(SOIL, TAB_COLUMNS, client=None, service=service, enabled=True))
+        values, report = pending.wait(timeout=0)
+
+        assert service.calls == [(20.5, 78.9)]
+        assert values[4:6] == [0.0, 25.0]
+        assert report['temp']['age_seconds'] == 10.0
+
+    def test_async_timeout_leaves_lookup_running(self):
+        service = FakeWeatherService(delay=0.2)
+
+        async def scenario():
+            pending = await resolve_features_async(SOIL, TAB_COLUMNS, client=None, service=service, enabled=True,
+                                                   timeout=0.05)
+            await asyncio.sleep(0.3)
+            return pending
+        values, report = asyncio.run(scenario()).wait()
+
+        assert values[5] == 0.0
+        assert 'not available within 0.05s' in report['temp']['error']
+        # Not cancelled: the fetch finishes and fills the cache for the next request
+        assert service.completed == 1
+
+    def test_async_errors_fall_back_to_default(self):
+        service = FakeWeatherService(error=WeatherServiceError('Failed to fetch weather: 502'))
+
+        pending = asyncio.run(resolve_features_async(SOIL, TAB_COLUMNS, client=None, service=service, enabled=True))
+
+        assert '502' in pending.wait()[1]['temp']['error']
+
+    def test_invalid_supplied_value_raises(self):
+        with pytest.raises(ValueError):
+            start_feature_resolution({**SOIL, 'ph': 'acidic'}, TAB_COLUMNS, FakeWeatherService(), enabled=True)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,138 @@
+"""
+Tests for the columnar forecast aggregation module.
+"""
+
+import os
+import sys
+import json
+import random
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forecast_aggregation import forecast_columns, aggregate_daily, daily_rows, aggregate_forecast_file
+from weather_service import WeatherService, ForecastDay
+
+
+def item(dt_txt, temp, humidity=None, rain=None, snow=None, condition='Clear', icon='01d'):
+    entry = {'dt_txt': dt_txt, 'main': {'temp': temp}, 'weather': [{'main': condition, 'icon': icon}]}
+    if humidity is not None:
+        entry['main']['humidity'] = humidity
+    if rain is not None:
+        entry['rain'] = {'3h': rain}
+    if snow is not None:
+        entry['snow'] = {'3h': snow}
+    return entry
+
+
+def synthetic_response(rng, days=6):
+    return {'list': [item(f'2026-03-{d + 1:02d} {h:02d}:00:00', round(rng.uniform(-5, 40), 2),
+                          humidity=rng.randint(10, 100), rain=rng.choice([None, round(rng.uniform(0, 5), 2)]),
+                          condition=rng.choice(['Clear', 'Rain', 'Clouds']), icon=rng.choice(['01d', '10d']))
+                     for d in range(days) for h in range(0, 24, 3)]}
+
+
+def reference_daily(data, days):
+    """The original dict-of-lists aggregation of high/low, condition and icon."""
+    daily = {}
+    for entry in data['list']:
+        date = entry['dt_txt'].split(' ')[0]
+        if date not in daily:
+            daily[date] = {'temps': [], 'condition': entry['weather'][0]['main'], 'icon': entry['weather'][0]['icon']}
+        daily[date]['temps'].append(entry['main']['temp'])
+    return [{'date': date, 'temp_high': round(max(info['temps']), 1), 'temp_low': round(min(info['temps']), 1),
+             'condition': info['condition'], 'icon': info['icon']} for date, info in list(daily.items())[:days]]
+
+
+class TestDailyAggregation:
+    """Per-response aggregation matches the old loop and adds the new aggregates."""
+
+    @pytest.mark.parametrize('seed', range(5))
+    def test_matches_reference_high_low(self, seed):
+        data = synthetic_response(random.Random(seed))
+        rows = daily_rows(data, 5)
+
+        assert [{k: row[k] for k in ('date', 'temp_high', 'temp_low', 'condition', 'icon')} for row in rows] == \
+            reference_daily(data, 5)
+
+    def test_mean_precipitation_and_humidity(self):
+        data = {'list': [
+            item('2026-01-01 00:00:00', 10.0, humidity=40, rain=1.5, condition='Rain', icon='10n'),
+            item('2026-01-01 12:00:00', 20.0, humidity=60, snow=0.5),
+            item('2026-01-01 21:00:00', 30.0),
+            item('2026-01-02 00:00:00', 5.0)
+        ]}
+
+        first, second = daily_rows(data)
+
+        assert first == {'date': '2026-01-01', 'temp_high': 30.0, 'temp_low': 10.0, 'temp_mean': 20.0,
+                         'precipitation_mm': 2.0, 'humidity_mean': 50.0, 'condition': 'Rain', 'icon': '10n'}
+        assert second['humidity_mean'] is None
+        assert second['precipitation_mm'] == 0.0
+
+    def test_days_keep_first_appearance_order(self):
+        data = {'list': [item('2026-01-03 00:00:00', 1.0), item('2026-01-01 00:00:00', 2.0),
+                         item('2026-01-03 03:00:00', 3.0), item('2026-01-02 00:00:00', 4.0)]}
+
+        assert [row['date'] for row in daily_rows(data)] == ['2026-01-03', '2026-01-01', '2026-01-02']
+        assert [row['date'] for row in daily_rows(data, 2)] == ['2026-01-03', '2026-01-01']
+        assert daily_rows({'list': []}) == []
+
+    def test_dt_timestamps_give_the_same_days(self):
+        data = synthetic_response(random.Random(3))
+        for entry in data['list']:
+            day, hour = entry['dt_txt'][8:10], entry['dt_txt'][11:13]
+            entry['dt'] = 1772323200 + (int(day) - 1) * 86400 + int(hour) * 3600  # 2026-03-01T00:00Z
+
+        with_dt = daily_rows(data, 5)
+        for entry in data['list']:
+            del entry['dt']
+
+        assert with_dt == daily_rows(data, 5)
+
+    def test_service_parses_into_forecast_days(self):
+        data = synthetic_response(random.Random(0))
+
+        days = WeatherService(api_key='test')._parse_forecast(data, 5)
+
+        assert len(days) == 5
+        assert all(isinstance(day, ForecastDay) for day in days)
+        assert days[0].temp_low <= days[0].temp_mean <= days[0].temp_high
+        assert ForecastDay('2026-01-01', 2.0, 1.0, 'Clear', '01d').to_dict()['precipitation_mm'] == 0.0
+
+
+class TestBulkAggregation:
+    """Many locations aggregated in one pass, from arrays or dump files."""
+
+    def test_many_locations_match_per_response(self):
+        rng = random.Random(1)
+        responses = [synthetic_response(rng, days=rng.randint(1, 6)) for _ in range(50)]
+
+        daily = aggregate_daily(forecast_columns(responses), days=5)
+
+        for location, response in enumerate(responses):
+            mask = daily['location'] == location
+            expected = daily_rows(response, 5)
+            assert [str(d) for d in daily['date'][mask]] == [row['date'] for row in expected]
+            assert [round(float(t), 1) for t in daily['temp_mean'][mask]] == [row['temp_mean'] for row in expected]
+
+    @pytest.mark.parametrize('layout', ['jsonl', 'list', 'keyed'])
+    def test_dump_file_layouts(self, tmp_path, layout):
+        rng = random.Random(2)
+        responses = {'farm-a': synthetic_response(rng), 'farm-b': synthetic_response(rng, days=2)}
+        path = tmp_path / ('dump.jsonl' if layout == 'jsonl' else 'dump.json')
+        if layout == 'jsonl':
+            path.write_text('\n'.join(json.dumps(r) for r in responses.values()) + '\n')
+        else:
+            path.write_text(json.dumps(list(responses.values()) if layout == 'list' else responses))
+
+        frame = aggregate_forecast_file(str(path), days=5)
+
+        assert len(frame) == 5 + 2
+        keys = ['farm-a', 'farm-b'] if layout == 'keyed' else ['0', '1']
+        assert frame.groupby('location').size().to_dict() == {keys[0]: 5, keys[1]: 2}
+        assert {'temp_high', 'temp_low', 'temp_mean', 'precipitation_mm', 'humidity_mean'} <= set(frame.columns)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,180 @@
+"""
+Tests for the pooled, instrumented outbound HTTP client.
+"""
+
+import os
+import sys
+import time
+import socket
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_client import HttpClient, RetryPolicy, NO_RETRIES, client_for, upstream_stats
+
+
+class Upstream:
+    """Local HTTP/1.1 server that records client ports and replays scripted statuses."""
+
+    def __init__(self):
+        self.statuses = []
+        self.delay = 0.0
+        self.ports = []
+        self.requests = 0
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self):
+                length = int(self.headers.get('Content-Length', 0))
+                if length:
+                    self.rfile.read(length)
+                upstream.requests += 1
+                upstream.ports.append(self.client_address[1])
+                time.sleep(upstream.delay)
+                status, headers = upstream.statuses.pop(0) if upstream.statuses else (200, {})
+                body = b'{"ok": true}'
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client timed out
+
+            do_GET = _reply
+            do_POST = _reply
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def upstream():
+    server = Upstream()
+    yield server
+    server.stop()
+
+
+def fast_retries(**kwargs):
+    return RetryPolicy(backoff_seconds=0.01, **kwargs)
+
+
+class TestHttpClient:
+    """Keep-alive pooling, timeouts, retries and metrics."""
+
+    def test_connections_are_reused(self, upstream):
+        client = HttpClient('test')
+
+        for _ in range(10):
+            assert client.get(upstream.url).status_code == 200
+
+        assert upstream.requests == 10
+        assert len(set(upstream.ports)) == 1
+
+    def test_retries_transient_statuses(self, upstream):
+        upstream.statuses = [(503, {}), (502, {})]
+        client = HttpClient('test', retry=fast_retries())
+
+        response = client.get(upstream.url)
+
+        assert response.status_code == 200
+        assert upstream.requests == 3
+        stats = client.stats()
+        assert (stats['requests'], stats['retries'], stats['errors']) == (1, 2, 0)
+        assert stats['responses'] == {'5xx': 2, '2xx': 1}
+        assert stats['latency_ms']['count'] == 3
+
+    def test_returns_last_response_when_retries_exhausted(self, upstream):
+        upstream.statuses = [(503, {})] * 5
+        client = HttpClient('test', retry=fast_retries(max_retries=2))
+
+        assert client.get(upstream.url).status_code == 503
+        assert upstream.requests == 3
+        assert client.stats()['errors'] == 1
+
+    def test_client_errors_and_other_methods_not_retried(self, upstream):
+        upstream.statuses = [(404, {}), (503, {})]
+        client = HttpClient('test', retry=fast_retries())
+
+        assert client.get(upstream.url).status_code == 404
+        assert client.post(upstream.url, json={}).status_code == 503
+        assert upstream.requests == 2
+
+    def test_honours_retry_after(self, upstream):
+        upstream.statuses = [(503, {'Retry-After': '0.3'})]
+        client = HttpClient('test', retry=fast_retries())
+
+        start = time.perf_counter()
+        client.get(upstream.url)
+
+        assert time.perf_counter() - start >= 0.3
+
+    def test_read_timeout_not_retried(self, upstream):
+        upstream.delay = 0.5
+        client = HttpClient('test', timeout=0.1, retry=fast_retries())
+
+        with pytest.raises(requests.Timeout):
+            client.get(upstream.url)
+
+        assert upstream.requests == 1
+        assert client.stats()['errors'] == 1
+
+    def test_connection_errors_retried_then_raised(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        client = HttpClient('test', retry=fast_retries(max_retries=2))
+
+        with pytest.raises(requests.ConnectionError):
+            client.get(f"http://127.0.0.1:{port}/")
+
+        stats = client.stats()
+        assert (stats['retries'], stats['errors'], stats['responses']) == (2, 1, {'error': 3})
+
+    def test_timeout_defaults(self):
+        assert HttpClient('test', timeout=(1.0, 2.0)).timeout == (1.0, 2.0)
+        assert HttpClient('test', timeout=7).timeout[1] == 7.0
+        assert HttpClient('test', retry=NO_RETRIES).retry.max_retries == 0
+
+
+class TestRegistry:
+    """Upstream clients are shared by name and reported together."""
+
+    def test_client_for_returns_shared_instance(self):
+        first = client_for('test-registry', timeout=3)
+        second = client_for('test-registry', timeout=99)
+
+        assert first is second
+        assert first.timeout[1] == 3.0
+        assert 'test-registry' in upstream_stats()
+
+    def test_services_register_their_upstreams(self):
+        import weather_service
+        import sentinel_service
+
+        stats = upstream_stats()
+
+        assert weather_service.weather_service.http is client_for('openweathermap')
+        assert sentinel_service.sentinel_service.http is client_for('sentinel')
+        assert {'openweathermap', 'sentinel'} <= set(stats)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,67 @@
+"""
+Tests for the staged LiteGeoNet API.
+"""
+
+import os
+import sys
+import pytest
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model import LiteGeoNet
+
+
+@pytest.fixture(scope='module')
+def model():
+    """LiteGeoNet with random backbone weights (no download)."""
+    torch.manual_seed(0)
+    return LiteGeoNet(num_classes=4, num_tabular_features=8, pretrained=False).eval()
+
+
+class TestStagedForward:
+    """encode/fuse stages must reproduce forward()."""
+
+    def test_stages_match_forward(self, model):
+        img, tab = torch.randn(3, 3, 64, 64), torch.randn(3, 8)
+
+        with torch.no_grad():
+            logits, gate = model(img, tab)
+            img_feat = model.encode_image(img)
+            tab_feat = model.encode_tabular(tab)
+            staged_logits, staged_gate = model.fuse_and_classify(img_feat, tab_feat)
+
+        assert img_feat.shape == (3, model.img_feature_dim)
+        assert tab_feat.shape == (3, model.tab_feature_dim)
+        assert torch.allclose(logits, staged_logits, atol=1e-6)
+        assert torch.allclose(gate, staged_gate, atol=1e-6)
+
+    def test_forward_head_matches_forward(self, model):
+        img, tab = torch.randn(2, 3, 64, 64), torch.randn(2, 8)
+
+        with torch.no_grad():
+            logits, gate = model(img, tab)
+            head_logits, head_gate = model.forward_head(model.encode_image(img), tab)
+
+        assert torch.allclose(logits, head_logits, atol=1e-6)
+        assert torch.allclose(gate, head_gate, atol=1e-6)
+
+    def test_broadcast_matches_repeated_forward(self, model):
+        img, tab = torch.randn(1, 3, 64, 64), torch.randn(50, 8)
+
+        with torch.no_grad():
+            img_feat = model.encode_image(img)
+            logits, gate = model.forward_broadcast(img_feat, tab)
+            expected_logits, expected_gate = model(img.expand(50, -1, -1, -1), tab)
+
+        assert logits.shape == (50, 4)
+        assert torch.allclose(logits, expected_logits, atol=1e-5)
+        assert torch.allclose(gate, expected_gate, atol=1e-5)
+
+    def test_broadcast_rejects_multiple_images(self, model):
+        with pytest.raises(ValueError):
+            model.forward_broadcast(torch.randn(2, model.img_feature_dim), torch.randn(2, 8))
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
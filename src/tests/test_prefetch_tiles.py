@@ -0,0 +1,186 @@
+"""
+Tests for the satellite tile prefetch job, run against a local fake Sentinel Hub.
+"""
+
+import os
+import sys
+import time
+import pytest
+from unittest.mock import MagicMock
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import prefetch_tiles as prefetch_module
+from prefetch_tiles import RateLimiter, prefetch_service, prefetch_tiles, retry_delay, unique_tiles
+from sentinel_service import SentinelService
+from sentinel_stub import SentinelStub
+from tile_cache import TileCache
+
+
+@pytest.fixture
+def stub():
+    with SentinelStub() as stub:
+        yield stub
+
+
+@pytest.fixture
+def service(stub, tmp_path):
+    return prefetch_service(rate_per_second=0, client_id='id', client_secret='secret', base_url=stub.url,
+                            tile_cache=TileCache(str(tmp_path)), grid_degrees=0.001)
+
+
+def farm_points(n):
+    return [(10.0 + i * 0.01, 70.0 + i * 0.01) for i in range(n)]
+
+
+def http_error(status, retry_after=None):
+    response = MagicMock(status_code=status, headers={'Retry-After': retry_after} if retry_after else {})
+    return requests.HTTPError(f'HTTP {status}', response=response)
+
+
+class TestPrefetch:
+    """Tiles end up in the cache with bounded concurrency and retries."""
+
+    def test_fills_cache_with_bounded_concurrency(self, stub, service):
+        stub.latency_ms = 30
+
+        report = prefetch_tiles(service, farm_points(40), concurrency=4)
+
+        assert (report['tiles'], report['fetched'], report['failed']) == (40, 40, 0)
+        assert len(service.tile_cache) == 40
+        assert stub.process_requests == 40
+        assert stub.token_requests == 1
+        assert stub.max_concurrency <= 4
+        assert report['tiles_per_second'] > 0
+
+    def test_points_on_the_same_tile_fetched_once(self, stub, service):
+        points = [(20.5, 78.9), (20.5002, 78.8997), (20.5, 78.9)]
+
+        report = prefetch_tiles(service, points)
+
+        assert (report['points'], report['tiles'], report['fetched']) == (3, 1, 1)
+        assert stub.process_requests == 1
+
+    def test_cached_tiles_skipped(self, stub, service):
+        prefetch_tiles(service, farm_points(5))
+
+        report = prefetch_tiles(service, farm_points(8))
+
+        assert (report['already_cached'], report['fetched']) == (5, 3)
+        assert stub.process_requests == 8
+
+    def test_retries_rate_limited_requests(self, stub, service):
+        stub.fail_next(3, status=429)
+
+        report = prefetch_tiles(service, farm_points(2), concurrency=1, backoff_seconds=0.01)
+
+        assert (report['fetched'], report['failed'], report['retries']) == (2, 0, 3)
+        assert stub.process_requests == 5
+
+    def test_gives_up_after_max_retries(self, stub, service):
+        stub.fail_next(10, status=429)
+
+        report = prefetch_tiles(service, farm_points(1), max_retries=2, backoff_seconds=0.01)
+
+        assert (report['fetched'], report['failed'], report['retries']) == (0, 1, 2)
+        assert '429' in report['failures'][0]['error']
+        assert len(service.tile_cache) == 0
+
+    def test_every_upstream_call_is_rate_limited(self, stub, service, monkeypatch):
+        acquired = []
+        acquire = RateLimiter.acquire
+        monkeypatch.setattr(prefetch_module.RateLimiter, 'acquire',
+                            lambda limiter: acquired.append(1) or acquire(limiter))
+        stub.fail_next(3, status=503)
+
+        report = prefetch_tiles(service, farm_points(2), concurrency=1, backoff_seconds=0.01)
+
+        assert (report['fetched'], report['retries']) == (2, 3)
+        # No hidden retries in the HTTP client: one token per request, the OAuth one included
+        assert stub.process_requests == 5
+        assert stub.token_requests == 1
+        assert len(acquired) == 6
+
+    def test_token_refresh_is_rate_limited(self, stub, service, monkeypatch):
+        acquired = []
+        acquire = RateLimiter.acquire
+        monkeypatch.setattr(prefetch_module.RateLimiter, 'acquire',
+                            lambda limiter: acquired.append(1) or acquire(limiter))
+        stub.fail_next(1, status=401)
+
+        report = prefetch_tiles(service, farm_points(2), concurrency=1, backoff_seconds=0.01)
+
+        assert report['fetched'] == 2
+        assert stub.token_requests == 2
+        assert len(acquired) == stub.process_requests + stub.token_requests
+
+    def test_client_errors_not_retried(self, stub, service):
+        stub.fail_next(1, status=400)
+
+        report = prefetch_tiles(service, farm_points(1), backoff_seconds=0.01)
+
+        assert (report['failed'], report['retries']) == (1, 0)
+        assert stub.process_requests == 1
+
+    def test_respects_rate_limit(self, stub, tmp_path):
+        service = prefetch_service(rate_per_second=20, burst=2, client_id='id', client_secret='secret',
+                                   base_url=stub.url, tile_cache=TileCache(str(tmp_path)), grid_degrees=0.001)
+
+        start = time.perf_counter()
+        prefetch_tiles(service, farm_points(12), concurrency=2)
+        elapsed = time.perf_counter() - start
+
+        # Burst of 2, then 11 more requests (the token and 10 tiles) at 20/s
+        assert elapsed >= 0.45
+
+    def test_reports_progress(self, service):
+        reports = []
+
+        prefetch_tiles(service, farm_points(5), progress=reports.append)
+
+        assert len(reports) == 5
+        assert [r['pending'] for r in reports] == [4, 3, 2, 1, 0]
+
+    def test_requires_tile_cache(self, stub):
+        with pytest.raises(ValueError):
+            prefetch_tiles(SentinelService('id', 'secret', base_url=stub.url, tile_cache=None), farm_points(1))
+
+
+class TestHelpers:
+    """Rate limiter, retry classification and tile deduplication."""
+
+    def test_rate_limiter_spaces_calls_after_burst(self):
+        now = [0.0]
+        slept = []
+
+        def sleep(seconds):
+            slept.append(seconds)
+            now[0] += seconds
+
+        limiter = RateLimiter(10, burst=2, clock=lambda: now[0], sleep=sleep)
+        waits = [limiter.acquire() for _ in range(4)]
+
+        assert waits == pytest.approx([0.0, 0.0, 0.1, 0.1])
+
+    def test_rate_limiter_disabled(self):
+        limiter = RateLimiter(0, sleep=lambda s: pytest.fail('should not sleep'))
+
+        assert limiter.acquire() == 0.0
+
+    def test_retry_delay(self):
+        assert retry_delay(http_error(429, '7'), 0, 1.0) == 7.0
+        assert 2.0 <= retry_delay(http_error(503), 2, 1.0) <= 4.0
+        assert retry_delay(requests.ConnectionError(), 0, 1.0) is not None
+        assert retry_delay(http_error(404), 0, 1.0) is None
+        assert retry_delay(ValueError(), 0, 1.0) is None
+
+    def test_unique_tiles_keeps_first_point(self, service):
+        tiles = unique_tiles(service, [(20.5, 78.9), (20.5002, 78.9), (21.0, 78.9)])
+
+        assert [(lat, lon) for _, lat, lon in tiles] == [(20.5, 78.9), (21.0, 78.9)]
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,96 @@
+"""
+Tests for post-training int8 quantization of LiteGeoNet.
+"""
+
+import os
+import sys
+import pytest
+import torch
+import torch.nn as nn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model import LiteGeoNet
+from quantization import quantize_model, evaluate, HEAD_MODULES
+from inference_runtime import export_torchscript, load_model
+
+CROP_CLASSES = ['Maize', 'Rice', 'Wheat', 'Cotton']
+TAB_COLUMNS = ['ph', 'N', 'P', 'K', 'rainfall', 'temp', 'lat', 'lon']
+
+
+@pytest.fixture(scope='module')
+def model():
+    """LiteGeoNet with random backbone weights (no download)."""
+    torch.manual_seed(0)
+    return LiteGeoNet(num_classes=len(CROP_CLASSES), num_tabular_features=len(TAB_COLUMNS), pretrained=False).eval()
+
+
+@pytest.fixture(scope='module')
+def quantized(model):
+    torch.manual_seed(1)
+    return quantize_model(model, [torch.randn(16, 3, 64, 64) for _ in range(2)])
+
+
+class TestQuantizeModel:
+    """quantize_model() builds an int8 copy with the same staged API."""
+
+    def test_head_linears_are_dynamic_int8(self, quantized):
+        for name in HEAD_MODULES:
+            module = getattr(quantized, name)
+            linears = [m for m in module.modules() if isinstance(m, torch.ao.nn.quantized.dynamic.Linear)]
+            assert linears, f"{name} has no dynamically quantized Linear"
+            assert not any(type(m) is nn.Linear for m in module.modules())
+
+    def test_backbone_is_statically_quantized(self, quantized):
+        assert any(isinstance(m, torch.ao.nn.quantized.Conv2d) for m in quantized.backbone.modules())
+
+    def test_original_model_untouched(self, model, quantized):
+        assert type(model.classifier[0]) is nn.Linear
+        assert not any(isinstance(m, torch.ao.nn.quantized.Conv2d) for m in model.backbone.modules())
+
+    def test_outputs_track_fp32(self, model, quantized):
+        img, tab = torch.randn(8, 3, 64, 64), torch.randn(8, 8)
+
+        with torch.no_grad():
+            logits, gate = model(img, tab)
+            q_logits, q_gate = quantized(img, tab)
+
+        assert q_logits.shape == logits.shape
+        assert torch.allclose(q_gate.sum(dim=1), torch.ones(8), atol=1e-5)
+        assert ((q_logits - logits).norm() / logits.norm()).item() < 0.5
+
+    def test_requires_calibration_data(self, model):
+        with pytest.raises(ValueError, match="calibration"):
+            quantize_model(model, [])
+
+
+class TestQuantizedExport:
+    """The int8 model is served through the TorchScript runtime."""
+
+    def test_torchscript_round_trip(self, quantized, tmp_path):
+        path = str(tmp_path / 'int8.pt')
+        export_torchscript(quantized, path, CROP_CLASSES, TAB_COLUMNS, quantized_engine='x86')
+
+        runtime, crop_classes, _ = load_model('torchscript', None, path, torch.device('cpu'))
+        img, tab = torch.randn(5, 3, 64, 64), torch.randn(5, 8)
+        with torch.no_grad():
+            expected, _ = quantized(img, tab)
+            logits, _ = runtime(img, tab)
+            broadcast, _ = runtime.forward_broadcast(runtime.encode_image(img[:1]), tab)
+
+        assert crop_classes == CROP_CLASSES
+        assert runtime.meta['quantized_engine'] == 'x86'
+        assert torch.allclose(logits, expected, atol=1e-4)
+        assert broadcast.shape == (5, len(CROP_CLASSES))
+
+    def test_evaluate_returns_class_indices(self, quantized):
+        batches = [(torch.randn(4, 3, 64, 64), torch.randn(4, 8), torch.zeros(4, dtype=torch.long))] * 2
+
+        predictions = evaluate(quantized, batches)
+
+        assert predictions.shape == (8,)
+        assert predictions.max() < len(CROP_CLASSES)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
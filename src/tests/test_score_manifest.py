@@ -0,0 +1,105 @@
+"""
+Tests for the offline bulk scoring CLI.
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from score_manifest import score_manifest, load_image
+from dataset import load_image_uint8
+
+CROP_CLASSES = ['Maize', 'Rice', 'Wheat']
+TAB_COLUMNS = ['ph', 'N', 'P', 'K', 'rainfall', 'temp', 'lat', 'lon']
+
+
+def fake_predict(images, tabular):
+    """Deterministic stand-in for LiteGeoNet keyed on the pH column."""
+    probabilities = np.zeros((len(images), len(CROP_CLASSES)), dtype=np.float32)
+    probabilities[np.arange(len(images)), tabular[:, 0].astype(int) % len(CROP_CLASSES)] = 1.0
+    gate_weights = np.tile(np.array([[0.6, 0.4]], dtype=np.float32), (len(images), 1))
+    return probabilities, gate_weights
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    """Write 10 small images and a manifest referencing them (one missing)."""
+    rows = []
+    for i in range(10):
+        name = f'img_{i}.png'
+        if i != 7:
+            Image.new('RGB', (32, 32), (i * 20, 0, 0)).save(tmp_path / name)
+        rows.append([name, i, 10, 10, 10, 900, 25.0, 19.0, 73.0, 'Maize'])
+    path = tmp_path / 'manifest.csv'
+    pd.DataFrame(rows, columns=['image_path'] + TAB_COLUMNS + ['crop_label']).to_csv(path, index=False)
+    return path
+
+
+class TestScoreManifest:
+    """Unit tests for score_manifest."""
+
+    def test_scores_all_rows_in_order(self, tmp_path, manifest):
+        output = str(tmp_path / 'out.csv')
+
+        total = score_manifest(str(manifest), output, fake_predict, CROP_CLASSES, TAB_COLUMNS,
+                               image_root=str(tmp_path), chunk_size=4, batch_size=3, num_workers=0)
+
+        result = pd.read_csv(output, keep_default_na=False)
+        assert total == 10
+        assert result['image_path'].tolist() == [f'img_{i}.png' for i in range(10)]
+        assert result.loc[1, 'predicted_crop'] == 'Rice'
+        assert result.loc[1, 'top2_crop'] != ''
+        assert float(result.loc[0, 'w_img']) == pytest.approx(0.6)
+        assert result.loc[7, 'error'] == 'image could not be read'
+
+    def test_resumes_after_crash_without_duplicates(self, tmp_path, manifest):
+        output = str(tmp_path / 'out.csv')
+        calls = {'n': 0}
+
+        def crashing_predict(images, tabular):
+            calls['n'] += 1
+            if calls['n'] == 2:
+                raise RuntimeError("simulated crash")
+            return fake_predict(images, tabular)
+
+        with pytest.raises(RuntimeError):
+            score_manifest(str(manifest), output, crashing_predict, CROP_CLASSES, TAB_COLUMNS,
+                           image_root=str(tmp_path), chunk_size=4, batch_size=4, num_workers=0)
+        assert len(pd.read_csv(output)) == 4
+
+        total = score_manifest(str(manifest), output, fake_predict, CROP_CLASSES, TAB_COLUMNS,
+                               image_root=str(tmp_path), chunk_size=4, batch_size=4, num_workers=0)
+
+        result = pd.read_csv(output)
+        assert total == 10
+        assert result['image_path'].tolist() == [f'img_{i}.png' for i in range(10)]
+
+    def test_resume_truncates_unrecorded_tail(self, tmp_path, manifest):
+        output = str(tmp_path / 'out.csv')
+        score_manifest(str(manifest), output, fake_predict, CROP_CLASSES, TAB_COLUMNS,
+                       image_root=str(tmp_path), chunk_size=4, num_workers=0)
+        # Simulate a crash between writing a chunk and recording progress
+        with open(output, 'a') as f:
+            f.write('partial,row\n')
+
+        total = score_manifest(str(manifest), output, fake_predict, CROP_CLASSES, TAB_COLUMNS,
+                               image_root=str(tmp_path), chunk_size=4, num_workers=0)
+
+        assert total == 10
+        assert len(pd.read_csv(output)) == 10
+
+    def test_load_image_matches_training_decode(self, tmp_path):
+        path = tmp_path / 'tile.png'
+        Image.fromarray(np.random.default_rng(0).integers(0, 256, (80, 96, 3), dtype=np.uint8)).save(path)
+        (tmp_path / 'broken.png').write_bytes(b'not an image')
+
+        assert np.array_equal(load_image(str(path)), load_image_uint8(str(path), 64))
+        assert load_image(str(tmp_path / 'broken.png')) is None
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,292 @@
+"""
+Tests for the Sentinel Hub service and its OAuth token cache.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sentinel_service import TokenManager, SentinelService, SentinelServiceError
+from sentinel_stub import SentinelStub
+from tile_cache import TileCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingFetch:
+    """Token fetcher returning token-1, token-2, ... with a fixed lifetime."""
+
+    def __init__(self, expires_in=3600, delay=0.0):
+        self.expires_in = expires_in
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        time.sleep(self.delay)
+        with self.lock:
+            self.calls += 1
+            return f'token-{self.calls}', self.expires_in
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+
+class TestTokenManager:
+    """Caching, refresh-ahead and single-flight behaviour."""
+
+    def test_token_reused_until_refresh_window(self):
+        fetch, clock = CountingFetch(), FakeClock()
+        tokens = TokenManager(fetch, refresh_margin_seconds=300, clock=clock)
+
+        assert tokens.get_token() == 'token-1'
+        clock.now += 3000
+        assert tokens.get_token() == 'token-1'
+
+        assert fetch.calls == 1
+        assert tokens.stats()['token_requests'] == 2
+        assert tokens.stats()['token_fetches'] == 1
+
+    def test_refreshes_in_background_before_expiry(self):
+        fetch, clock = CountingFetch(), FakeClock()
+        tokens = TokenManager(fetch, refresh_margin_seconds=300, clock=clock)
+        tokens.get_token()
+
+        clock.now += 3400
+        # Still valid: served immediately while the next one is fetched
+        assert tokens.get_token() == 'token-1'
+        wait_for(lambda: tokens.stats()['token_fetches'] == 2)
+
+        assert tokens.get_token() == 'token-2'
+        assert tokens.stats()['background_refreshes'] == 1
+
+    def test_expired_token_is_fetched_synchronously(self):
+        fetch, clock = CountingFetch(expires_in=60), FakeClock()
+        tokens = TokenManager(fetch, refresh_margin_seconds=10, clock=clock)
+        tokens.get_token()
+
+        clock.now += 61
+
+        assert tokens.get_token() == 'token-2'
+
+    def test_concurrent_callers_share_one_fetch(self):
+        fetch = CountingFetch(delay=0.2)
+        tokens = TokenManager(fetch)
+
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            results = list(pool.map(lambda _: tokens.get_token(), range(32)))
+
+        assert results == ['token-1'] * 32
+        assert fetch.calls == 1
+
+    def test_failed_fetch_raises_for_all_waiters_then_recovers(self):
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.1)
+            if len(calls) == 1:
+                raise ConnectionError('oauth down')
+            return 'token-ok', 3600
+
+        tokens = TokenManager(fetch)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(tokens.get_token) for _ in range(8)]
+        errors = [f.exception() for f in futures]
+
+        assert all(isinstance(e, ConnectionError) for e in errors)
+        assert tokens.get_token() == 'token-ok'
+        assert tokens.stats()['token_fetch_errors'] == 1
+
+    def test_failed_background_refresh_keeps_valid_token(self):
+        clock = FakeClock()
+        results = iter([('token-1', 3600), ConnectionError('oauth down')])
+
+        def fetch():
+            result = next(results)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        tokens = TokenManager(fetch, refresh_margin_seconds=300, clock=clock)
+        tokens.get_token()
+        clock.now += 3400
+        tokens.get_token()
+        wait_for(lambda: tokens.stats()['token_fetch_errors'] == 1)
+
+        # The old token is served, and no new refresh starts right away
+        assert tokens.get_token() == 'token-1'
+        assert tokens.stats()['background_refreshes'] == 1
+
+    def test_async_callers_share_one_fetch(self):
+        fetch = CountingFetch()
+        tokens = TokenManager(fetch)
+        async_calls = []
+
+        async def fetch_async():
+            async_calls.append(1)
+            await asyncio.sleep(0.1)
+            return 'async-token', 3600
+
+        async def main():
+            return await asyncio.gather(*[tokens.get_token_async(fetch_async) for _ in range(20)])
+
+        assert asyncio.run(main()) == ['async-token'] * 20
+        assert len(async_calls) == 1
+        # Synchronous callers see the same cached token
+        assert tokens.get_token() == 'async-token'
+        assert fetch.calls == 0
+
+    def test_invalidate(self):
+        fetch = CountingFetch()
+        tokens = TokenManager(fetch)
+        tokens.get_token()
+
+        tokens.invalidate()
+
+        assert tokens.get_token() == 'token-2'
+
+
+def response(status_code=200, json_data=None, content=b''):
+    mock = MagicMock(status_code=status_code, content=content)
+    mock.json.return_value = json_data
+    if status_code >= 400:
+        mock.raise_for_status.side_effect = Exception(f'HTTP {status_code}')
+    return mock
+
+
+class TestSentinelService:
+    """Image fetches reuse the cached token."""
+
+    def test_not_configured(self):
+        service = SentinelService(client_id='', client_secret='')
+
+        assert not service.is_configured()
+        with pytest.raises(SentinelServiceError):
+            service.fetch_image(20.5, 78.9)
+
+    def test_one_token_fetch_for_many_images(self):
+        service = SentinelService(client_id='id', client_secret='secret')
+
+        def post(url, **kwargs):
+            if url == service.token_url:
+                return response(json_data={'access_token': 'abc', 'expires_in': 3599})
+            assert kwargs['headers']['Authorization'] == 'Bearer abc'
+            return response(content=b'png')
+
+        with patch.object(service.http, 'post', side_effect=post) as post_mock:
+            images = [service.fetch_image(20.5, 78.9 + i * 0.01) for i in range(10)]
+
+        assert images == [b'png'] * 10
+        assert post_mock.call_count == 11
+        stats = service.stats()
+        assert stats['image_requests'] == 10
+        assert stats['token_fetches'] == 1
+
+    def test_rejected_token_is_refetched_once(self):
+        service = SentinelService(client_id='id', client_secret='secret')
+        process_responses = iter([response(status_code=401), response(content=b'png')])
+
+        def post(url, **kwargs):
+            if url == service.token_url:
+                return response(json_data={'access_token': 'abc', 'expires_in': 3599})
+            return next(process_responses)
+
+        with patch.object(service.http, 'post', side_effect=post):
+            assert service.fetch_image(20.5, 78.9) == b'png'
+
+        assert service.stats()['token_fetches'] == 2
+
+    def test_request_payload_bbox(self):
+        payload = SentinelService.request_payload(20.0, 78.0)
+
+        assert payload['input']['bounds']['bbox'] == pytest.approx([77.997, 19.997, 78.003, 20.003])
+        assert payload['output']['width'] == 512
+
+    def test_default_lifetime_when_missing(self):
+        assert SentinelService.parse_token({'access_token': 'abc'}) == ('abc', 3600.0)
+
+
+@pytest.fixture
+def stub():
+    with SentinelStub() as stub:
+        yield stub
+
+
+class TestTileCaching:
+    """Repeat visits are served from the tile cache, against a local stub."""
+
+    def test_repeat_visit_served_from_disk(self, stub, tmp_path):
+        service = SentinelService('id', 'secret', base_url=stub.url, tile_cache=TileCache(str(tmp_path)))
+
+        first = service.fetch_image(20.5, 78.9)
+        start = time.perf_counter()
+        second = service.fetch_image(20.5, 78.9)
+        elapsed = time.perf_counter() - start
+
+        assert first == second
+        assert first.startswith(b'\x89PNG')
+        assert stub.process_requests == 1
+        assert elapsed < 0.05
+        stats = service.stats()
+        assert (stats['image_requests'], stats['upstream_image_fetches']) == (2, 1)
+        assert stats['tile_cache']['hits'] == 1
+
+    def test_nearby_point_shares_tile_distant_point_does_not(self, stub, tmp_path):
+        service = SentinelService('id', 'secret', base_url=stub.url, tile_cache=TileCache(str(tmp_path)),
+                                  grid_degrees=0.001)
+
+        service.fetch_image(20.5, 78.9)
+        service.fetch_image(20.5002, 78.8997)
+        assert stub.process_requests == 1
+
+        service.fetch_image(20.51, 78.9)
+        assert stub.process_requests == 2
+
+    def test_cache_survives_restart(self, stub, tmp_path):
+        SentinelService('id', 'secret', base_url=stub.url, tile_cache=TileCache(str(tmp_path))).fetch_image(1.0, 2.0)
+
+        restarted = SentinelService('id', 'secret', base_url=stub.url, tile_cache=TileCache(str(tmp_path)))
+        restarted.fetch_image(1.0, 2.0)
+
+        assert stub.process_requests == 1
+        assert restarted.stats()['token_fetches'] == 0
+
+    def test_errors_are_not_cached(self, stub, tmp_path):
+        service = SentinelService('id', 'secret', base_url=stub.url, tile_cache=TileCache(str(tmp_path)))
+        stub.fail_next(1, status=500)
+
+        with pytest.raises(Exception):
+            service.fetch_image(1.0, 2.0)
+        assert service.fetch_image(1.0, 2.0).startswith(b'\x89PNG')
+        assert stub.process_requests == 2
+
+    def test_without_cache_always_fetches(self, stub):
+        service = SentinelService('id', 'secret', base_url=stub.url, tile_cache=None)
+
+        service.fetch_image(1.0, 2.0)
+        service.fetch_image(1.0, 2.0)
+
+        assert stub.process_requests == 2
+        assert stub.token_requests == 1
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,49 @@
+"""
+Tests for the preforked serving entry point.
+"""
+
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serve import worker_layout, worker_cores
+
+
+class TestWorkerLayout:
+    """Worker and thread counts derived from the available cores."""
+
+    def test_defaults_to_one_single_threaded_worker_per_core(self):
+        assert worker_layout(0, 0, cpu_count=8) == (8, 1)
+
+    def test_threads_split_cores_between_workers(self):
+        assert worker_layout(2, 0, cpu_count=8) == (2, 4)
+        assert worker_layout(3, 0, cpu_count=8) == (3, 2)
+
+    def test_at_least_one_thread(self):
+        assert worker_layout(16, 0, cpu_count=4) == (16, 1)
+
+    def test_explicit_values_win(self):
+        assert worker_layout(2, 3, cpu_count=8) == (2, 3)
+
+
+class TestWorkerCores:
+    """Core pinning gives workers disjoint core sets while cores last."""
+
+    def test_disjoint_slices(self):
+        cores = set(range(8))
+
+        assigned = [worker_cores(i, 2, cores) for i in range(4)]
+
+        assert assigned == [{0, 1}, {2, 3}, {4, 5}, {6, 7}]
+
+    def test_wraps_when_oversubscribed(self):
+        assert worker_cores(2, 1, {4, 5}) == {4}
+
+    def test_uses_available_core_ids(self):
+        assert worker_cores(1, 2, {10, 11, 12, 13}) == {12, 13}
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,132 @@
+"""
+Tests for the persistent satellite tile cache.
+"""
+
+import os
+import sys
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tile_cache import TileCache, snap_to_grid, tile_key
+
+
+def blob(n, size=1000):
+    return bytes([n % 256]) * size
+
+
+class TestTileCache:
+    """Lookups, LRU eviction and the content-addressed layout."""
+
+    def test_miss_then_hit(self, tmp_path):
+        cache = TileCache(str(tmp_path))
+
+        assert cache.get('a') is None
+        cache.put('a', blob(1))
+
+        assert cache.get('a') == blob(1)
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses'], stats['entries'], stats['bytes']) == (1, 1, 1, 1000)
+
+    def test_persists_across_instances(self, tmp_path):
+        TileCache(str(tmp_path)).put('a', blob(1))
+
+        assert TileCache(str(tmp_path)).get('a') == blob(1)
+
+    def test_evicts_least_recently_used_over_max_bytes(self, tmp_path):
+        cache = TileCache(str(tmp_path), max_bytes=3000)
+        for key in 'abc':
+            cache.put(key, blob(ord(key)))
+        cache.get('a')
+
+        cache.put('d', blob(ord('d')))
+
+        assert 'b' not in cache
+        assert all(key in cache for key in 'acd')
+        assert cache.stats()['evictions'] == 1
+        assert cache.stats()['bytes'] == 3000
+
+    def test_identical_tiles_stored_once(self, tmp_path):
+        cache = TileCache(str(tmp_path))
+        cache.put('a', blob(7))
+        cache.put('b', blob(7))
+
+        files = [name for _, _, names in os.walk(cache.objects_dir) for name in names]
+
+        assert len(files) == 1
+        assert cache.stats()['bytes'] == 1000
+        assert cache.get('b') == blob(7)
+
+    def test_shared_blob_kept_until_last_key_evicted(self, tmp_path):
+        cache = TileCache(str(tmp_path), max_bytes=2000)
+        cache.put('a', blob(7))
+        cache.put('b', blob(7))
+        cache.put('c', blob(8))
+        cache.put('d', blob(9))
+
+        # 'a' went first, but its blob is still referenced by 'b'... until 'b' goes too
+        assert 'a' not in cache and 'b' not in cache
+        assert cache.get('c') == blob(8) and cache.get('d') == blob(9)
+        files = [name for _, _, names in os.walk(cache.objects_dir) for name in names]
+        assert len(files) == 2
+
+    def test_overwrite_releases_old_blob(self, tmp_path):
+        cache = TileCache(str(tmp_path))
+        cache.put('a', blob(1))
+        cache.put('a', blob(2))
+
+        assert cache.get('a') == blob(2)
+        assert cache.stats()['bytes'] == 1000
+
+    def test_missing_blob_is_a_miss(self, tmp_path):
+        cache = TileCache(str(tmp_path))
+        cache.put('a', blob(1))
+        for root, _, names in os.walk(cache.objects_dir):
+            for name in names:
+                os.remove(os.path.join(root, name))
+
+        assert cache.get('a') is None
+        assert 'a' not in cache
+
+    def test_disabled_with_zero_bytes(self, tmp_path):
+        cache = TileCache(str(tmp_path), max_bytes=0)
+        cache.put('a', blob(1))
+
+        assert cache.get('a') is None
+
+    def test_concurrent_writers(self, tmp_path):
+        cache = TileCache(str(tmp_path), max_bytes=50 * 1000)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda i: cache.put(f'k{i}', blob(i)), range(100)))
+
+        assert len(cache) == 50
+        assert cache.stats()['bytes'] == 50 * 1000
+
+
+class TestKeys:
+    """Grid snapping and key construction."""
+
+    def test_nearby_points_snap_together(self):
+        assert snap_to_grid(20.50041, 78.90012, 0.001) == snap_to_grid(20.49969, 78.89961, 0.001)
+        assert snap_to_grid(20.5004, 78.9, 0.001) != snap_to_grid(20.5016, 78.9, 0.001)
+
+    def test_zero_grid_disables_snapping(self):
+        assert snap_to_grid(20.50041, 78.90012, 0) == (20.50041, 78.90012)
+
+    def test_key_changes_with_each_component(self):
+        base = ([1, 2, 3, 4], 'script', '2023-01-01', '2023-12-31', 512, 512)
+        keys = {
+            tile_key(*base),
+            tile_key([1, 2, 3, 5], *base[1:]),
+            tile_key(base[0], 'other script', *base[2:]),
+            tile_key(*base[:3], '2024-12-31', 512, 512),
+            tile_key(*base[:4], 256, 256),
+        }
+
+        assert len(keys) == 5
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,168 @@
+"""
+Tests for the weather cache stores, including the shared SQLite backend.
+"""
+
+import os
+import sys
+import time
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import weather_cache
+from weather_cache import WeatherCache, MemoryWeatherStore, SQLiteWeatherStore, RETRY_PRUNE_MIN
+
+
+class CountingFetch:
+    """Fetch returning {'n': 1}, {'n': 2}, ... after an optional delay (shared across caches)."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        time.sleep(self.delay)
+        with self.lock:
+            self.calls += 1
+            return {'n': self.calls}
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryWeatherStore(max_entries=3)
+    return SQLiteWeatherStore(str(tmp_path / 'weather.sqlite'), max_entries=3, max_age_seconds=3600)
+
+
+class TestStores:
+    """Both backends behave alike."""
+
+    def test_set_get_delete(self, store):
+        entry = {'timestamp': time.time(), 'data': {'current': {'temperature': 21.5}, 'forecast': []}}
+        store.set('a', entry)
+
+        assert store.get('a') == entry
+        store.delete('a')
+        assert store.get('a') is None
+
+    def test_evicts_least_recently_used(self, store):
+        now = time.time()
+        for key in 'abc':
+            store.set(key, {'timestamp': now, 'data': {}})
+            time.sleep(0.01)
+        store.get('a')
+        if isinstance(store, SQLiteWeatherStore):
+            # Reads only refresh the LRU position once a minute
+            store._connection().execute("UPDATE weather SET last_access = ? WHERE key = 'a'", (time.time(),))
+
+        store.set('d', {'timestamp': now, 'data': {}})
+
+        assert store.get('b') is None
+        assert all(store.get(key) is not None for key in 'acd')
+        assert store.stats()['evictions'] == 1
+
+    def test_clear(self, store):
+        store.set('a', {'timestamp': time.time(), 'data': {}})
+        store.clear()
+
+        assert len(store) == 0
+
+
+class TestSQLiteStore:
+    """Persistence, expiry and cross-process coordination."""
+
+    def test_survives_restart(self, tmp_path):
+        path = str(tmp_path / 'weather.sqlite')
+        entry = {'timestamp': time.time(), 'data': {'x': 1}}
+        SQLiteWeatherStore(path).set('a', entry)
+
+        assert SQLiteWeatherStore(path).get('a') == entry
+
+    def test_expired_entries_not_returned_and_purged(self, tmp_path):
+        store = SQLiteWeatherStore(str(tmp_path / 'weather.sqlite'), max_age_seconds=60)
+        store.set('old', {'timestamp': time.time() - 61, 'data': {}})
+
+        assert store.get('old') is None
+        store.set('new', {'timestamp': time.time(), 'data': {}})
+        assert len(store) == 1
+
+    def test_lease_held_by_one_claimant(self, tmp_path):
+        path = str(tmp_path / 'weather.sqlite')
+        first, second = SQLiteWeatherStore(path), SQLiteWeatherStore(path)
+
+        assert first.try_lease('a', 30)
+        assert not second.try_lease('a', 30)
+        first.release('a')
+        assert second.try_lease('a', 30)
+
+    def test_expired_lease_can_be_taken_over(self, tmp_path):
+        path = str(tmp_path / 'weather.sqlite')
+        first, second = SQLiteWeatherStore(path), SQLiteWeatherStore(path)
+
+        assert first.try_lease('a', -1)
+        assert second.try_lease('a', 30)
+
+    def test_caches_sharing_a_file_fetch_once(self, tmp_path):
+        # Each WeatherCache stands in for one worker process
+        path = str(tmp_path / 'weather.sqlite')
+        workers = [WeatherCache(store=SQLiteWeatherStore(path)) for _ in range(8)]
+        fetch = CountingFetch(delay=0.2)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda cache: cache.get_or_fetch('cell', fetch), workers))
+
+        assert results == [{'n': 1}] * 8
+        assert fetch.calls == 1
+        assert sum(cache.stats()['peer_fetches'] for cache in workers) == 7
+
+    def test_lease_not_released_by_a_process_that_never_held_it(self, tmp_path, monkeypatch):
+        path = str(tmp_path / 'weather.sqlite')
+        holder, waiter, third = (SQLiteWeatherStore(path) for _ in range(3))
+        assert holder.try_lease('cell', 30)
+        monkeypatch.setattr(weather_cache, 'LEASE_SECONDS', 0.1)
+
+        result = WeatherCache(store=waiter).get_or_fetch('cell', CountingFetch())
+
+        assert result == {'n': 1}
+        # The holder's lease survives the waiter giving up on it
+        assert not third.try_lease('cell', 30)
+
+    def test_new_worker_starts_warm(self, tmp_path):
+        path = str(tmp_path / 'weather.sqlite')
+        fetch = CountingFetch()
+        WeatherCache(store=SQLiteWeatherStore(path)).get_or_fetch('cell', fetch)
+
+        assert WeatherCache(store=SQLiteWeatherStore(path)).get_or_fetch('cell', fetch) == {'n': 1}
+        assert fetch.calls == 1
+
+    def test_stats_report_backend(self, tmp_path):
+        stats = WeatherCache(store=SQLiteWeatherStore(str(tmp_path / 'weather.sqlite'))).stats()
+
+        assert stats['backend'] == 'sqlite'
+        assert stats['size'] == 0
+
+
+class TestFailures:
+    """Failed fetches are retried later without unbounded bookkeeping."""
+
+    def test_retry_times_of_distinct_failing_keys_are_pruned(self):
+        now = [0.0]
+        cache = WeatherCache(clock=lambda: now[0])
+
+        def failing():
+            raise RuntimeError('upstream down')
+
+        for i in range(5 * RETRY_PRUNE_MIN):
+            now[0] += 1.0
+            with pytest.raises(RuntimeError):
+                cache.get_or_fetch(f'cell-{i}', failing)
+
+        assert cache.stats()['fetch_errors'] == 5 * RETRY_PRUNE_MIN
+        assert len(cache._retry_at) <= RETRY_PRUNE_MIN
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
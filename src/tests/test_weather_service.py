@@ -6,7 +6,10 @@ Uses pytest with hypothesis for property-based testing.
 import os
 import sys
 import time
+import asyncio
+import threading
 import pytest
+from concurrent.futures import ThreadPoolExecutor
 from hypothesis import given, strategies as st, settings
 from unittest.mock import patch, MagicMock
 
@@ -14,7 +17,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from weather_service import (
     WeatherService, WeatherData, ForecastDay, 
-    WeatherServiceError, _weather_cache, CACHE_DURATION_SECONDS
+    WeatherServiceError, WeatherCache, _weather_cache, CACHE_DURATION_SECONDS,
+    SpatialIndex, distance_km
 )
 
 
@@ -200,5 +204,310 @@ class TestWeatherCachePropertyBased:
         assert service._get_from_cache(cache_key) == test_data
 
 
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingFetch:
+    """Fetch returning {'n': 1}, {'n': 2}, ... after an optional delay."""
+
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        time.sleep(self.delay)
+        with self.lock:
+            self.calls += 1
+            if self.error is not None:
+                raise self.error
+            return {'n': self.calls}
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+
+class TestWeatherCache:
+    """LRU bound, stale-while-revalidate and single-flight fetches."""
+
+    def test_fresh_entry_served_without_fetch(self):
+        cache, fetch = WeatherCache(), CountingFetch()
+
+        assert cache.get_or_fetch('a', fetch) == {'n': 1}
+        assert cache.get_or_fetch('a', fetch) == {'n': 1}
+
+        assert fetch.calls == 1
+        assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 1)
+
+    def test_evicts_least_recently_used(self):
+        cache, fetch = WeatherCache(max_entries=2), CountingFetch()
+        cache.get_or_fetch('a', fetch)
+        cache.get_or_fetch('b', fetch)
+        cache.get_or_fetch('a', fetch)
+
+        cache.get_or_fetch('c', fetch)
+
+        assert 'b' not in cache
+        assert 'a' in cache and 'c' in cache
+        assert len(cache) == 2
+        assert cache.stats()['evictions'] == 1
+
+    def test_stale_entry_served_while_refreshing(self):
+        clock, fetch = FakeClock(), CountingFetch()
+        cache = WeatherCache(ttl_seconds=60, stale_seconds=60, clock=clock)
+        cache.get_or_fetch('a', fetch)
+
+        clock.now += 90
+        assert cache.get_or_fetch('a', fetch) == {'n': 1}
+        wait_for(lambda: fetch.calls == 2)
+
+        wait_for(lambda: cache.stats()['fetches'] == 2)
+        assert cache.get_or_fetch('a', fetch) == {'n': 2}
+        assert cache.stats()['background_refreshes'] == 1
+
+    def test_entry_past_stale_window_is_fetched_synchronously(self):
+        clock, fetch = FakeClock(), CountingFetch()
+        cache = WeatherCache(ttl_seconds=60, stale_seconds=60, clock=clock)
+        cache.get_or_fetch('a', fetch)
+
+        clock.now += 121
+
+        assert cache.get_or_fetch('a', fetch) == {'n': 2}
+
+    def test_concurrent_misses_share_one_fetch(self):
+        cache, fetch = WeatherCache(), CountingFetch(delay=0.2)
+
+        with ThreadPoolExecutor(max_workers=100) as pool:
+            results = list(pool.map(lambda _: cache.get_or_fetch('cell', fetch), range(100)))
+
+        assert results == [{'n': 1}] * 100
+        assert fetch.calls == 1
+        assert cache.stats()['coalesced'] > 0
+
+    def test_failed_fetch_raises_for_all_waiters_then_recovers(self):
+        cache = WeatherCache()
+        failing = CountingFetch(delay=0.1, error=WeatherServiceError('down'))
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(cache.get_or_fetch, 'a', failing) for _ in range(8)]
+        errors = [f.exception() for f in futures]
+
+        assert all(isinstance(e, WeatherServiceError) for e in errors)
+        assert failing.calls == 1
+        assert cache.get_or_fetch('a', CountingFetch()) == {'n': 1}
+
+    def test_failed_refresh_keeps_stale_entry_and_backs_off(self):
+        clock = FakeClock()
+        cache = WeatherCache(ttl_seconds=60, stale_seconds=600, clock=clock)
+        cache.get_or_fetch('a', CountingFetch())
+        failing = CountingFetch(error=WeatherServiceError('down'))
+
+        clock.now += 90
+        cache.get_or_fetch('a', failing)
+        wait_for(lambda: cache.stats()['fetch_errors'] == 1)
+
+        assert cache.get_or_fetch('a', failing) == {'n': 1}
+        assert cache.stats()['background_refreshes'] == 1
+
+    def test_async_callers_share_one_fetch(self):
+        cache = WeatherCache()
+        calls = []
+
+        async def fetch_async():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return {'async': True}
+
+        async def main():
+            return await asyncio.gather(*[cache.get_or_fetch_async('a', fetch_async) for _ in range(50)])
+
+        assert asyncio.run(main()) == [{'async': True}] * 50
+        assert len(calls) == 1
+        assert cache.get_or_fetch('a', CountingFetch()) == {'async': True}
+
+    def test_service_fetches_each_cell_once(self):
+        _weather_cache.clear()
+        service = WeatherService(api_key='test')
+        current = WeatherData(25.0, 60, 10.0, 'Clear', '01d', 'clear sky')
+
+        def slow_current(lat, lon):
+            time.sleep(0.1)
+            return current
+
+        with patch.object(service, 'get_current_weather', side_effect=slow_current) as current_mock, \
+                patch.object(service, 'get_forecast', return_value=[]) as forecast_mock:
+            with ThreadPoolExecutor(max_workers=100) as pool:
+                results = list(pool.map(lambda i: service.get_weather_with_forecast(28.6131 + i * 1e-5, 77.209),
+                                        range(100)))
+
+        assert all(r == {'current': current.to_dict(), 'forecast': []} for r in results)
+        assert current_mock.call_count == 1
+        assert forecast_mock.call_count == 1
+
+
+class TestParallelFetch:
+    """Current and forecast requests overlap; many locations are fetched per cell."""
+
+    def setup_method(self):
+        _weather_cache.clear()
+
+    def test_current_and_forecast_fetched_concurrently(self):
+        service = WeatherService(api_key='test')
+        current = WeatherData(25.0, 60, 10.0, 'Clear', '01d', 'clear sky')
+
+        def slow(result):
+            def call(*args):
+                time.sleep(0.2)
+                return result
+            return call
+
+        with patch.object(service, 'get_current_weather', side_effect=slow(current)), \
+                patch.object(service, 'get_forecast', side_effect=slow([])):
+            start = time.perf_counter()
+            service.get_weather_with_forecast(28.61, 77.21)
+            elapsed = time.perf_counter() - start
+
+        assert elapsed < 0.35
+
+    def test_get_weather_many_dedupes_and_bounds_concurrency(self):
+        service = WeatherService(api_key='test')
+        current = WeatherData(25.0, 60, 10.0, 'Clear', '01d', 'clear sky')
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def slow_current(lat, lon):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return current
+
+        coords = [(10 + i, 70.0) for i in range(12)] + [(10.001, 70.001)]
+        with patch.object(service, 'get_current_weather', side_effect=slow_current) as current_mock, \
+                patch.object(service, 'get_forecast', return_value=[]):
+            results = service.get_weather_many(coords, max_concurrency=4)
+
+        assert current_mock.call_count == 12
+        assert peak[0] <= 4
+        assert [(r['lat'], r['lon']) for r in results] == coords
+        assert results[-1]['current'] == results[0]['current']
+
+    def test_get_weather_many_reports_errors_per_location(self):
+        service = WeatherService(api_key='test')
+
+        def current(lat, lon):
+            if lat == 1.0:
+                raise WeatherServiceError('Failed to fetch weather: 502')
+            return WeatherData(25.0, 60, 10.0, 'Clear', '01d', 'clear sky')
+
+        with patch.object(service, 'get_current_weather', side_effect=current), \
+                patch.object(service, 'get_forecast', return_value=[]):
+            results = service.get_weather_many([(1.0, 2.0), (3.0, 4.0)])
+
+        assert results[0] == {'lat': 1.0, 'lon': 2.0, 'error': 'Failed to fetch weather: 502'}
+        assert results[1]['forecast'] == []
+
+
+
+class TestSpatialIndex:
+    """Grid lookups of cells within a radius."""
+
+    def test_distance_km(self):
+        assert distance_km(28.61, 77.21, 28.61, 77.21) == 0
+        # 0.01 degree of latitude is about 1.11 km
+        assert distance_km(28.61, 77.21, 28.62, 77.21) == pytest.approx(1.112, abs=0.01)
+
+    def test_within_matches_brute_force(self):
+        import random
+        rng = random.Random(0)
+        index = SpatialIndex(radius_km=5.0)
+        points = {f'p{i}': (rng.uniform(-80, 80), rng.uniform(-179, 179)) for i in range(2000)}
+        # Dense clusters so queries have neighbours
+        points.update({f'c{i}': (28.6 + rng.uniform(-0.1, 0.1), 77.2 + rng.uniform(-0.1, 0.1)) for i in range(500)})
+        points.update({f'n{i}': (70.0 + rng.uniform(-0.1, 0.1), 20.0 + rng.uniform(-0.3, 0.3)) for i in range(500)})
+        for key, (lat, lon) in points.items():
+            index.add(key, lat, lon)
+
+        for lat, lon in [(28.6, 77.2), (28.65, 77.15), (70.0, 20.0), (0.0, 0.0)]:
+            expected = sorted(key for key, point in points.items() if distance_km(lat, lon, *point) <= 5.0)
+            found = index.within(lat, lon)
+            assert sorted(key for _, key in found) == expected
+            assert [d for d, _ in found] == sorted(d for d, _ in found)
+
+    def test_bounded_and_discard(self):
+        index = SpatialIndex(radius_km=5.0, max_entries=2)
+        index.add('a', 10.0, 10.0)
+        index.add('b', 10.01, 10.0)
+        index.add('c', 10.02, 10.0)
+        index.discard('b')
+
+        assert len(index) == 1
+        assert [key for _, key in index.within(10.0, 10.0)] == ['c']
+
+
+class TestNeighbourReuse:
+    """Lookups served from a fresh nearby cell instead of OpenWeatherMap."""
+
+    def setup_method(self):
+        self.clock = FakeClock()
+        self.cache = WeatherCache(ttl_seconds=CACHE_DURATION_SECONDS, clock=self.clock)
+        self.current = WeatherData(25.0, 60, 10.0, 'Clear', '01d', 'clear sky')
+
+    def fetch_count(self, service, coords):
+        with patch.object(service, 'get_current_weather', return_value=self.current) as current_mock, \
+                patch.object(service, 'get_forecast', return_value=[]):
+            results = [service.get_weather_with_forecast(lat, lon) for lat, lon in coords]
+        return current_mock.call_count, results
+
+    def test_nearby_farm_reuses_fresh_entry(self):
+        service = WeatherService(api_key='test', cache=self.cache, reuse_radius_km=3.0)
+
+        # 1.2 km apart: different cells, within the radius
+        calls, results = self.fetch_count(service, [(28.61, 77.21), (28.62, 77.21)])
+
+        assert calls == 1
+        assert results[1] == results[0]
+        assert service.stats()['neighbour_hits'] == 1
+        assert service.stats()['indexed_cells'] == 1
+
+    def test_outside_radius_or_disabled_fetches(self):
+        far = WeatherService(api_key='test', cache=self.cache, reuse_radius_km=1.0)
+        assert self.fetch_count(far, [(28.61, 77.21), (28.63, 77.21)])[0] == 2
+
+        self.cache.clear()
+        disabled = WeatherService(api_key='test', cache=self.cache, reuse_radius_km=0)
+        assert self.fetch_count(disabled, [(28.61, 77.21), (28.62, 77.21)])[0] == 2
+        assert disabled.stats()['neighbour_hits'] == 0
+
+    def test_expired_neighbour_not_reused(self):
+        service = WeatherService(api_key='test', cache=self.cache, reuse_radius_km=3.0)
+        self.fetch_count(service, [(28.61, 77.21)])
+        self.clock.now += CACHE_DURATION_SECONDS + 1
+
+        assert self.fetch_count(service, [(28.62, 77.21)])[0] == 1
+        assert service.stats()['neighbour_hits'] == 0
+
+    def test_async_path_reuses_neighbour(self):
+        service = WeatherService(api_key='test', cache=self.cache, reuse_radius_km=3.0)
+        self.fetch_count(service, [(28.61, 77.21)])
+        client = MagicMock()
+
+        result = asyncio.run(service.get_weather_with_forecast_async(28.62, 77.22, client))
+
+        assert result['current'] == self.current.to_dict()
+        client.get.assert_not_called()
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
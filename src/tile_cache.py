@@ -0,0 +1,221 @@
+"""
+Persistent cache for Sentinel-2 image tiles.
+
+Tiles are keyed by their (grid-snapped) bbox, a hash of the evalscript, the
+time range and the output size. Image bytes live in a content-addressed
+layout (objects/<2 hex>/<sha256>.png), so identical tiles under different
+keys are stored once, and a SQLite index (WAL mode, safe to share between
+worker processes) maps keys to blobs and keeps the LRU order. When the blobs
+exceed `max_bytes`, least recently used keys are evicted and unreferenced
+blobs deleted.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    refs INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tiles (
+    key TEXT PRIMARY KEY,
+    digest TEXT NOT NULL REFERENCES blobs(digest),
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tiles_last_access ON tiles(last_access);
+"""
+
+
+def snap_to_grid(lat: float, lon: float, grid_degrees: float):
+    """Snap a point to the nearest grid node, so nearby requests share a tile."""
+    if grid_degrees <= 0:
+        return lat, lon
+    return (round(round(lat / grid_degrees) * grid_degrees, 6),
+            round(round(lon / grid_degrees) * grid_degrees, 6))
+
+
+def tile_key(bbox: Sequence[float], evalscript: str, time_from: str, time_to: str, width: int, height: int) -> str:
+    """Readable cache key for one Process API request."""
+    evalscript_hash = hashlib.sha256(evalscript.encode()).hexdigest()[:16]
+    bbox_text = ','.join(f"{v:.6f}" for v in bbox)
+    return f"{bbox_text}|{evalscript_hash}|{time_from}/{time_to}|{width}x{height}"
+
+
+class TileCache:
+    """
+    Disk-backed, size-bounded LRU cache of image tiles.
+
+    Thread-safe within a process (one SQLite connection per thread) and
+    safe across processes sharing the same directory.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 1024 * 1024 * 1024):
+        """
+        Initialize TileCache.
+
+        Args:
+            root: Directory holding index.sqlite and the objects/ tree (created if missing)
+            max_bytes: Upper bound on the total size of stored tiles
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.objects_dir = os.path.join(root, 'objects')
+        self.index_path = os.path.join(root, 'index.sqlite')
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's connection to the index; the directory and schema are created on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(self.objects_dir, exist_ok=True)
+            conn = sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest + '.png')
+
+    def _count(self, attr: str) -> None:
+        with self._stats_lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the tile's bytes, or None on a miss."""
+        conn = self._connection()
+        row = conn.execute('SELECT digest FROM tiles WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self._count('misses')
+            return None
+        try:
+            with open(self._blob_path(row[0]), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            # Blob removed behind our back (or evicted by another process)
+            logger.warning(f"Tile blob missing for {key}, dropping index entry")
+            self._delete_keys(conn, [key])
+            self._count('misses')
+            return None
+        conn.execute('UPDATE tiles SET last_access = ? WHERE key = ?', (time.time(), key))
+        self._count('hits')
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store a tile, then evict least recently used tiles while over max_bytes."""
+        if self.max_bytes <= 0:
+            return
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            old = conn.execute('SELECT digest FROM tiles WHERE key = ?', (key,)).fetchone()
+            if old is not None and old[0] == digest:
+                conn.execute('UPDATE tiles SET last_access = ? WHERE key = ?', (now, key))
+                conn.execute('COMMIT')
+                return
+            conn.execute('INSERT INTO blobs (digest, size, refs) VALUES (?, ?, 1) '
+                         'ON CONFLICT(digest) DO UPDATE SET refs = refs + 1', (digest, len(data)))
+            if old is not None:
+                self._release_blob(conn, old[0])
+            conn.execute('INSERT OR REPLACE INTO tiles (key, digest, created_at, last_access) VALUES (?, ?, ?, ?)',
+                         (key, digest, now, now))
+            evicted = self._evict_locked(conn)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        for _ in range(evicted):
+            self._count('evictions')
+
+    def _evict_locked(self, conn: sqlite3.Connection) -> int:
+        """Evict LRU tiles until the blobs fit in max_bytes (inside a transaction)."""
+        evicted = 0
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0]
+        while total > self.max_bytes:
+            row = conn.execute('SELECT key, digest FROM tiles ORDER BY last_access LIMIT 1').fetchone()
+            if row is None:
+                break
+            conn.execute('DELETE FROM tiles WHERE key = ?', (row[0],))
+            total -= self._release_blob(conn, row[1])
+            evicted += 1
+        return evicted
+
+    def _release_blob(self, conn: sqlite3.Connection, digest: str) -> int:
+        """Drop one reference to a blob, deleting it when unreferenced. Returns bytes freed."""
+        conn.execute('UPDATE blobs SET refs = refs - 1 WHERE digest = ?', (digest,))
+        row = conn.execute('SELECT size FROM blobs WHERE digest = ? AND refs <= 0', (digest,)).fetchone()
+        if row is None:
+            return 0
+        conn.execute('DELETE FROM blobs WHERE digest = ?', (digest,))
+        try:
+            os.remove(self._blob_path(digest))
+        except FileNotFoundError:
+            pass
+        return row[0]
+
+    def _delete_keys(self, conn: sqlite3.Connection, keys) -> None:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for key in keys:
+                row = conn.execute('SELECT digest FROM tiles WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    conn.execute('DELETE FROM tiles WHERE key = ?', (key,))
+                    self._release_blob(conn, row[0])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def __contains__(self, key: str) -> bool:
+        return self._connection().execute('SELECT 1 FROM tiles WHERE key = ?', (key,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self._connection().execute('SELECT COUNT(*) FROM tiles').fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with entries, stored bytes, limit and this process's
+            hit/miss/eviction counters
+        """
+        conn = self._connection()
+        entries = conn.execute('SELECT COUNT(*) FROM tiles').fetchone()[0]
+        stored = conn.execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0]
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': entries,
+                'bytes': stored,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
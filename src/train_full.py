@@ -2,20 +2,28 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 from torch.utils.data import DataLoader
-from torchvision import transforms
 import os
+import time
 import pandas as pd
 
 from model import LiteGeoNet
-from dataset import CropDataset
+from dataset import CropDataset, BatchCollate
 
 # --- Configuration ---
 CSV_FILE = '../data/crops_full.csv' # Changed to full dataset
 IMG_DIR = '../data' 
 CHECKPOINT_PATH = 'model_checkpoint_full.pth'
+# Packed image cache from build_image_cache.py; used automatically when present
+IMAGE_CACHE_PATH = '../data/image_cache_64.npy'
 NUM_EPOCHS = 1 # Just 1 epoch for verification
 BATCH_SIZE = 32 # Larger batch size
 LEARNING_RATE = 0.001
+# Input pipeline: images are preprocessed per batch in the collate step
+IMAGE_SIZE = 64 # EuroSAT is 64x64
+AUGMENT = True # Random flips and rot90 (orientation-free overhead tiles)
+NUM_WORKERS = 4
+PREFETCH_FACTOR = 2 # Batches prefetched per worker
+PIN_MEMORY = torch.cuda.is_available()
 
 # Load classes dynamically from CSV
 df = pd.read_csv(CSV_FILE)
@@ -26,20 +34,20 @@ def main():
     print(f"Initializing Training on {len(df)} samples...")
     print(f"Classes: {CROP_CLASSES}")
     
-    # 1. Transforms
-    data_transform = transforms.Compose([
-        transforms.Resize((64, 64)), # EuroSAT is 64x64
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-    ])
-    
-    # 2. Dataset & DataLoader
+    # 1. Dataset & DataLoader
+    # Samples are raw uint8 images (decoded JPEGs or views of the packed cache);
+    # resize, augmentation and normalization happen once per batch in BatchCollate
+    use_cache = os.path.exists(IMAGE_CACHE_PATH)
+    if use_cache:
+        print(f"Using image cache {IMAGE_CACHE_PATH}")
+    else:
+        print("No image cache found, decoding JPEGs every epoch (run build_image_cache.py to speed this up)")
     dataset = CropDataset(
         csv_file=CSV_FILE,
         root_dir=IMG_DIR,
-        transform=data_transform,
         crop_classes=CROP_CLASSES,
-        tab_columns=TAB_COLUMNS
+        tab_columns=TAB_COLUMNS,
+        image_cache=IMAGE_CACHE_PATH if use_cache else None
     )
     
     # Split into train/val (simple split)
@@ -47,11 +55,20 @@ def main():
     val_size = len(dataset) - train_size
     train_dataset, val_dataset = torch.utils.data.random_split(dataset, [train_size, val_size])
     
-    train_loader = DataLoader(train_dataset, batch_size=BATCH_SIZE, shuffle=True, num_workers=0)
+    train_loader = DataLoader(
+        train_dataset,
+        batch_size=BATCH_SIZE,
+        shuffle=True,
+        collate_fn=BatchCollate(image_size=IMAGE_SIZE, augment=AUGMENT),
+        num_workers=NUM_WORKERS,
+        pin_memory=PIN_MEMORY,
+        prefetch_factor=PREFETCH_FACTOR if NUM_WORKERS > 0 else None,
+        persistent_workers=NUM_WORKERS > 0
+    )
     
     print(f"Train size: {len(train_dataset)}, Val size: {len(val_dataset)}")
     
-    # 3. Model Setup
+    # 2. Model Setup
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     print(f"Using device: {device}")
     
@@ -61,17 +78,18 @@ def main():
     criterion = nn.CrossEntropyLoss()
     optimizer = optim.Adam(model.parameters(), lr=LEARNING_RATE)
     
-    # 4. Training Loop
+    # 3. Training Loop
     model.train()
     for epoch in range(NUM_EPOCHS):
         running_loss = 0.0
         correct = 0
         total = 0
+        epoch_start = time.time()
         
         for i, (images, tab_data, labels) in enumerate(train_loader):
-            images = images.to(device)
-            tab_data = tab_data.to(device)
-            labels = labels.to(device)
+            images = images.to(device, non_blocking=PIN_MEMORY)
+            tab_data = tab_data.to(device, non_blocking=PIN_MEMORY)
+            labels = labels.to(device, non_blocking=PIN_MEMORY)
             
             optimizer.zero_grad()
             
@@ -87,15 +105,18 @@ def main():
             correct += (predicted == labels).sum().item()
             
             if i % 10 == 0:
-                print(f"Step [{i}/{len(train_loader)}] Loss: {loss.item():.4f}")
+                samples_per_sec = total / (time.time() - epoch_start)
+                print(f"Step [{i}/{len(train_loader)}] Loss: {loss.item():.4f} ({samples_per_sec:.1f} samples/s)")
             
         epoch_loss = running_loss / len(train_loader)
         epoch_acc = 100 * correct / total
-        print(f"Epoch [{epoch+1}/{NUM_EPOCHS}] Loss: {epoch_loss:.4f} Accuracy: {epoch_acc:.2f}%")
+        samples_per_sec = total / (time.time() - epoch_start)
+        print(f"Epoch [{epoch+1}/{NUM_EPOCHS}] Loss: {epoch_loss:.4f} Accuracy: {epoch_acc:.2f}% "
+              f"Throughput: {samples_per_sec:.1f} samples/s")
         
     print("Training Finished.")
     
-    # 5. Save Checkpoint
+    # 4. Save Checkpoint
     checkpoint = {
         'model_state_dict': model.state_dict(),
         'crop_classes': CROP_CLASSES,
@@ -0,0 +1,138 @@
+"""
+Head-only training from precomputed backbone embeddings.
+
+Runs the frozen backbone once (or reuses a cache built from the same
+backbone weights) and then trains only tab_mlp, the projections, the gate
+and the classifier on the cached 1280-dim features. Use this to iterate on
+the fusion layers without re-running EfficientNet every epoch.
+
+The result is saved to model_checkpoint_head.pth; the full checkpoint it
+starts from is left untouched.
+
+Usage:
+    python train_head.py
+"""
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import DataLoader
+import os
+import time
+import pandas as pd
+
+from model import LiteGeoNet
+from dataset import CropDataset
+from embedding_cache import backbone_fingerprint, load_embedding_cache, build_embedding_cache, EmbeddingDataset
+
+# --- Configuration ---
+CSV_FILE = '../data/crops_full.csv'
+IMG_DIR = '../data'
+# Backbone weights come from this checkpoint if present (ImageNet weights otherwise)
+INIT_CHECKPOINT_PATH = 'model_checkpoint_full.pth'
+# Written separately so the full fine-tuned checkpoint above is never overwritten;
+# serve it with MODEL_CHECKPOINT=model_checkpoint_head.pth
+CHECKPOINT_PATH = 'model_checkpoint_head.pth'
+IMAGE_CACHE_PATH = '../data/image_cache_64.npy'
+EMBEDDING_CACHE_PATH = '../data/embeddings_b0.npy'
+NUM_EPOCHS = 20
+BATCH_SIZE = 256
+LEARNING_RATE = 0.001
+
+TAB_COLUMNS = ['ph', 'N', 'P', 'K', 'rainfall', 'temp', 'lat', 'lon']
+
+
+def main():
+    df = pd.read_csv(CSV_FILE, usecols=['crop_label'])
+    crop_classes = sorted(df['crop_label'].unique().tolist())
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    print(f"Head-only training on {len(df)} samples, classes: {crop_classes}")
+
+    # 1. Model (backbone from the existing checkpoint when available, so no
+    # pretrained download in that case)
+    has_init = os.path.exists(INIT_CHECKPOINT_PATH)
+    model = LiteGeoNet(num_classes=len(crop_classes), num_tabular_features=len(TAB_COLUMNS), pretrained=not has_init)
+    if has_init:
+        checkpoint = torch.load(INIT_CHECKPOINT_PATH, map_location='cpu')
+        if checkpoint['crop_classes'] == crop_classes and checkpoint['tab_columns'] == TAB_COLUMNS:
+            print(f"Initializing from {INIT_CHECKPOINT_PATH}")
+            model.load_state_dict(checkpoint['model_state_dict'])
+        else:
+            print(f"{INIT_CHECKPOINT_PATH} has different classes/columns, keeping only its backbone")
+            backbone_state = {k[len('backbone.'):]: v for k, v in checkpoint['model_state_dict'].items()
+                              if k.startswith('backbone.')}
+            model.backbone.load_state_dict(backbone_state)
+    model.to(device)
+
+    # 2. Embedding cache, rebuilt whenever the backbone weights change
+    dataset = CropDataset(
+        csv_file=CSV_FILE,
+        root_dir=IMG_DIR,
+        crop_classes=crop_classes,
+        tab_columns=TAB_COLUMNS,
+        image_cache=IMAGE_CACHE_PATH if os.path.exists(IMAGE_CACHE_PATH) else None
+    )
+    fingerprint = backbone_fingerprint(model.backbone)
+    cache = load_embedding_cache(EMBEDDING_CACHE_PATH, fingerprint)
+    if cache is None:
+        print("Embedding cache missing or stale, running backbone once over the dataset...")
+        start = time.time()
+        cache = build_embedding_cache(model.backbone, dataset, EMBEDDING_CACHE_PATH, device,
+                                      feature_dim=model.img_feature_dim)
+        print(f"Embeddings built in {time.time() - start:.1f}s")
+    else:
+        print(f"Using embedding cache {EMBEDDING_CACHE_PATH}")
+    features, row_of = cache
+
+    train_loader = DataLoader(EmbeddingDataset(dataset, features, row_of), batch_size=BATCH_SIZE, shuffle=True)
+
+    # 3. Freeze the backbone and train the fusion/classifier layers only
+    for param in model.backbone.parameters():
+        param.requires_grad = False
+    head_params = [p for p in model.parameters() if p.requires_grad]
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(head_params, lr=LEARNING_RATE)
+
+    model.train()
+    model.backbone.eval()
+    for epoch in range(NUM_EPOCHS):
+        running_loss = 0.0
+        correct = 0
+        total = 0
+        epoch_start = time.time()
+
+        for img_feat, tab_data, labels in train_loader:
+            img_feat = img_feat.to(device)
+            tab_data = tab_data.to(device)
+            labels = labels.to(device)
+
+            optimizer.zero_grad()
+            outputs, _ = model.forward_head(img_feat, tab_data)
+            loss = criterion(outputs, labels)
+            loss.backward()
+            optimizer.step()
+
+            running_loss += loss.item()
+            _, predicted = torch.max(outputs.data, 1)
+            total += labels.size(0)
+            correct += (predicted == labels).sum().item()
+
+        epoch_loss = running_loss / len(train_loader)
+        epoch_acc = 100 * correct / total
+        print(f"Epoch [{epoch+1}/{NUM_EPOCHS}] Loss: {epoch_loss:.4f} Accuracy: {epoch_acc:.2f}% "
+              f"({time.time() - epoch_start:.1f}s)")
+
+    print("Training Finished.")
+
+    # 4. Save Checkpoint (same format as train_full.py)
+    checkpoint = {
+        'model_state_dict': model.state_dict(),
+        'crop_classes': crop_classes,
+        'tab_columns': TAB_COLUMNS
+    }
+    torch.save(checkpoint, CHECKPOINT_PATH)
+    print(f"Model saved to {CHECKPOINT_PATH}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,492 @@
+"""
+Weather response cache with pluggable storage.
+
+WeatherCache implements freshness (TTL plus a stale-while-revalidate window)
+and single-flight fetching on top of a store holding {'timestamp', 'data'}
+entries:
+
+- MemoryWeatherStore: an in-process LRU dict (the default).
+- SQLiteWeatherStore: one SQLite file in WAL mode, shared by every worker
+  process and surviving restarts. Writes are atomic transactions, expired
+  entries are purged on write, and a lease table lets one process fetch a
+  cell while the others wait for its result.
+"""
+
+import json
+import os
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# After a failed background refresh, keep serving the stale entry this long before trying again
+REFRESH_RETRY_SECONDS = 30
+# Expired retry times are pruned once this many keys have one (the bound then doubles with the live ones)
+RETRY_PRUNE_MIN = 1024
+# How long a process may hold a cell's fetch lease before others stop waiting for it
+LEASE_SECONDS = 30
+LEASE_POLL_SECONDS = 0.05
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS weather (
+    key TEXT PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    data TEXT NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS weather_last_access ON weather(last_access);
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class MemoryWeatherStore:
+    """Thread-safe in-process LRU store of weather entries."""
+
+    backend = 'memory'
+
+    def __init__(self, max_entries: int = 10000):
+        """
+        Initialize MemoryWeatherStore.
+
+        Args:
+            max_entries: Entries kept before the least recently used is evicted
+        """
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def try_lease(self, key: str, seconds: float) -> bool:
+        """Single process: the in-process single-flight is all the coordination needed."""
+        return True
+
+    def release(self, key: str) -> None:
+        pass
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'backend': self.backend, 'size': len(self._entries),
+                    'max_entries': self.max_entries, 'evictions': self.evictions}
+
+
+class SQLiteWeatherStore:
+    """
+    Weather entries in a SQLite file shared between processes.
+
+    Thread-safe within a process (one connection per thread) and safe across
+    processes using the same file (WAL mode, writes in IMMEDIATE transactions).
+    """
+
+    backend = 'sqlite'
+
+    def __init__(self, path: str, max_entries: int = 10000, max_age_seconds: float = 3600.0,
+                 clock: Callable[[], float] = time.time):
+        """
+        Initialize SQLiteWeatherStore.
+
+        Args:
+            path: Database file (its directory is created on first use)
+            max_entries: Entries kept before the least recently used are evicted
+            max_age_seconds: Entries older than this are no longer returned and are purged
+            clock: Wall-clock time source (injectable for tests)
+        """
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.max_age_seconds = max_age_seconds
+        self._clock = clock
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.evictions = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's connection; the directory and schema are created on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _write(self, statements) -> Any:
+        """Run `statements(conn)` in one IMMEDIATE transaction and return its result."""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = statements(conn)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return result
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = self._clock()
+        conn = self._connection()
+        row = conn.execute('SELECT timestamp, data, last_access FROM weather WHERE key = ?', (key,)).fetchone()
+        if row is None or now - row[0] >= self.max_age_seconds:
+            return None
+        # Refresh the LRU position at most once a minute, to keep reads mostly read-only
+        if now - row[2] > 60:
+            conn.execute('UPDATE weather SET last_access = ? WHERE key = ?', (now, key))
+        return {'timestamp': row[0], 'data': json.loads(row[1])}
+
+    def set(self, key: str, entry: Dict[str, Any]) -> None:
+        now = self._clock()
+        data = json.dumps(entry['data'])
+
+        def statements(conn):
+            conn.execute('INSERT OR REPLACE INTO weather (key, timestamp, data, last_access) VALUES (?, ?, ?, ?)',
+                         (key, entry.get('timestamp', 0), data, now))
+            conn.execute('DELETE FROM weather WHERE timestamp < ?', (now - self.max_age_seconds,))
+            excess = conn.execute('SELECT COUNT(*) FROM weather').fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute('DELETE FROM weather WHERE key IN '
+                             '(SELECT key FROM weather ORDER BY last_access LIMIT ?)', (excess,))
+            return max(0, excess)
+
+        evicted = self._write(statements)
+        if evicted:
+            with self._stats_lock:
+                self.evictions += evicted
+
+    def delete(self, key: str) -> None:
+        self._connection().execute('DELETE FROM weather WHERE key = ?', (key,))
+
+    def clear(self) -> None:
+        self._write(lambda conn: (conn.execute('DELETE FROM weather'), conn.execute('DELETE FROM leases')))
+
+    def try_lease(self, key: str, seconds: float) -> bool:
+        """Claim the right to fetch `key` for `seconds`; False while another process holds it."""
+        now = self._clock()
+
+        def statements(conn):
+            conn.execute('DELETE FROM leases WHERE key = ? AND expires_at < ?', (key, now))
+            return conn.execute('INSERT OR IGNORE INTO leases (key, expires_at) VALUES (?, ?)',
+                                (key, now + seconds)).rowcount == 1
+
+        return self._write(statements)
+
+    def release(self, key: str) -> None:
+        self._connection().execute('DELETE FROM leases WHERE key = ?', (key,))
+
+    def __len__(self) -> int:
+        return self._connection().execute('SELECT COUNT(*) FROM weather').fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            evictions = self.evictions
+        return {'backend': self.backend, 'path': self.path, 'size': len(self),
+                'max_entries': self.max_entries, 'evictions': evictions}
+
+
+class WeatherCache:
+    """
+    Weather responses with stale-while-revalidate and single-flight fetches.
+
+    An entry is fresh for `ttl_seconds`; for `stale_seconds` after that it
+    is still served while one background refresh fetches the next, and only
+    older (or missing) entries make callers wait. Concurrent callers for a
+    key, threads and coroutines alike, share a single in-flight fetch, and
+    with a shared store, processes share it through a lease. Entries live in
+    `store` (an in-process LRU by default).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl_seconds: float = 1800.0,
+        stale_seconds: float = 1800.0,
+        clock: Callable[[], float] = time.time,
+        store=None
+    ):
+        """
+        Initialize WeatherCache.
+
+        Args:
+            max_entries: Maximum number of cached locations (for the default store)
+            ttl_seconds: How long an entry is fresh
+            stale_seconds: How long after that it is served while being refreshed
+            clock: Wall-clock time source (injectable for tests)
+            store: MemoryWeatherStore, SQLiteWeatherStore or compatible; None
+                for a MemoryWeatherStore of `max_entries`
+        """
+        self.store = store if store is not None else MemoryWeatherStore(max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._clock = clock
+        self._inflight: Dict[str, Future] = {}
+        self._retry_at: Dict[str, float] = {}
+        self._retry_prune_at = RETRY_PRUNE_MIN
+        self._tasks = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.fetches = 0
+        self.peer_fetches = 0
+        self.fetch_errors = 0
+        self.background_refreshes = 0
+
+    # Dict-style access to raw entries
+
+    def __contains__(self, key: str) -> bool:
+        return self.store.get(key) is not None
+
+    def __getitem__(self, key: str) -> Dict[str, Any]:
+        entry = self.store.get(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry
+
+    def __setitem__(self, key: str, entry: Dict[str, Any]) -> None:
+        self.store.set(key, entry)
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def clear(self) -> None:
+        """Remove all entries (counters are kept)."""
+        self.store.clear()
+        with self._lock:
+            self._retry_at.clear()
+
+    # Read-through access
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Get the data cached under `key`, calling `fetch` only when it is
+        missing or too old (or in the background once it is stale).
+
+        Raises:
+            Exception: Whatever the fetch raised, if nothing servable is cached
+        """
+        data, flight, leader = self._lookup(key)
+        if data is not None:
+            if flight is not None:
+                threading.Thread(target=self._run_fetch, args=(key, flight, fetch), daemon=True,
+                                 name='weather-refresh').start()
+            return data
+        if leader:
+            self._run_fetch(key, flight, fetch)
+        return flight.result()
+
+    async def get_or_fetch_async(self, key: str, fetch_async: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Async variant of get_or_fetch(): fetches await `fetch_async` on the
+        running loop (background refreshes as tasks) and share in-flight
+        fetches with synchronous callers.
+        """
+        data, flight, leader = self._lookup(key)
+        if data is not None:
+            if flight is not None:
+                task = asyncio.get_running_loop().create_task(self._run_fetch_async(key, flight, fetch_async))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            return data
+        if leader:
+            await self._run_fetch_async(key, flight, fetch_async)
+        return await asyncio.wrap_future(flight)
+
+    def _age(self, entry: Optional[Dict[str, Any]]) -> Optional[float]:
+        return self._clock() - entry.get('timestamp', 0) if entry is not None else None
+
+    def _lookup(self, key: str) -> Tuple[Optional[Dict[str, Any]], Optional[Future], bool]:
+        """
+        Find the data for `key`.
+
+        Returns:
+            (data, None, False) for a servable entry, or (data, flight, True)
+            when a stale entry needs a background refresh for `flight`;
+            otherwise (None, flight, leader) where the leader must run the
+            fetch for `flight`
+        """
+        entry = self.store.get(key)
+        age = self._age(entry)
+        with self._lock:
+            if age is not None and age < self.ttl_seconds:
+                self.hits += 1
+                return entry['data'], None, False
+            if age is not None and age < self.ttl_seconds + self.stale_seconds:
+                self.stale_hits += 1
+                if key in self._inflight or self._clock() < self._retry_at.get(key, 0.0):
+                    return entry['data'], None, False
+                self._inflight[key] = flight = Future()
+                self.background_refreshes += 1
+                return entry['data'], flight, True
+            self.misses += 1
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return None, flight, False
+            self._inflight[key] = flight = Future()
+            return None, flight, True
+
+    def age(self, key: str) -> Optional[float]:
+        """Seconds since the entry under `key` was stored, or None if there is none."""
+        return self._age(self.store.get(key))
+
+    def get_fresh(self, key: str) -> Optional[Dict[str, Any]]:
+        """The data under `key` if it is within its TTL, else None (no fetch, not counted)."""
+        entry = self._fresh(key)
+        return entry['data'] if entry is not None else None
+
+    def _fresh(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.store.get(key)
+        return entry if entry is not None and self._age(entry) < self.ttl_seconds else None
+
+    def _claim(self, key: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        Claim the fetch of `key` across processes.
+
+        An expired lease is taken over by try_lease() while waiting. If the
+        holder still has not let go after LEASE_SECONDS, this process fetches
+        anyway, but without the lease, so it must not release it.
+
+        Returns:
+            (entry, False) with a fresh entry stored meanwhile by another
+            thread or process; otherwise (None, leased) and this process
+            should fetch, releasing the lease afterwards only if `leased`
+        """
+        deadline = time.monotonic() + LEASE_SECONDS
+        while not self.store.try_lease(key, LEASE_SECONDS):
+            entry = self._fresh(key)
+            if entry is not None:
+                return entry, False
+            if time.monotonic() > deadline:
+                logger.warning(f"Weather fetch lease for {key} still held after {LEASE_SECONDS}s, fetching anyway")
+                return None, False
+            time.sleep(LEASE_POLL_SECONDS)
+        # Someone may have finished just before the lease was free
+        entry = self._fresh(key)
+        if entry is not None:
+            self.store.release(key)
+            return entry, False
+        return None, True
+
+    def _run_fetch(self, key: str, flight: Future, fetch: Callable[[], Dict[str, Any]]) -> None:
+        try:
+            peer, leased = self._claim(key)
+            if peer is not None:
+                self._publish(key, flight, peer['data'], peer=True)
+                return
+            try:
+                data = fetch()
+            finally:
+                if leased:
+                    self.store.release(key)
+        except Exception as e:
+            self._fail(key, flight, e)
+        else:
+            self._publish(key, flight, data)
+
+    async def _run_fetch_async(self, key: str, flight: Future, fetch_async) -> None:
+        try:
+            peer, leased = await asyncio.to_thread(self._claim, key)
+            if peer is not None:
+                self._publish(key, flight, peer['data'], peer=True)
+                return
+            try:
+                data = await fetch_async()
+            finally:
+                if leased:
+                    await asyncio.to_thread(self.store.release, key)
+            await asyncio.to_thread(self.store.set, key, {'timestamp': self._clock(), 'data': data})
+        except Exception as e:
+            self._fail(key, flight, e)
+        else:
+            self._publish(key, flight, data, stored=True)
+
+    def _publish(self, key: str, flight: Future, data: Dict[str, Any], peer: bool = False,
+                 stored: bool = False) -> None:
+        if not (peer or stored):
+            self.store.set(key, {'timestamp': self._clock(), 'data': data})
+        with self._lock:
+            if peer:
+                self.peer_fetches += 1
+            else:
+                self.fetches += 1
+            self._retry_at.pop(key, None)
+            self._inflight.pop(key, None)
+        flight.set_result(data)
+
+    def _fail(self, key: str, flight: Future, error: Exception) -> None:
+        logger.warning(f"Weather fetch failed for {key}: {error}")
+        with self._lock:
+            self.fetch_errors += 1
+            # A stale entry keeps being served; retry the refresh later
+            now = self._clock()
+            if len(self._retry_at) >= self._retry_prune_at:
+                self._retry_at = {k: t for k, t in self._retry_at.items() if t > now}
+                self._retry_prune_at = max(RETRY_PRUNE_MIN, 2 * len(self._retry_at))
+            self._retry_at[key] = now + REFRESH_RETRY_SECONDS
+            self._inflight.pop(key, None)
+        flight.set_exception(error)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with the store's backend, size and evictions, fresh and
+            stale hits, misses, misses that joined an in-flight fetch,
+            upstream fetches (and errors), fetches another process made for
+            us, and background refreshes
+        """
+        store_stats = self.store.stats()
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                **store_stats,
+                'ttl_seconds': self.ttl_seconds,
+                'stale_seconds': self.stale_seconds,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hit_rate': round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+                'fetches': self.fetches,
+                'peer_fetches': self.peer_fetches,
+                'fetch_errors': self.fetch_errors,
+                'background_refreshes': self.background_refreshes
+            }
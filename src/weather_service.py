@@ -3,20 +3,35 @@ Weather Service module for GeoCrop Predictor.
 Integrates with OpenWeatherMap API for real-time weather data.
 """
 
+import asyncio
+import math
 import requests
 import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, asdict
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Sequence, Tuple
 from datetime import datetime
 import logging
 
 from config import config
+from forecast_aggregation import daily_rows
+from http_client import HttpClient, RetryPolicy, client_for
+from weather_cache import WeatherCache, MemoryWeatherStore, SQLiteWeatherStore
 
 logger = logging.getLogger(__name__)
 
-# In-memory cache for weather data
-_weather_cache: Dict[str, Dict[str, Any]] = {}
 CACHE_DURATION_SECONDS = 30 * 60  # 30 minutes
+REQUEST_TIMEOUT_SECONDS = 10
+# Threads running forecast requests while the caller fetches current conditions
+FORECAST_WORKERS = 32
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# Nearest candidates checked for a fresh entry before a neighbour lookup gives up
+REUSE_CANDIDATES = 8
+
+_forecast_pool = ThreadPoolExecutor(max_workers=FORECAST_WORKERS, thread_name_prefix='weather-forecast')
 
 
 @dataclass
@@ -41,6 +56,9 @@ class ForecastDay:
     temp_low: float
     condition: str
     icon: str
+    temp_mean: Optional[float] = None
+    precipitation_mm: float = 0.0  # Rain + snow over the day
+    humidity_mean: Optional[float] = None
     
     def to_dict(self) -> dict:
         return asdict(self)
@@ -51,23 +69,160 @@ class WeatherServiceError(Exception):
     pass
 
 
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle (haversine) distance between two points in km."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class SpatialIndex:
+    """
+    Grid index of cached weather cells for "which cells lie within R km?".
+    
+    Points are bucketed in a lat/lon grid whose rows are `radius_km` tall, so
+    a query only scans the buckets overlapping its radius (more longitude
+    buckets towards the poles) instead of every cached cell. Holds at most
+    `max_entries` cells, least recently added dropped first; callers check
+    whether a returned cell is still cached.
+    """
+    
+    def __init__(self, radius_km: float, max_entries: int = 10000):
+        """
+        Initialize SpatialIndex.
+        
+        Args:
+            radius_km: Default query radius, and the grid's bucket size
+            max_entries: Maximum number of indexed cells
+        """
+        self.radius_km = radius_km
+        self.max_entries = max_entries
+        self._bucket_degrees = max(radius_km, 0.1) / KM_PER_DEGREE
+        self._points: OrderedDict = OrderedDict()
+        self._buckets: Dict[Tuple[int, int], set] = {}
+        self._lock = threading.Lock()
+    
+    def _bucket(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self._bucket_degrees), math.floor(lon / self._bucket_degrees)
+    
+    def add(self, key: str, lat: float, lon: float) -> None:
+        """Index (or refresh) `key` at (lat, lon)."""
+        with self._lock:
+            if key in self._points:
+                self._points.move_to_end(key)
+                return
+            self._points[key] = (lat, lon)
+            self._buckets.setdefault(self._bucket(lat, lon), set()).add(key)
+            while len(self._points) > self.max_entries:
+                self._drop(*self._points.popitem(last=False))
+    
+    def discard(self, key: str) -> None:
+        """Remove `key` if it is indexed."""
+        with self._lock:
+            point = self._points.pop(key, None)
+            if point is not None:
+                self._drop(key, point)
+    
+    def _drop(self, key: str, point: Tuple[float, float]) -> None:
+        bucket = self._bucket(*point)
+        keys = self._buckets.get(bucket)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._buckets[bucket]
+    
+    def within(self, lat: float, lon: float, radius_km: Optional[float] = None) -> List[Tuple[float, str]]:
+        """
+        Indexed cells within `radius_km` of (lat, lon).
+        
+        Returns:
+            (distance_km, key) pairs, nearest first
+        """
+        radius_km = self.radius_km if radius_km is None else radius_km
+        lat_span = radius_km / KM_PER_DEGREE
+        # A degree of longitude shrinks with cos(lat); widen the scan to match
+        lon_span = min(180.0, lat_span / max(math.cos(math.radians(min(abs(lat) + lat_span, 90.0))), 1e-6))
+        row_lo, col_lo = self._bucket(lat - lat_span, lon - lon_span)
+        row_hi, col_hi = self._bucket(lat + lat_span, lon + lon_span)
+        found = []
+        with self._lock:
+            for row in range(row_lo, row_hi + 1):
+                for col in range(col_lo, col_hi + 1):
+                    for key in self._buckets.get((row, col), ()):
+                        distance = distance_km(lat, lon, *self._points[key])
+                        if distance <= radius_km:
+                            found.append((distance, key))
+        found.sort()
+        return found
+    
+    def __len__(self) -> int:
+        return len(self._points)
+
+
+def create_weather_cache(backend: Optional[str] = None) -> WeatherCache:
+    """
+    Weather cache on the configured store.
+    
+    Args:
+        backend: 'memory' (per process) or 'sqlite' (WEATHER_CACHE_PATH, shared
+            by all workers and restarts). If None, uses WEATHER_CACHE_BACKEND.
+    
+    Raises:
+        ValueError: For an unknown backend
+    """
+    backend = backend or config.WEATHER_CACHE_BACKEND
+    if backend == 'memory':
+        store = MemoryWeatherStore(config.WEATHER_CACHE_MAX_ENTRIES)
+    elif backend == 'sqlite':
+        store = SQLiteWeatherStore(config.WEATHER_CACHE_PATH, config.WEATHER_CACHE_MAX_ENTRIES,
+                                   CACHE_DURATION_SECONDS + config.WEATHER_CACHE_STALE_SECONDS)
+    else:
+        raise ValueError(f"Unknown WEATHER_CACHE_BACKEND {backend!r} (expected 'memory' or 'sqlite')")
+    return WeatherCache(ttl_seconds=CACHE_DURATION_SECONDS, stale_seconds=config.WEATHER_CACHE_STALE_SECONDS,
+                        store=store)
+
+
+# Shared weather cache, keyed by 0.01 degree cell
+_weather_cache = create_weather_cache()
+
+
 class WeatherService:
     """Service for fetching weather data from OpenWeatherMap API."""
     
     BASE_URL = "https://api.openweathermap.org/data/2.5"
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, http: Optional[HttpClient] = None,
+                 cache: Optional[WeatherCache] = None, reuse_radius_km: Optional[float] = None):
         """
         Initialize WeatherService.
         
         Args:
             api_key: OpenWeatherMap API key. If None, uses config.
+            http: HTTP client for the API. If None, uses the shared
+                'openweathermap' upstream client.
+            cache: Response cache. If None, uses the shared cache on the
+                configured backend.
+            reuse_radius_km: Serve a fresh entry cached for a cell this close
+                instead of fetching (0 disables). If None, uses
+                WEATHER_REUSE_RADIUS_KM.
         """
         # Use provided api_key if it's a non-empty string, otherwise fall back to config
         if api_key is not None:
             self.api_key = api_key if api_key else None
         else:
             self.api_key = config.OPENWEATHER_API_KEY
+        self.http = http or client_for(
+            'openweathermap',
+            timeout=REQUEST_TIMEOUT_SECONDS,
+            retry=RetryPolicy(max_retries=config.HTTP_MAX_RETRIES, backoff_seconds=config.HTTP_BACKOFF_SECONDS)
+        )
+        self.cache = cache if cache is not None else _weather_cache
+        self.reuse_radius_km = config.WEATHER_REUSE_RADIUS_KM if reuse_radius_km is None else reuse_radius_km
+        self.index = (SpatialIndex(self.reuse_radius_km, config.WEATHER_CACHE_MAX_ENTRIES)
+                      if self.reuse_radius_km > 0 else None)
+        self.neighbour_hits = 0
+        self._lock = threading.Lock()
     
     def is_configured(self) -> bool:
         """Check if the service is properly configured."""
@@ -77,12 +232,33 @@ class WeatherService:
         """Generate cache key from coordinates (rounded to 2 decimals)."""
         return f"{round(lat, 2)}_{round(lon, 2)}"
     
+    def _nearby_fresh(self, cache_key: str, lat: float, lon: float) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        (key, data) of fresh data cached for another cell within
+        reuse_radius_km, nearest first, if the location's own cell has none.
+        """
+        if self.index is None or self.cache.get_fresh(cache_key) is not None:
+            return None
+        for _, key in self.index.within(lat, lon)[:REUSE_CANDIDATES]:
+            data = self.cache.get_fresh(key) if key != cache_key else None
+            if data is not None:
+                logger.debug(f"Using cached weather data of {key} for {cache_key}")
+                with self._lock:
+                    self.neighbour_hits += 1
+                return key, data
+        return None
+    
+    def _index_cell(self, cache_key: str, lat: float, lon: float) -> None:
+        """Make a cached cell findable by neighbour lookups."""
+        if self.index is not None:
+            self.index.add(cache_key, round(lat, 2), round(lon, 2))
+    
     def _is_cache_valid(self, cache_key: str) -> bool:
         """Check if cached data is still valid."""
-        if cache_key not in _weather_cache:
+        if cache_key not in self.cache:
             return False
         
-        cached = _weather_cache[cache_key]
+        cached = self.cache[cache_key]
         age = time.time() - cached.get('timestamp', 0)
         return age < CACHE_DURATION_SECONDS
     
@@ -90,16 +266,40 @@ class WeatherService:
         """Get data from cache if valid."""
         if self._is_cache_valid(cache_key):
             logger.info(f"Using cached weather data for {cache_key}")
-            return _weather_cache[cache_key]['data']
+            return self.cache[cache_key]['data']
         return None
     
     def _save_to_cache(self, cache_key: str, data: Dict[str, Any]) -> None:
         """Save data to cache with timestamp."""
-        _weather_cache[cache_key] = {
+        self.cache[cache_key] = {
             'timestamp': time.time(),
             'data': data
         }
     
+    def _request_params(self, lat: float, lon: float) -> Dict[str, Any]:
+        """Query parameters shared by the weather and forecast endpoints."""
+        return {
+            'lat': lat,
+            'lon': lon,
+            'appid': self.api_key,
+            'units': 'metric'
+        }
+    
+    def _parse_current(self, data: Dict[str, Any]) -> WeatherData:
+        """Convert a /weather response into WeatherData."""
+        return WeatherData(
+            temperature=round(data['main']['temp'], 1),
+            humidity=data['main']['humidity'],
+            wind_speed=round(data['wind']['speed'] * 3.6, 1),  # m/s to km/h
+            condition=data['weather'][0]['main'],
+            icon=data['weather'][0]['icon'],
+            description=data['weather'][0]['description']
+        )
+    
+    def _parse_forecast(self, data: Dict[str, Any], days: int) -> List[ForecastDay]:
+        """Convert a /forecast response (3-hourly items) into daily ForecastDay objects."""
+        return [ForecastDay(**row) for row in daily_rows(data, days)]
+    
     def get_current_weather(self, lat: float, lon: float) -> WeatherData:
         """
         Get current weather for given coordinates.
@@ -119,25 +319,9 @@ class WeatherService:
         
         try:
             url = f"{self.BASE_URL}/weather"
-            params = {
-                'lat': lat,
-                'lon': lon,
-                'appid': self.api_key,
-                'units': 'metric'
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
+            response = self.http.get(url, params=self._request_params(lat, lon))
             response.raise_for_status()
-            data = response.json()
-            
-            return WeatherData(
-                temperature=round(data['main']['temp'], 1),
-                humidity=data['main']['humidity'],
-                wind_speed=round(data['wind']['speed'] * 3.6, 1),  # m/s to km/h
-                condition=data['weather'][0]['main'],
-                icon=data['weather'][0]['icon'],
-                description=data['weather'][0]['description']
-            )
+            return self._parse_current(response.json())
             
         except requests.RequestException as e:
             logger.error(f"Weather API error: {e}")
@@ -163,41 +347,9 @@ class WeatherService:
         
         try:
             url = f"{self.BASE_URL}/forecast"
-            params = {
-                'lat': lat,
-                'lon': lon,
-                'appid': self.api_key,
-                'units': 'metric'
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
+            response = self.http.get(url, params=self._request_params(lat, lon))
             response.raise_for_status()
-            data = response.json()
-            
-            # Group forecasts by day and get daily high/low
-            daily_data = {}
-            for item in data['list']:
-                date = item['dt_txt'].split(' ')[0]
-                if date not in daily_data:
-                    daily_data[date] = {
-                        'temps': [],
-                        'condition': item['weather'][0]['main'],
-                        'icon': item['weather'][0]['icon']
-                    }
-                daily_data[date]['temps'].append(item['main']['temp'])
-            
-            # Convert to ForecastDay objects
-            forecasts = []
-            for date, info in list(daily_data.items())[:days]:
-                forecasts.append(ForecastDay(
-                    date=date,
-                    temp_high=round(max(info['temps']), 1),
-                    temp_low=round(min(info['temps']), 1),
-                    condition=info['condition'],
-                    icon=info['icon']
-                ))
-            
-            return forecasts
+            return self._parse_forecast(response.json(), days)
             
         except requests.RequestException as e:
             logger.error(f"Forecast API error: {e}")
@@ -207,33 +359,183 @@ class WeatherService:
         """
         Get both current weather and forecast with caching.
         
+        Stale entries are served while being refreshed in the background,
+        and concurrent requests for the same cell share one upstream fetch.
+        With reuse_radius_km set, a cell without a fresh entry is answered
+        from the nearest cell within that radius that has one.
+        
         Args:
             lat: Latitude
             lon: Longitude
             
         Returns:
             Dictionary with 'current' and 'forecast' keys
+            
+        Raises:
+            WeatherServiceError: If an API call fails and nothing servable is cached
+        """
+        return self.get_weather_with_age(lat, lon)[0]
+    
+    def get_weather_with_age(self, lat: float, lon: float) -> Tuple[Dict[str, Any], Optional[float]]:
+        """
+        get_weather_with_forecast(), with how old the served data is.
+        
+        Returns:
+            (data, age_seconds) where age_seconds is the time since the data
+            was fetched from OpenWeatherMap (None if it is no longer cached)
+        
+        Raises:
+            WeatherServiceError: If an API call fails and nothing servable is cached
         """
+        def fetch():
+            # Both requests in flight at once: a miss costs one round trip, not two
+            forecast_future = _forecast_pool.submit(self.get_forecast, lat, lon)
+            try:
+                current = self.get_current_weather(lat, lon)
+            finally:
+                forecast = forecast_future.result()
+            return {
+                'current': current.to_dict(),
+                'forecast': [f.to_dict() for f in forecast]
+            }
+        
         cache_key = self._get_cache_key(lat, lon)
+        nearby = self._nearby_fresh(cache_key, lat, lon)
+        if nearby is not None:
+            return nearby[1], self.cache.age(nearby[0])
+        data = self.cache.get_or_fetch(cache_key, fetch)
+        self._index_cell(cache_key, lat, lon)
+        return data, self.cache.age(cache_key)
+    
+    def unique_cells(self, coords: Sequence[Tuple[float, float]]) -> Dict[str, Tuple[float, float]]:
+        """First (lat, lon) of every distinct cache cell in `coords`, in input order."""
+        cells = {}
+        for lat, lon in coords:
+            cells.setdefault(self._get_cache_key(lat, lon), (lat, lon))
+        return cells
+    
+    def _many_results(self, coords, outcomes: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Per-location results from the outcome of each cell."""
+        return [{'lat': lat, 'lon': lon, **outcomes[self._get_cache_key(lat, lon)]} for lat, lon in coords]
+    
+    def get_weather_many(self, coords: Sequence[Tuple[float, float]],
+                         max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Get current weather and forecast for many locations.
         
-        # Check cache first
-        cached_data = self._get_from_cache(cache_key)
-        if cached_data:
-            return cached_data
+        Locations in the same cache cell are fetched once, and cells are
+        fetched in parallel, at most `max_concurrency` at a time.
         
-        # Fetch fresh data
-        current = self.get_current_weather(lat, lon)
-        forecast = self.get_forecast(lat, lon)
+        Args:
+            coords: (lat, lon) pairs
+            max_concurrency: Parallel fetches (default WEATHER_BATCH_CONCURRENCY)
+            
+        Returns:
+            One dict per input location, in order, with 'lat', 'lon' and
+            either 'current' and 'forecast' or an 'error'
+        """
+        coords = [(float(lat), float(lon)) for lat, lon in coords]
+        cells = self.unique_cells(coords)
+        workers = max(1, min(max_concurrency or config.WEATHER_BATCH_CONCURRENCY, len(cells)))
         
-        result = {
-            'current': current.to_dict(),
-            'forecast': [f.to_dict() for f in forecast]
-        }
+        def fetch(item):
+            key, (lat, lon) = item
+            try:
+                return key, self.get_weather_with_forecast(lat, lon)
+            except WeatherServiceError as e:
+                return key, {'error': str(e)}
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='weather-batch') as pool:
+            outcomes = dict(pool.map(fetch, cells.items()))
+        return self._many_results(coords, outcomes)
+
+    async def get_weather_with_forecast_async(self, lat: float, lon: float, client) -> Dict[str, Any]:
+        """
+        Async variant of get_weather_with_forecast for the ASGI server.
+        
+        Current weather and forecast are requested concurrently on `client`,
+        a shared httpx.AsyncClient, so waiting on OpenWeatherMap holds no
+        thread. Uses the same cache as the synchronous method.
+        
+        Args:
+            lat: Latitude
+            lon: Longitude
+            client: httpx.AsyncClient used for both requests
+            
+        Returns:
+            Dictionary with 'current' and 'forecast' keys
+            
+        Raises:
+            WeatherServiceError: If an API call fails
+        """
+        return (await self.get_weather_with_age_async(lat, lon, client))[0]
+    
+    async def get_weather_with_age_async(self, lat: float, lon: float,
+                                         client) -> Tuple[Dict[str, Any], Optional[float]]:
+        """
+        get_weather_with_forecast_async(), with how old the served data is.
+        
+        Returns:
+            (data, age_seconds) as for get_weather_with_age()
+        
+        Raises:
+            WeatherServiceError: If an API call fails
+        """
+        import httpx
+        
+        if not self.is_configured():
+            raise WeatherServiceError("Weather service not configured")
+        
+        async def fetch():
+            params = self._request_params(lat, lon)
+            try:
+                current_response, forecast_response = await asyncio.gather(
+                    client.get(f"{self.BASE_URL}/weather", params=params, timeout=REQUEST_TIMEOUT_SECONDS),
+                    client.get(f"{self.BASE_URL}/forecast", params=params, timeout=REQUEST_TIMEOUT_SECONDS)
+                )
+                current_response.raise_for_status()
+                forecast_response.raise_for_status()
+            except httpx.HTTPError as e:
+                logger.error(f"Weather API error: {e}")
+                raise WeatherServiceError(f"Failed to fetch weather: {str(e)}")
+            return {
+                'current': self._parse_current(current_response.json()).to_dict(),
+                'forecast': [f.to_dict() for f in self._parse_forecast(forecast_response.json(), 5)]
+            }
+        
+        cache_key = self._get_cache_key(lat, lon)
+        nearby = self._nearby_fresh(cache_key, lat, lon)
+        if nearby is not None:
+            return nearby[1], self.cache.age(nearby[0])
+        data = await self.cache.get_or_fetch_async(cache_key, fetch)
+        self._index_cell(cache_key, lat, lon)
+        return data, self.cache.age(cache_key)
+    
+    async def get_weather_many_async(self, coords: Sequence[Tuple[float, float]], client,
+                                     max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Async variant of get_weather_many, with the requests made on `client`."""
+        coords = [(float(lat), float(lon)) for lat, lon in coords]
+        cells = self.unique_cells(coords)
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or config.WEATHER_BATCH_CONCURRENCY))
         
-        # Save to cache
-        self._save_to_cache(cache_key, result)
+        async def fetch(key, lat, lon):
+            async with semaphore:
+                try:
+                    return key, await self.get_weather_with_forecast_async(lat, lon, client)
+                except WeatherServiceError as e:
+                    return key, {'error': str(e)}
         
-        return result
+        outcomes = dict(await asyncio.gather(*[fetch(key, lat, lon) for key, (lat, lon) in cells.items()]))
+        return self._many_results(coords, outcomes)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Weather cache statistics, with lookups answered from a neighbouring cell."""
+        return {
+            **self.cache.stats(),
+            'reuse_radius_km': self.reuse_radius_km,
+            'neighbour_hits': self.neighbour_hits,
+            'indexed_cells': len(self.index) if self.index is not None else 0
+        }
 
 
 # Global service instance